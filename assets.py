@@ -0,0 +1,250 @@
+import json
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import parsing
+
+# Índice del lump de texinfo y tamaño de cada entrada (texinfo_t de qfiles.h)
+TEXINFO = 5
+TAMANO_TEXINFO = 76
+OFFSET_TEXTURA = 40
+# Formato de los .pak: header 'PACK' y entradas de directorio de 64 bytes
+MAGIC_PAK = b'PACK'
+TAMANO_ENTRADA_PAK = 64
+# Largo máximo de un nombre dentro de un .pak (incluido el nulo final)
+LARGO_NOMBRE_PAK = 56
+# Caras del cielo que carga el cliente para la clave 'sky' de worldspawn
+CARAS_CIELO = ("rt", "bk", "lf", "ft", "up", "dn")
+# Formatos que aceptan los clientes como reemplazo de una textura o de una cara del cielo,
+# en orden de búsqueda; el primero es el nombre que figura en el mapa
+ALTERNATIVAS = {
+    "textures/": (".wal", ".tga", ".png", ".jpg"),
+    "env/": (".pcx", ".tga", ".png", ".jpg"),
+}
+# Directorios que no se recorren al indexar (además de los ocultos, como .git o .snapshots)
+DIRECTORIOS_EXCLUIDOS = {"__pycache__", "sesiones_rcon", "ents", "ents_modificados"}
+# Archivo de caché de referencias por mapa, en el directorio del script
+ARCHIVO_CACHE = ".cache_recursos.json"
+
+_lock_cache = threading.Lock()
+
+def huella(ruta):
+    """
+    Huella barata de un archivo (tamaño y fecha de modificación) para invalidar cachés.
+    """
+    st = os.stat(ruta)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def referencias_entidades(entidades):
+    """
+    Devuelve los archivos referenciados por las entidades: sonidos ('noise'), modelos
+    ('model' que no sea un submodelo '*n') y las caras del cielo de worldspawn.
+    """
+    refs = set()
+    for entidad in entidades:
+        claves = dict(entidad)
+        sonido = claves.get("noise")
+        if sonido:
+            refs.add(f"sound/{sonido if '.' in sonido else sonido + '.wav'}")
+        modelo = claves.get("model")
+        if modelo and not modelo.startswith("*"):
+            refs.add(modelo)
+        if claves.get("classname") == "worldspawn" and claves.get("sky"):
+            for cara in CARAS_CIELO:
+                refs.add(f"env/{claves['sky']}{cara}.pcx")
+    return refs
+
+def referencias_bsp(ruta):
+    """
+    Lee el lump de entidades y el de texinfo de un .bsp y devuelve la lista ordenada de
+    archivos que el cliente necesita para jugar el mapa.
+    """
+    bsp = parsing.BSPFile(ruta)
+    with open(ruta, 'rb') as f:
+        error = bsp.parse_header(f.read(parsing.HEADERLEN))
+        if error:
+            raise ValueError(error)
+
+        def leer_lump(indice):
+            f.seek(bsp.offsets[indice] + parsing.HEADERLEN)
+            return f.read(bsp.lengths[indice])
+
+        entidades_texto = leer_lump(parsing.ENTITIES).split(b'\x00')[0].decode('utf-8', errors='replace')
+        texinfo = leer_lump(TEXINFO)
+
+    refs = referencias_entidades(parsing.parse_entities(entidades_texto))
+    for i in range(0, len(texinfo) - TAMANO_TEXINFO + 1, TAMANO_TEXINFO):
+        nombre = texinfo[i + OFFSET_TEXTURA:i + OFFSET_TEXTURA + 32].split(b'\x00')[0]
+        if nombre:
+            refs.add(f"textures/{nombre.decode('latin-1').lower()}.wal")
+    return sorted(refs)
+
+def leer_directorio_pak(ruta):
+    """
+    Devuelve las entradas de un .pak como dict nombre -> (offset, tamaño).
+    """
+    entradas = {}
+    with open(ruta, 'rb') as f:
+        magic, dirofs, dirlen = struct.unpack('<4sii', f.read(12))
+        if magic != MAGIC_PAK:
+            raise ValueError(f"{ruta} no es un archivo .pak")
+        f.seek(dirofs)
+        directorio = f.read(dirlen)
+    for i in range(0, len(directorio) - TAMANO_ENTRADA_PAK + 1, TAMANO_ENTRADA_PAK):
+        nombre, offset, tamano = struct.unpack_from('<56sii', directorio, i)
+        entradas[nombre.split(b'\x00')[0].decode('latin-1')] = (offset, tamano)
+    return entradas
+
+def construir_indice(dirs_juego):
+    """
+    Índice compartido de todos los archivos disponibles en 'dirs_juego', sueltos o dentro
+    de .pak, con nombres en minúsculas. Como en el motor, los directorios posteriores y los
+    archivos sueltos tienen prioridad. Valores: ("suelto", ruta) o ("pak", ruta_pak, offset, tamaño).
+    """
+    indice = {}
+    for directorio in dirs_juego:
+        if not os.path.isdir(directorio):
+            continue
+        paks = sorted(f for f in os.listdir(directorio) if f.lower().endswith('.pak'))
+        for pak in paks:
+            ruta_pak = os.path.join(directorio, pak)
+            try:
+                for nombre, (offset, tamano) in leer_directorio_pak(ruta_pak).items():
+                    indice[nombre.lower()] = ("pak", ruta_pak, offset, tamano)
+            except (OSError, ValueError, struct.error):
+                continue
+        for raiz, subdirectorios, archivos in os.walk(directorio):
+            subdirectorios[:] = [d for d in subdirectorios if not d.startswith('.') and d not in DIRECTORIOS_EXCLUIDOS]
+            for archivo in archivos:
+                if archivo.lower().endswith('.pak'):
+                    continue
+                ruta = os.path.join(raiz, archivo)
+                relativa = os.path.relpath(ruta, directorio).replace(os.sep, '/').lower()
+                indice[relativa] = ("suelto", ruta)
+    return indice
+
+def resolver_referencia(ref, indice):
+    """
+    Busca 'ref' en el índice; las texturas y caras del cielo también se buscan en sus
+    formatos de reemplazo (ver ALTERNATIVAS). Devuelve el nombre encontrado o None.
+    """
+    candidatos = [ref]
+    for prefijo, extensiones in ALTERNATIVAS.items():
+        if ref.startswith(prefijo):
+            base = os.path.splitext(ref)[0]
+            candidatos += [base + ext for ext in extensiones if base + ext != ref]
+    for candidato in candidatos:
+        if candidato.lower() in indice:
+            return candidato
+    return None
+
+def _cargar_cache(ruta_cache):
+    if os.path.exists(ruta_cache):
+        try:
+            with open(ruta_cache, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def analizar_rotacion(bsp_paths, dirs_juego, ruta_cache=None, max_hilos=8):
+    """
+    Analiza en paralelo los .bsp de la rotación y resuelve sus referencias contra el índice
+    de 'dirs_juego'. Las referencias de cada mapa se guardan en caché por su huella, así
+    que solo se vuelven a leer los mapas que cambiaron.
+    Devuelve un dict con las referencias por mapa y el estado de cada archivo referenciado.
+    """
+    cache = _cargar_cache(ruta_cache) if ruta_cache else {}
+
+    def analizar(ruta):
+        mapa = os.path.splitext(os.path.basename(ruta))[0]
+        clave = huella(ruta)
+        with _lock_cache:
+            guardado = cache.get(mapa)
+        if guardado and guardado["huella"] == clave:
+            return mapa, guardado["refs"]
+        refs = referencias_bsp(ruta)
+        with _lock_cache:
+            cache[mapa] = {"huella": clave, "refs": refs}
+        return mapa, refs
+
+    with ThreadPoolExecutor(max_workers=max(1, max_hilos)) as executor:
+        futuro_indice = executor.submit(construir_indice, dirs_juego)
+        por_mapa = dict(executor.map(analizar, bsp_paths))
+        indice = futuro_indice.result()
+
+    if ruta_cache:
+        temporal = f"{ruta_cache}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temporal, ruta_cache)
+
+    archivos = {}
+    resueltos = {}
+    for refs in por_mapa.values():
+        for ref in refs:
+            if ref in archivos:
+                continue
+            encontrado = resolver_referencia(ref, indice)
+            if encontrado is None:
+                archivos[ref] = "faltante"
+                continue
+            resueltos[ref] = encontrado
+            origen = indice[encontrado.lower()]
+            estado = "suelto" if origen[0] == "suelto" else f"pak:{os.path.basename(origen[1])}"
+            archivos[ref] = estado if encontrado == ref else f"{estado} ({encontrado})"
+
+    return {"mapas": por_mapa, "archivos": archivos, "resueltos": resueltos, "indice": indice}
+
+def construir_pak(salida, analisis, bsp_paths, excluir_paks=()):
+    """
+    Escribe un único .pak con los mapas de la rotación y todos los archivos referenciados
+    que se encontraron, salvo los que vienen en los .pak de 'excluir_paks' (por ejemplo los
+    que todos los clientes ya tienen). Devuelve la cantidad de archivos empaquetados.
+    Lanza ValueError sin escribir nada si algún nombre no entra en el directorio del .pak.
+    """
+    excluir = {p.lower() for p in excluir_paks}
+    contenido = [(f"maps/{os.path.basename(ruta).lower()}", ("suelto", ruta)) for ruta in bsp_paths]
+    for ref, encontrado in sorted(analisis["resueltos"].items()):
+        origen = analisis["indice"][encontrado.lower()]
+        if origen[0] == "pak" and os.path.basename(origen[1]).lower() in excluir:
+            continue
+        contenido.append((encontrado.lower(), origen))
+
+    largos = [nombre for nombre, _ in contenido if len(nombre.encode('latin-1', errors='replace')) >= LARGO_NOMBRE_PAK]
+    if largos:
+        raise ValueError(f"Nombres de más de {LARGO_NOMBRE_PAK - 1} caracteres, no entran en un .pak: {', '.join(largos)}")
+
+    directorio = []
+    temporal = f"{salida}.tmp"
+    with open(temporal, 'wb') as pak:
+        pak.write(struct.pack('<4sii', MAGIC_PAK, 0, 0))
+        for nombre, origen in contenido:
+            if origen[0] == "suelto":
+                with open(origen[1], 'rb') as f:
+                    datos = f.read()
+            else:
+                with open(origen[1], 'rb') as f:
+                    f.seek(origen[2])
+                    datos = f.read(origen[3])
+            directorio.append((nombre, pak.tell(), len(datos)))
+            pak.write(datos)
+        dirofs = pak.tell()
+        for nombre, offset, tamano in directorio:
+            pak.write(struct.pack('<56sii', nombre.encode('latin-1', errors='replace'), offset, tamano))
+        pak.seek(0)
+        pak.write(struct.pack('<4sii', MAGIC_PAK, dirofs, len(directorio) * TAMANO_ENTRADA_PAK))
+    os.replace(temporal, salida)
+    return len(directorio)
+
+def formatear_analisis(analisis):
+    archivos = analisis["archivos"]
+    faltantes = sorted(r for r, e in archivos.items() if e == "faltante")
+    lineas = [f"{len(analisis['mapas'])} mapas, {len(archivos)} archivos referenciados distintos, {len(faltantes)} faltantes."]
+    for mapa, refs in sorted(analisis["mapas"].items()):
+        lineas.append(f"  {mapa}: {len(refs)} referencias")
+    for ref in faltantes:
+        lineas.append(f"  Faltante: {ref}")
+    return "\n".join(lineas)
@@ -0,0 +1,345 @@
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+
+import ent_diff
+import reglas
+import assets
+import rcon_ftp
+import rcon_script
+import rotacion_dinamica
+import sesiones_rcon
+import verificador_bsp
+
+def _directorios():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return script_dir, os.path.join(script_dir, 'ents'), os.path.join(script_dir, 'ents_modificados')
+
+def _falta_directorio(*directorios):
+    """
+    Informa en stderr el primer directorio que no existe. Devuelve True si falta alguno.
+    """
+    for directorio in directorios:
+        if not os.path.isdir(directorio):
+            print(f"Error: no existe el directorio {directorio}", file=sys.stderr)
+            return True
+    return False
+
+def comando_diff(args):
+    """
+    Muestra las diferencias entre ents/ y ents_modificados/ por entidad.
+    """
+    _, ents_dir, modificados_dir = _directorios()
+    ents_dir, modificados_dir = args.ents or ents_dir, args.modificados or modificados_dir
+    if _falta_directorio(ents_dir, modificados_dir):
+        return 2
+    resultados = ent_diff.diferencias_rotacion(ents_dir, modificados_dir,
+                                               mapas=args.mapas or None, procesos=args.procesos)
+    if args.json:
+        json.dump(resultados, sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        texto = ent_diff.formatear_diferencias(resultados)
+        print(texto or "Sin diferencias.")
+    return 1 if any(ent_diff.hay_cambios(r) for r in resultados) and args.codigo_salida else 0
+
+def comando_reglas(args):
+    """
+    Aplica un archivo de reglas a los .ent de un directorio.
+    """
+    script_dir, _, modificados_dir = _directorios()
+    directorio = args.dir or modificados_dir
+    if _falta_directorio(directorio):
+        return 2
+    mapas = args.mapas or [os.path.splitext(f)[0] for f in sorted(os.listdir(directorio)) if f.lower().endswith('.ent')]
+    rutas = [os.path.join(directorio, f"{m}.ent") for m in mapas]
+    version_previa = None
+    try:
+        definicion = reglas.cargar_reglas(args.reglas)
+        reglas.compilar_reglas(definicion)
+        if not args.simular:
+            # Versión con los .ent tal como estaban, para poder deshacer la edición
+            version_previa = reglas.respaldar_directorio(script_dir, directorio)
+        resultados, totales = reglas.aplicar_reglas(definicion, rutas, args.simular, args.procesos)
+        if not args.simular:
+            reglas.respaldar_directorio(script_dir, directorio)
+    except (OSError, ValueError, re.error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.json:
+        json.dump({"simulacion": args.simular, "version_previa": version_previa, "totales": totales, "mapas": resultados},
+                  sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print(reglas.formatear_resultado(resultados, totales, args.simular))
+        if version_previa:
+            print(f"Versión anterior guardada: {version_previa} (se puede restaurar desde la interfaz).")
+    return 1 if any(r.get("error") for r in resultados) else 0
+
+def comando_recursos(args):
+    """
+    Analiza los recursos referenciados por los mapas y opcionalmente arma un pak.
+    """
+    script_dir, _, _ = _directorios()
+    maps_dir = args.maps or os.path.join(script_dir, 'maps')
+    if _falta_directorio(maps_dir):
+        return 2
+    mapas = args.mapas or [os.path.splitext(f)[0] for f in sorted(os.listdir(maps_dir)) if f.lower().endswith('.bsp')]
+    bsp_paths = [os.path.join(maps_dir, f"{m}.bsp") for m in mapas]
+    parametros = rcon_ftp.cargar_configuracion()
+    dirs_juego = args.dir or [d.strip() for d in parametros["dirs_recursos"].split(",") if d.strip()] or [script_dir]
+
+    analisis = assets.analizar_rotacion(bsp_paths, dirs_juego, os.path.join(script_dir, assets.ARCHIVO_CACHE))
+    if args.json:
+        json.dump({"mapas": analisis["mapas"], "archivos": analisis["archivos"]}, sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print(assets.formatear_analisis(analisis))
+    if args.pak:
+        excluidos = [p.strip() for p in parametros["paks_excluidos"].split(",") if p.strip()]
+        try:
+            cantidad = assets.construir_pak(args.pak, analisis, bsp_paths, excluidos)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Pak generado: {args.pak} ({cantidad} archivos)", file=sys.stderr)
+    return 0
+
+def comando_verificar(args):
+    """
+    Valida los .bsp y muestra su checksum de mapa; opcionalmente los compara con el servidor.
+    """
+    script_dir, _, _ = _directorios()
+    maps_dir = args.maps or os.path.join(script_dir, 'maps')
+    if _falta_directorio(maps_dir):
+        return 2
+    mapas = args.mapas or [os.path.splitext(f)[0] for f in sorted(os.listdir(maps_dir)) if f.lower().endswith('.bsp')]
+    ruta_cache = os.path.join(script_dir, verificador_bsp.ARCHIVO_CACHE)
+    resultados = verificador_bsp.verificar_mapas([os.path.join(maps_dir, f"{m}.bsp") for m in mapas], ruta_cache, args.procesos)
+    comparacion = None
+    if args.servidor:
+        parametros = rcon_ftp.cargar_configuracion()
+        comparacion = rcon_ftp.comparar_mapas_remotos(parametros['ip'], parametros['puerto'], parametros['usuario'],
+                                                      parametros['password'], parametros['ruta_principal'], resultados,
+                                                      _SalidaConsola(True), ruta_cache)
+    if args.json:
+        json.dump({"mapas": resultados, "servidor": comparacion}, sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print(verificador_bsp.formatear_verificacion(resultados))
+    if any(r["errores"] for r in resultados):
+        return 1
+    return 1 if comparacion and any(e == "distinto" for e in comparacion.values()) else 0
+
+class _SalidaConsola:
+    """
+    Reemplazo del cuadro de texto de la consola RCON cuando no hay interfaz gráfica.
+    """
+    def __init__(self, mostrar):
+        self.mostrar = mostrar
+
+    def insert(self, indice, texto):
+        if self.mostrar:
+            sys.stderr.write(texto)
+
+    def see(self, indice):
+        pass
+
+def comando_rcon(args):
+    """
+    Ejecuta comandos en la consola del servidor y muestra la respuesta de cada uno.
+    """
+    if args.archivo:
+        with open(args.archivo, 'r', encoding='utf-8') as f:
+            comandos = rcon_script.leer_script(f.read())
+    else:
+        comandos = rcon_script.leer_script("\n".join(args.comandos))
+    if not comandos:
+        print("Error: no hay comandos para ejecutar.", file=sys.stderr)
+        return 2
+
+    parametros = rcon_ftp.cargar_configuracion()
+    oyentes = []
+    canal = rcon_ftp.conectar_rcon(parametros['ip'], parametros['puerto'], parametros['usuario'],
+                                   parametros['password'], _SalidaConsola(args.verbose), oyentes)
+    if canal is None:
+        return 2
+    try:
+        ejecutor = rcon_script.EjecutorComandos(canal, oyentes, prompt=args.prompt, timeout=args.timeout)
+        resultados = ejecutor.ejecutar(comandos)
+    finally:
+        canal.close()
+
+    if args.json:
+        json.dump([r._asdict() for r in resultados], sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print(rcon_script.formatear_resultados(resultados))
+    return 0 if all(r.completo for r in resultados) else 1
+
+def comando_sesiones(args):
+    """
+    Busca texto en las sesiones RCON grabadas o reproduce una ventana de tiempo.
+    """
+    script_dir, _, _ = _directorios()
+    try:
+        desde = sesiones_rcon.leer_hora(args.desde or "")
+        hasta = sesiones_rcon.leer_hora(args.hasta or "")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    lineas = sesiones_rcon.buscar(args.dir or os.path.join(script_dir, sesiones_rcon.DIRECTORIO_SESIONES),
+                                  desde, hasta, " ".join(args.texto) or None, args.limite)
+    if args.json:
+        json.dump([{"hora": h, "linea": l} for h, l in lineas], sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write("\n")
+    elif lineas:
+        print(sesiones_rcon.formatear_lineas(lineas))
+    return 0 if lineas else 1
+
+def comando_rotacion(args):
+    """
+    Rotación según jugadores: la simula contra un servidor falso o la ejecuta en el servidor real.
+    """
+    script_dir, _, modificados_dir = _directorios()
+    directorio = args.dir or modificados_dir
+    if _falta_directorio(directorio):
+        return 2
+    mapas = args.mapas or [os.path.splitext(f)[0] for f in sorted(os.listdir(directorio)) if f.lower().endswith('.ent')]
+    parametros = rcon_ftp.cargar_configuracion()
+    maxclients = args.maxclients or rcon_ftp.leer_entero(parametros, "maxclients", rotacion_dinamica.MAXCLIENTS)
+    capacidades = rotacion_dinamica.capacidades_rotacion(directorio, mapas, maxclients)
+    if not capacidades:
+        print("Error: la rotación no tiene mapas con entidades.", file=sys.stderr)
+        return 2
+    for c in capacidades:
+        print(f"  {c.mapa:<24} spawns {c.spawns:>3}  jugadores {c.minimo}-{c.capacidad}", file=sys.stderr)
+
+    if args.simular:
+        def curva(tick):
+            # Curva diaria de jugadores: mínimo de madrugada, pico por la noche
+            return round((maxclients - 1) * (0.5 - 0.5 * math.cos(2 * math.pi * tick / args.ticks_dia)))
+
+        jugados = rotacion_dinamica.simular(capacidades, curva, args.ticks, args.duracion, maxclients,
+                                            parametros["comando_rotacion"] or rotacion_dinamica.COMANDO_SIGUIENTE)
+        if args.json:
+            json.dump([{"tick": t, "jugadores": j, "mapa": m, "capacidad": c} for t, j, m, c in jugados], sys.stdout, indent=1)
+            sys.stdout.write("\n")
+        else:
+            for tick, jugadores, mapa, capacidad in jugados:
+                print(f"tick {tick:>5}  {jugadores:>3} jugadores  {mapa} (capacidad {capacidad})")
+        return 0
+
+    oyentes = []
+    canal = rcon_ftp.conectar_rcon(parametros['ip'], parametros['puerto'], parametros['usuario'],
+                                   parametros['password'], _SalidaConsola(False), oyentes)
+    if canal is None:
+        return 2
+    ejecutor = rcon_script.EjecutorComandos(canal, oyentes)
+    intervalo = args.intervalo or rcon_ftp.leer_entero(parametros, "intervalo_rotacion", int(rotacion_dinamica.INTERVALO_CONSULTA))
+    try:
+        rotador = rotacion_dinamica.RotadorCarga(
+            ejecutor, capacidades, maxclients, parametros["comando_rotacion"] or rotacion_dinamica.COMANDO_SIGUIENTE, intervalo,
+            al_decidir=lambda j, actual, elegido: print(f"{time.strftime('%H:%M:%S')}  {j} jugadores en {actual}, próximo {elegido}"),
+            patron_fin=parametros["patron_fin_nivel"] or rotacion_dinamica.PATRON_FIN_NIVEL
+        )
+    except re.error as e:
+        print(f"Error: patron_fin_nivel no es una expresión regular válida: {e}", file=sys.stderr)
+        canal.close()
+        return 2
+    ultimo_error = None
+    try:
+        # El rotador corre en su hilo para que el fin de un nivel adelante la consulta; aquí solo se informan los errores
+        rotador.iniciar()
+        while rotador.activo():
+            time.sleep(1)
+            if rotador.ultimo_error and str(rotador.ultimo_error) != ultimo_error:
+                ultimo_error = str(rotador.ultimo_error)
+                print(f"Error: {ultimo_error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        rotador.detener()
+        canal.close()
+    return 1
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Herramienta de manejo de maplist (modo línea de comandos).")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p = subparsers.add_parser("diff", help="Diferencias por entidad entre ents/ y ents_modificados/")
+    p.add_argument("mapas", nargs="*", help="Mapas a comparar (por defecto todos los de ents_modificados/)")
+    p.add_argument("--ents", help="Directorio de los .ent originales")
+    p.add_argument("--modificados", help="Directorio de los .ent modificados")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.add_argument("--procesos", type=int, help="Cantidad de procesos para la comparación")
+    p.add_argument("--codigo-salida", action="store_true", help="Salir con código 1 si hay diferencias")
+    p.set_defaults(funcion=comando_diff)
+
+    p = subparsers.add_parser("reglas", help="Aplica un archivo de reglas a los .ent")
+    p.add_argument("reglas", help="Archivo JSON con las reglas")
+    p.add_argument("mapas", nargs="*", help="Mapas a modificar (por defecto todos los del directorio)")
+    p.add_argument("--dir", help="Directorio de los .ent (por defecto ents_modificados/)")
+    p.add_argument("--simular", action="store_true", help="No escribir cambios, solo contar aciertos")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.add_argument("--procesos", type=int, help="Cantidad de procesos")
+    p.set_defaults(funcion=comando_reglas)
+
+    p = subparsers.add_parser("recursos", help="Recursos referenciados por los mapas de la rotación")
+    p.add_argument("mapas", nargs="*", help="Mapas a analizar (por defecto todos los de maps/)")
+    p.add_argument("--maps", help="Directorio de los .bsp")
+    p.add_argument("--dir", action="append", help="Directorio del juego donde buscar recursos (repetible)")
+    p.add_argument("--pak", help="Construir un pak con los mapas y sus recursos")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.set_defaults(funcion=comando_recursos)
+
+    p = subparsers.add_parser("verificar", help="Valida los .bsp y calcula su checksum de mapa")
+    p.add_argument("mapas", nargs="*", help="Mapas a verificar (por defecto todos los de maps/)")
+    p.add_argument("--maps", help="Directorio de los .bsp")
+    p.add_argument("--servidor", action="store_true", help="Comparar con los mapas del servidor")
+    p.add_argument("--procesos", type=int, help="Cantidad de procesos")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.set_defaults(funcion=comando_verificar)
+
+    p = subparsers.add_parser("rotacion", help="Rotación de mapas según la cantidad de jugadores")
+    p.add_argument("mapas", nargs="*", help="Mapas de la rotación (por defecto todos los de ents_modificados/)")
+    p.add_argument("--dir", help="Directorio de los .ent")
+    p.add_argument("--maxclients", type=int, help="maxclients del servidor")
+    p.add_argument("--intervalo", type=float, help="Segundos entre consultas de 'status'")
+    p.add_argument("--simular", action="store_true", help="Probar contra un servidor simulado")
+    p.add_argument("--ticks", type=int, default=960, help="Consultas a simular")
+    p.add_argument("--ticks-dia", type=int, default=480, help="Consultas que dura un día simulado")
+    p.add_argument("--duracion", type=int, default=40, help="Consultas que dura cada mapa simulado")
+    p.add_argument("--json", action="store_true", help="Salida en JSON (solo con --simular)")
+    p.set_defaults(funcion=comando_rotacion)
+
+    p = subparsers.add_parser("rcon", help="Ejecuta comandos en la consola del servidor")
+    p.add_argument("comandos", nargs="*", help="Comandos (se pueden separar con ';')")
+    p.add_argument("--archivo", help="Script con un comando por línea")
+    p.add_argument("--timeout", type=float, default=rcon_script.TIMEOUT_COMANDO, help="Segundos máximos por comando")
+    p.add_argument("--prompt", help="Expresión del prompt que cierra cada respuesta (por defecto se usan centinelas)")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.add_argument("--verbose", action="store_true", help="Mostrar la salida cruda de la consola en stderr")
+    p.set_defaults(funcion=comando_rcon)
+
+    p = subparsers.add_parser("sesiones", help="Busca o reproduce las sesiones RCON grabadas")
+    p.add_argument("texto", nargs="*", help="Palabras (o comienzos de palabras) a buscar; sin texto se reproduce la ventana de tiempo")
+    p.add_argument("--desde", help="Inicio de la ventana (AAAA-MM-DD HH:MM)")
+    p.add_argument("--hasta", help="Fin de la ventana (AAAA-MM-DD HH:MM)")
+    p.add_argument("--dir", help="Directorio de las sesiones")
+    p.add_argument("--limite", type=int, default=5000, help="Máximo de líneas a mostrar")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.set_defaults(funcion=comando_sesiones)
+
+    return parser
+
+def ejecutar_cli(argv):
+    """
+    Punto de entrada de la línea de comandos. Devuelve el código de salida.
+    """
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
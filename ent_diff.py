@@ -0,0 +1,168 @@
+import hashlib
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import minificador
+import parsing
+
+# A partir de cuántos mapas conviene repartir la comparación en varios procesos
+MIN_MAPAS_PARALELO = 16
+# Claves que identifican a una entidad cuando su contenido cambió
+CLAVES_IDENTIDAD = ("targetname", "target", "origin", "model")
+
+def hash_entidad(entidad):
+    """
+    Hash del contenido de una entidad, independiente del orden de sus claves.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for clave, valor in sorted(entidad):
+        h.update(clave.encode('utf-8', errors='replace'))
+        h.update(b'\x00')
+        h.update(valor.encode('utf-8', errors='replace'))
+        h.update(b'\x01')
+    return h.digest()
+
+def _classname(entidad):
+    for clave, valor in entidad:
+        if clave == "classname":
+            return valor
+    return ""
+
+def _identidad(entidad):
+    claves = dict(entidad)
+    return (_classname(entidad),) + tuple(claves.get(c, "") for c in CLAVES_IDENTIDAD)
+
+def _resumen(entidad):
+    claves = dict(entidad)
+    return {"classname": claves.get("classname", ""), "claves": claves}
+
+def _diferencia_claves(original, modificada):
+    a = dict(original)
+    b = dict(modificada)
+    return {
+        "classname": b.get("classname", a.get("classname", "")),
+        "identidad": {c: b[c] for c in CLAVES_IDENTIDAD if c in b},
+        "agregadas": {k: v for k, v in b.items() if k not in a},
+        "eliminadas": {k: v for k, v in a.items() if k not in b},
+        "modificadas": {k: [a[k], b[k]] for k in a.keys() & b.keys() if a[k] != b[k]},
+    }
+
+def _emparejar(pendientes_a, pendientes_b, clave):
+    """
+    Empareja en orden las entidades de ambos lados que comparten 'clave(entidad)'.
+    Devuelve los pares y deja en las listas solo las entidades sin pareja.
+    """
+    grupos = defaultdict(list)
+    for entidad in pendientes_b:
+        grupos[clave(entidad)].append(entidad)
+    pares = []
+    restantes_a = []
+    for entidad in pendientes_a:
+        candidatas = grupos.get(clave(entidad))
+        if candidatas:
+            pares.append((entidad, candidatas.pop(0)))
+        else:
+            restantes_a.append(entidad)
+    restantes_b = [e for lista in grupos.values() for e in lista]
+    return pares, restantes_a, restantes_b
+
+def diferencias_entidades(originales, modificadas):
+    """
+    Compara dos listas de entidades. Primero se descartan las idénticas (por hash), luego
+    se emparejan las que comparten classname y claves de identidad y por último las que
+    comparten classname. Devuelve un dict con las entidades agregadas, eliminadas y cambiadas.
+    """
+    # Las entidades idénticas se cancelan por su hash, sin comparar claves
+    conteo = defaultdict(list)
+    for entidad in modificadas:
+        conteo[hash_entidad(entidad)].append(entidad)
+    pendientes_a = []
+    for entidad in originales:
+        iguales = conteo.get(hash_entidad(entidad))
+        if iguales:
+            iguales.pop()
+        else:
+            pendientes_a.append(entidad)
+    pendientes_b = [e for lista in conteo.values() for e in lista]
+
+    cambiadas = []
+    for clave in (_identidad, _classname):
+        if not pendientes_a or not pendientes_b:
+            break
+        pares, pendientes_a, pendientes_b = _emparejar(pendientes_a, pendientes_b, clave)
+        cambiadas.extend(_diferencia_claves(a, b) for a, b in pares)
+
+    return {
+        "agregadas": [_resumen(e) for e in pendientes_b],
+        "eliminadas": [_resumen(e) for e in pendientes_a],
+        "cambiadas": cambiadas,
+    }
+
+def _leer_entidades(ruta):
+    # Se comparan minificadas: ents_modificados/ se escribe así y quitar valores por
+    # defecto o espacios no es un cambio que el motor note
+    if not os.path.isfile(ruta):
+        return None
+    with open(ruta, 'r', encoding='utf-8', errors='replace') as f:
+        return minificador.minificar_entidades(parsing.parse_entities(f.read()))
+
+def diferencias_mapa(args):
+    """
+    Compara el .ent original y el modificado de un mapa. Recibe una tupla
+    (mapa, ents_dir, modificados_dir) para poder usarse con un pool de procesos.
+    """
+    mapa, ents_dir, modificados_dir = args
+    originales = _leer_entidades(os.path.join(ents_dir, f"{mapa}.ent"))
+    modificadas = _leer_entidades(os.path.join(modificados_dir, f"{mapa}.ent"))
+    resultado = {"mapa": mapa}
+    if originales is None or modificadas is None:
+        resultado["error"] = "falta el .ent original" if originales is None else "falta el .ent modificado"
+        return resultado
+    resultado.update(diferencias_entidades(originales, modificadas))
+    return resultado
+
+def diferencias_rotacion(ents_dir, modificados_dir, mapas=None, procesos=None):
+    """
+    Compara todos los mapas de 'modificados_dir' (o los indicados en 'mapas') contra sus
+    originales en 'ents_dir'. Con muchos mapas el trabajo se reparte en un pool de procesos.
+    Devuelve una lista de resultados por mapa, ordenada por nombre.
+    """
+    if mapas is None:
+        mapas = sorted(os.path.splitext(f)[0] for f in os.listdir(modificados_dir) if f.lower().endswith('.ent'))
+    tareas = [(mapa, ents_dir, modificados_dir) for mapa in mapas]
+    if len(tareas) < MIN_MAPAS_PARALELO or procesos == 1:
+        return [diferencias_mapa(t) for t in tareas]
+    # 'spawn': con fork los procesos heredarían los hilos y locks tomados de la interfaz y del planificador
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return list(executor.map(diferencias_mapa, tareas, chunksize=8))
+
+def hay_cambios(resultado):
+    return bool(resultado.get("error") or resultado["agregadas"] or resultado["eliminadas"] or resultado["cambiadas"])
+
+def formatear_diferencias(resultados):
+    """
+    Devuelve un texto legible con las diferencias, solo de los mapas que cambiaron.
+    """
+    lineas = []
+    for r in resultados:
+        if not hay_cambios(r):
+            continue
+        lineas.append(f"== {r['mapa']}")
+        if r.get("error"):
+            lineas.append(f"   error: {r['error']}")
+            continue
+        for e in r["agregadas"]:
+            lineas.append(f"   + {e['classname']} {e['claves']}")
+        for e in r["eliminadas"]:
+            lineas.append(f"   - {e['classname']} {e['claves']}")
+        for c in r["cambiadas"]:
+            lineas.append(f"   ~ {c['classname']} {c['identidad']}")
+            for k, v in c["agregadas"].items():
+                lineas.append(f"       + {k} = {v}")
+            for k, v in c["eliminadas"].items():
+                lineas.append(f"       - {k} = {v}")
+            for k, (a, b) in c["modificadas"].items():
+                lineas.append(f"       ~ {k}: {a} -> {b}")
+    return "\n".join(lineas)
@@ -1,13 +1,35 @@
 import os
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Los subcomandos de línea de comandos no usan la interfaz: se despachan antes de cargarla
+    import cli
+    sys.exit(cli.ejecutar_cli(sys.argv[1:]))
+
+import atexit
 import tkinter as tk
-from tkinter import scrolledtext, messagebox, ttk
-import threading
+from tkinter import scrolledtext, messagebox, ttk, filedialog
+import queue
+import re
+import time
 
 import rcon_ftp
 import parsing
 import server_list
+import server_log
+import ent_diff
+import reglas
+import assets
+import rcon_script
+import snapshots
+import minificador
+import sesiones_rcon
+import verificador_bsp
+import tiempos_carga
+import rotacion_dinamica
+import trabajos
 
-def crear_pestana_ftp(notebook):
+def crear_pestana_ftp(notebook, planificador):
     # Cargar configuración desde herramienta.ini
     parametros = rcon_ftp.cargar_configuracion()
 
@@ -56,18 +78,115 @@ def crear_pestana_ftp(notebook):
             messagebox.showerror("Error", "Todos los campos son obligatorios.")
             return
 
-        def proceso_subida():
-            cuadro_estado.insert(tk.END, f"Iniciando carga de archivos...\n")
-            cuadro_estado.see(tk.END)
-            rcon_ftp.subir_varios_archivos_sftp(ip, puerto, usuario, contrasena, ruta, cuadro_estado)
+        subir = rcon_ftp.subir_paquete_sftp if modo_paquete.get() else rcon_ftp.subir_varios_archivos_sftp
+
+        def proceso_subida(trabajo):
+            salida = trabajo.salida(cuadro_estado)
+            salida.insert(tk.END, f"Iniciando carga de archivos...\n")
+            return subir(ip, puerto, usuario, contrasena, ruta, salida, trabajo)
 
-        hilo = threading.Thread(target=proceso_subida)
-        hilo.start()
+        if planificador.enviar(f"Subida a {ip}", proceso_subida) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
 
     boton_subir = tk.Button(pestaña_ftp, text="Subir Archivos", command=ejecutar_subida)
     boton_subir.grid(row=4, column=3, columnspan=2, pady=20)
 
-def crear_pestana_rcon(notebook):
+    # Modo paquete: un único tar.gz extraído en el servidor en lugar de un sftp.put por archivo
+    modo_paquete = tk.BooleanVar(value=False)
+    check_paquete = tk.Checkbutton(pestaña_ftp, text="Modo paquete (tar.gz)", variable=modo_paquete)
+    check_paquete.grid(row=3, column=3, columnspan=2, sticky='w')
+
+    # Despliegue en flota: una fila de progreso por servidor definido en herramienta.ini
+    perfiles, concurrencia = rcon_ftp.cargar_perfiles()
+
+    tk.Label(pestaña_ftp, text=f"Flota ({len(perfiles)} servidores, máx. {concurrencia} simultáneos):").grid(
+        row=6, column=0, columnspan=2, padx=10, pady=5, sticky='w'
+    )
+    columnas_flota = ("Servidor", "Estado", "Último mensaje")
+    treeview_flota = ttk.Treeview(pestaña_ftp, columns=columnas_flota, show='headings', height=8)
+    treeview_flota.heading("Servidor", text="Servidor")
+    treeview_flota.heading("Estado", text="Estado")
+    treeview_flota.heading("Último mensaje", text="Último mensaje")
+    treeview_flota.column("Servidor", width=150, anchor='center')
+    treeview_flota.column("Estado", width=100, anchor='center')
+    treeview_flota.column("Último mensaje", width=420, anchor='w')
+    treeview_flota.grid(row=7, column=0, columnspan=2, padx=10, pady=5)
+
+    filas_flota = {}
+    for nombre in perfiles:
+        filas_flota[nombre] = treeview_flota.insert('', 'end', values=(nombre, "-", ""))
+
+    cola_flota = queue.Queue()
+
+    def drenar_cola_flota():
+        # Los hilos de la flota solo escriben en la cola; la interfaz se actualiza aquí, en el hilo de Tk
+        while True:
+            try:
+                tipo, nombre, texto = cola_flota.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "estado":
+                treeview_flota.set(filas_flota[nombre], "Estado", texto)
+            elif tipo == "mensaje" and texto.strip():
+                treeview_flota.set(filas_flota[nombre], "Último mensaje", texto.strip())
+            elif tipo == "fin":
+                correctos = [n for n, ok in texto.items() if ok]
+                fallidos = [n for n, ok in texto.items() if not ok]
+                cuadro_estado.insert(tk.END, f"Despliegue en flota terminado: {len(correctos)} correctos, {len(fallidos)} con errores.\n")
+                if fallidos:
+                    cuadro_estado.insert(tk.END, f"Servidores con errores: {', '.join(fallidos)}\n")
+                cuadro_estado.see(tk.END)
+                boton_flota.configure(state='normal')
+        pestaña_ftp.after(100, drenar_cola_flota)
+
+    def ejecutar_despliegue_flota():
+        if not perfiles:
+            messagebox.showerror("Error", "No hay servidores definidos en herramienta.ini.")
+            return
+        paquete = modo_paquete.get()
+        trabajo = planificador.enviar(
+            "Despliegue en flota",
+            lambda trabajo: rcon_ftp.desplegar_flota(perfiles, cola_flota, concurrencia, paquete, trabajo)
+        )
+        if trabajo is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+            return
+        boton_flota.configure(state='disabled')
+        cuadro_estado.insert(tk.END, f"Iniciando despliegue en {len(perfiles)} servidores...\n")
+        cuadro_estado.see(tk.END)
+
+    boton_flota = tk.Button(pestaña_ftp, text="Desplegar en flota", command=ejecutar_despliegue_flota)
+    boton_flota.grid(row=7, column=3, columnspan=2, pady=20)
+
+    def ejecutar_despliegue_version():
+        ip = entrada_ip.get()
+        puerto = entrada_puerto.get()
+        usuario = entrada_usuario.get()
+        contrasena = entrada_contrasena.get()
+        ruta = entrada_ruta.get()
+
+        if not all([ip, puerto, usuario, contrasena, ruta]):
+            messagebox.showerror("Error", "Todos los campos son obligatorios.")
+            return
+        build_id = snapshots.version_actual(os.path.dirname(os.path.abspath(__file__)))
+        if not build_id:
+            messagebox.showerror("Error", "No hay ninguna versión generada.")
+            return
+
+        def proceso_despliegue(trabajo):
+            return rcon_ftp.desplegar_snapshot(ip, puerto, usuario, contrasena, ruta, build_id,
+                                               trabajo.salida(cuadro_estado), trabajo)
+
+        if planificador.enviar(f"Versión {build_id} a {ip}", proceso_despliegue) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Desplegar la versión actual del almacén enviando solo los objetos que le faltan al servidor
+    boton_version = tk.Button(pestaña_ftp, text="Desplegar versión actual", command=ejecutar_despliegue_version)
+    boton_version.grid(row=5, column=3, columnspan=2, pady=20)
+
+    drenar_cola_flota()
+
+def crear_pestana_rcon(notebook, planificador, perfilador=None):
     # Cargar configuración desde herramienta.ini
     parametros = rcon_ftp.cargar_configuracion()
 
@@ -98,10 +217,52 @@ def crear_pestana_rcon(notebook):
     boton_reiniciar = tk.Button(pestana_rcon, text="Reiniciar Servidor")
     boton_reiniciar.grid(row=3, column=2, padx=10, pady=10)
 
-    # Conectar cliente SSH
+    boton_secuencia = tk.Button(pestana_rcon, text="Ejecutar secuencia (;)")
+    boton_secuencia.grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
+    boton_script = tk.Button(pestana_rcon, text="Ejecutar script...")
+    boton_script.grid(row=4, column=2, padx=10, pady=5)
+
+    # Búsqueda en las sesiones grabadas
+    busqueda_label = tk.Label(pestana_rcon, text="Buscar en sesiones:")
+    busqueda_label.grid(row=5, column=0, padx=10, pady=5, sticky="w")
+
+    cuadro_busqueda = tk.Entry(pestana_rcon, width=60)
+    cuadro_busqueda.grid(row=5, column=1, padx=10, pady=5, sticky="w")
+
+    frame_ventana = tk.Frame(pestana_rcon)
+    frame_ventana.grid(row=6, column=1, padx=10, pady=5, sticky="w")
+    tk.Label(frame_ventana, text="Desde (AAAA-MM-DD HH:MM):").pack(side='left')
+    cuadro_desde = tk.Entry(frame_ventana, width=17)
+    cuadro_desde.pack(side='left', padx=5)
+    tk.Label(frame_ventana, text="Hasta:").pack(side='left')
+    cuadro_hasta = tk.Entry(frame_ventana, width=17)
+    cuadro_hasta.pack(side='left', padx=5)
+
+    boton_buscar = tk.Button(pestana_rcon, text="Buscar / Reproducir")
+    boton_buscar.grid(row=6, column=2, padx=10, pady=5)
+
+    # Rotación automática según la cantidad de jugadores
+    estado_rotacion = tk.Label(pestana_rcon, text="Rotación por jugadores: detenida.")
+    estado_rotacion.grid(row=7, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+    boton_rotacion = tk.Button(pestana_rcon, text="Iniciar rotación por jugadores")
+    boton_rotacion.grid(row=7, column=2, padx=10, pady=5)
+
+    # Conectar cliente SSH; los oyentes reciben todo lo que llega de la consola
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    directorio_sesiones = os.path.join(script_dir, sesiones_rcon.DIRECTORIO_SESIONES)
+    grabador = sesiones_rcon.GrabadorSesion(directorio_sesiones)
+    # Al cerrar la ventana se graba el bloque en curso y la última línea incompleta
+    atexit.register(grabador.cerrar)
+    oyentes_rcon = [grabador]
+    if perfilador:
+        oyentes_rcon.append(perfilador)
     cliente_ssh = rcon_ftp.conectar_rcon(
-        parametros['ip'], parametros['puerto'], parametros['usuario'], parametros['password'], cuadro_estado_rcon
+        parametros['ip'], parametros['puerto'], parametros['usuario'], parametros['password'],
+        planificador.salida(cuadro_estado_rcon), oyentes_rcon
     )
+    ejecutor = rcon_script.EjecutorComandos(cliente_ssh, oyentes_rcon) if cliente_ssh else None
 
     # Función para enviar comandos
     def enviar_comando():
@@ -113,6 +274,8 @@ def crear_pestana_rcon(notebook):
             cuadro_estado_rcon.insert(tk.END, "Error: No se ha ingresado un comando.\n")
             return
         cliente_ssh.sendall((comando + "\n").encode('utf-8'))
+        if perfilador:
+            perfilador.comando_enviado(comando)
         cuadro_comando.delete(0, tk.END)
         cuadro_estado_rcon.insert(tk.END, f"> {comando}\n")
 
@@ -124,12 +287,254 @@ def crear_pestana_rcon(notebook):
         cliente_ssh.sendall("quit\n".encode('utf-8'))
         cuadro_estado_rcon.insert(tk.END, "Servidor reiniciado.\n")
 
+    def ejecutar_comandos(comandos, nombre):
+        if not ejecutor:
+            cuadro_estado_rcon.insert(tk.END, "Error: No hay conexión SSH activa.\n")
+            return
+        if not comandos:
+            cuadro_estado_rcon.insert(tk.END, "Error: No se ha ingresado un comando.\n")
+            return
+
+        def proceso_comandos(trabajo):
+            if perfilador:
+                for comando in comandos:
+                    perfilador.comando_enviado(comando)
+            resultados = ejecutor.ejecutar(comandos)
+            trabajo.salida(cuadro_estado_rcon).insert(tk.END, "\n" + rcon_script.formatear_resultados(resultados) + "\n")
+            return resultados
+
+        if planificador.enviar(nombre, proceso_comandos) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Ejecuta los comandos separados por ';' y muestra la respuesta de cada uno
+    def ejecutar_secuencia():
+        comandos = rcon_script.leer_script(cuadro_comando.get())
+        cuadro_comando.delete(0, tk.END)
+        ejecutar_comandos(comandos, "Secuencia RCON")
+
+    def ejecutar_script():
+        archivo = filedialog.askopenfilename(title="Selecciona un script de comandos",
+                                             filetypes=[("Scripts", "*.txt *.cfg"), ("Todos", "*.*")])
+        if not archivo:
+            return
+        with open(archivo, 'r', encoding='utf-8') as f:
+            comandos = rcon_script.leer_script(f.read())
+        ejecutar_comandos(comandos, f"Script {os.path.basename(archivo)}")
+
+    # Busca texto en las sesiones grabadas o, sin texto, reproduce la ventana de tiempo indicada
+    def buscar_sesiones():
+        try:
+            desde = sesiones_rcon.leer_hora(cuadro_desde.get())
+            hasta = sesiones_rcon.leer_hora(cuadro_hasta.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        texto = cuadro_busqueda.get().strip()
+        if not texto and desde is None and hasta is None:
+            messagebox.showwarning("Advertencia", "Indica un texto o una ventana de tiempo.")
+            return
+
+        ventana = tk.Toplevel(pestana_rcon)
+        ventana.title(f"Sesiones RCON: {texto or 'reproducción'}")
+        cuadro_resultados = scrolledtext.ScrolledText(ventana, width=120, height=30, bg="black", fg="#00FF00")
+        cuadro_resultados.pack(fill='both', expand=True)
+
+        def proceso_busqueda(trabajo):
+            # Guardar el bloque en curso para que la búsqueda incluya lo más reciente
+            grabador.vaciar()
+            inicio = time.monotonic()
+            lineas = sesiones_rcon.buscar(directorio_sesiones, desde, hasta, texto or None)
+            salida = trabajo.salida(cuadro_resultados)
+            salida.insert(tk.END, sesiones_rcon.formatear_lineas(lineas) + "\n")
+            salida.insert(tk.END, f"\n{len(lineas)} líneas en {(time.monotonic() - inicio) * 1000:.0f} ms.\n")
+
+        if planificador.enviar("Búsqueda en sesiones RCON", proceso_busqueda) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    rotador = None
+
+    # Inicia o detiene el rotador; los mapas son los de la versión actual de la rotación generada
+    def alternar_rotacion():
+        nonlocal rotador
+        if rotador and rotador.activo():
+            rotador.detener()
+            boton_rotacion.configure(text="Iniciar rotación por jugadores")
+            estado_rotacion.configure(text="Rotación por jugadores: detenida.")
+            return
+        if not ejecutor:
+            cuadro_estado_rcon.insert(tk.END, "Error: No hay conexión SSH activa.\n")
+            return
+        modificados_dir = os.path.join(script_dir, 'ents_modificados')
+        build_id = snapshots.version_actual(script_dir)
+        if build_id:
+            mapas = snapshots.cargar_manifiesto(script_dir, build_id)["mapas"]
+        elif os.path.isdir(modificados_dir):
+            mapas = [os.path.splitext(f)[0] for f in sorted(os.listdir(modificados_dir)) if f.lower().endswith('.ent')]
+        else:
+            mapas = []
+        parametros = rcon_ftp.cargar_configuracion()
+        maxclients = rcon_ftp.leer_entero(parametros, "maxclients", rotacion_dinamica.MAXCLIENTS)
+        intervalo = rcon_ftp.leer_entero(parametros, "intervalo_rotacion", int(rotacion_dinamica.INTERVALO_CONSULTA))
+        try:
+            rotador = rotacion_dinamica.RotadorCarga(
+                ejecutor, rotacion_dinamica.capacidades_rotacion(modificados_dir, mapas, maxclients), maxclients,
+                parametros["comando_rotacion"] or rotacion_dinamica.COMANDO_SIGUIENTE, intervalo,
+                patron_fin=parametros["patron_fin_nivel"] or rotacion_dinamica.PATRON_FIN_NIVEL
+            )
+        except re.error as e:
+            messagebox.showerror("Error", f"patron_fin_nivel no es una expresión regular válida: {e}")
+            return
+        except ValueError as e:
+            messagebox.showerror("Error", f"{e} Genera la rotación en la pestaña View Entities.")
+            return
+        rotador.iniciar()
+        boton_rotacion.configure(text="Detener rotación por jugadores")
+        cuadro_estado_rcon.insert(tk.END, f"Rotación por jugadores iniciada con {len(rotador.capacidades)} mapas.\n")
+        refrescar_rotacion()
+
+    def refrescar_rotacion():
+        if not rotador or not rotador.activo():
+            return
+        if rotador.ultimo_error:
+            texto = f"Rotación por jugadores: error al consultar el servidor ({rotador.ultimo_error})."
+        elif rotador.elegido:
+            texto = (f"Rotación por jugadores: {rotador.elegido[1]} jugadores en {rotador.mapa_actual or '?'}, "
+                     f"próximo mapa {rotador.elegido[0]}.")
+        else:
+            texto = "Rotación por jugadores: consultando el servidor..."
+        estado_rotacion.configure(text=texto)
+        pestana_rcon.after(1000, refrescar_rotacion)
+
     # Asociar funciones a botones
     boton_enviar.configure(command=enviar_comando)
     boton_reiniciar.configure(command=reiniciar_servidor)
+    boton_secuencia.configure(command=ejecutar_secuencia)
+    boton_script.configure(command=ejecutar_script)
+    boton_buscar.configure(command=buscar_sesiones)
+    boton_rotacion.configure(command=alternar_rotacion)
 
     return pestana_rcon
 
+def crear_pestana_estadisticas(notebook):
+    """
+    Crea la pestaña de estadísticas, alimentada por el seguimiento del log de consola del servidor.
+    """
+    parametros = rcon_ftp.cargar_configuracion()
+    seguidor = server_log.SeguidorLog(parametros, parametros["ruta_log"])
+
+    pestana_stats = ttk.Frame(notebook)
+    notebook.add(pestana_stats, text='Estadísticas')
+
+    estado_label = tk.Label(pestana_stats, text="Seguimiento del log detenido.")
+    estado_label.grid(row=0, column=0, padx=10, pady=5, sticky='w')
+
+    # Tabla de estadísticas por mapa
+    columnas_mapas = ("Mapa", "Partidas", "Muertes", "Entradas", "Mensajes")
+    treeview_mapas = ttk.Treeview(pestana_stats, columns=columnas_mapas, show='headings', height=12)
+    for columna in columnas_mapas:
+        treeview_mapas.heading(columna, text=columna)
+        treeview_mapas.column(columna, width=200 if columna == "Mapa" else 90, anchor='center')
+    treeview_mapas.grid(row=1, column=0, padx=10, pady=5, sticky='n')
+
+    # Tabla de estadísticas por jugador
+    columnas_jugadores = ("Jugador", "Bajas", "Muertes", "Entradas", "Mensajes")
+    treeview_jugadores = ttk.Treeview(pestana_stats, columns=columnas_jugadores, show='headings', height=12)
+    for columna in columnas_jugadores:
+        treeview_jugadores.heading(columna, text=columna)
+        treeview_jugadores.column(columna, width=200 if columna == "Jugador" else 90, anchor='center')
+    treeview_jugadores.grid(row=1, column=1, padx=10, pady=5, sticky='n')
+
+    # Últimos eventos
+    cuadro_eventos = scrolledtext.ScrolledText(pestana_stats, width=140, height=15, font=("Consolas", 10))
+    cuadro_eventos.grid(row=2, column=0, columnspan=2, padx=10, pady=5)
+
+    def refrescar():
+        resumen = seguidor.estadisticas.resumen()
+        for item in treeview_mapas.get_children():
+            treeview_mapas.delete(item)
+        for nombre, fila in sorted(resumen["mapas"].items(), key=lambda x: -x[1]["partidas"]):
+            treeview_mapas.insert('', 'end', values=(nombre, fila["partidas"], fila["muertes"], fila["entradas"], fila["mensajes"]))
+        for item in treeview_jugadores.get_children():
+            treeview_jugadores.delete(item)
+        for nombre, fila in sorted(resumen["jugadores"].items(), key=lambda x: -x[1]["bajas"]):
+            treeview_jugadores.insert('', 'end', values=(nombre, fila["bajas"], fila["muertes"], fila["entradas"], fila["mensajes"]))
+        cuadro_eventos.delete('1.0', tk.END)
+        for evento in resumen["recientes"]:
+            hora = time.strftime("%H:%M:%S", time.localtime(evento.tiempo))
+            detalle = " ".join(f"{k}={v}" for k, v in evento.datos.items())
+            cuadro_eventos.insert(tk.END, f"[{hora}] {evento.tipo:<8} {evento.mapa or '-':<16} {detalle}\n")
+        cuadro_eventos.see(tk.END)
+
+        if seguidor.error:
+            estado_label.configure(text=f"Error en el seguimiento: {seguidor.error}")
+        elif seguidor.activo():
+            estado_label.configure(text=f"Siguiendo {parametros['ruta_log']} (offset {seguidor.offset}), mapa actual: {resumen['mapa_actual'] or '-'}")
+        pestana_stats.after(2000, refrescar)
+
+    def alternar_seguimiento():
+        if seguidor.activo():
+            seguidor.detener()
+            estado_label.configure(text="Seguimiento del log detenido.")
+            boton_seguir.configure(text="Iniciar seguimiento")
+        else:
+            if not all([parametros["ip"], parametros["puerto"], parametros["usuario"], parametros["password"]]):
+                messagebox.showerror("Error", "Configura el servidor en herramienta.ini.")
+                return
+            seguidor.iniciar()
+            boton_seguir.configure(text="Detener seguimiento")
+
+    boton_seguir = tk.Button(pestana_stats, text="Iniciar seguimiento", command=alternar_seguimiento)
+    boton_seguir.grid(row=0, column=1, padx=10, pady=5, sticky='e')
+
+    refrescar()
+    return pestana_stats
+
+def crear_pestana_trabajos(notebook, planificador):
+    """
+    Crea la pestaña con la cola de trabajos en segundo plano, su progreso y la opción de cancelarlos.
+    """
+    pestana_trabajos = ttk.Frame(notebook)
+    notebook.add(pestana_trabajos, text='Trabajos')
+
+    tk.Label(pestana_trabajos, text=f"Trabajos en segundo plano (máx. {planificador.max_hilos} simultáneos)",
+             font=("Arial", 14)).pack(pady=10)
+
+    columnas = ("ID", "Trabajo", "Estado", "Progreso")
+    treeview_trabajos = ttk.Treeview(pestana_trabajos, columns=columnas, show='headings', height=20)
+    treeview_trabajos.heading("ID", text="ID")
+    treeview_trabajos.heading("Trabajo", text="Trabajo")
+    treeview_trabajos.heading("Estado", text="Estado")
+    treeview_trabajos.heading("Progreso", text="Progreso")
+    treeview_trabajos.column("ID", width=60, anchor='center')
+    treeview_trabajos.column("Trabajo", width=400, anchor='w')
+    treeview_trabajos.column("Estado", width=120, anchor='center')
+    treeview_trabajos.column("Progreso", width=120, anchor='center')
+    treeview_trabajos.pack(pady=5, padx=20, fill='both', expand=True)
+
+    filas = {}
+
+    def actualizar_fila(trabajo):
+        actual, total = trabajo.progreso
+        progreso = f"{actual}/{total}" if total else "-"
+        valores = (trabajo.id, trabajo.nombre, trabajo.estado, progreso)
+        if trabajo.id in filas and treeview_trabajos.exists(filas[trabajo.id]):
+            treeview_trabajos.item(filas[trabajo.id], values=valores)
+        else:
+            filas[trabajo.id] = treeview_trabajos.insert('', 0, values=valores)
+
+    def cancelar_seleccionado():
+        seleccion = treeview_trabajos.selection()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Selecciona un trabajo para cancelar.")
+            return
+        for item in seleccion:
+            planificador.cancelar(int(treeview_trabajos.item(item, 'values')[0]))
+
+    tk.Button(pestana_trabajos, text="Cancelar trabajo", command=cancelar_seleccionado,
+              font=("Arial", 12), bg="#f44336", fg="white", padx=10, pady=5).pack(pady=10)
+
+    return actualizar_fila
+
 
 def crear_interfaz():
     """
@@ -144,6 +549,10 @@ def crear_interfaz():
     notebook = ttk.Notebook(ventana)
     notebook.pack(expand=True, fill='both')
 
+    # Planificador de trabajos en segundo plano compartido por todas las pestañas
+    parametros = rcon_ftp.cargar_configuracion()
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=rcon_ftp.leer_entero(parametros, "max_trabajos", 2))
+
     # Pestaña 1: Batch Processing
     pestaña_batch = ttk.Frame(notebook)
     notebook.add(pestaña_batch, text='Batch Processing')
@@ -165,7 +574,7 @@ def crear_interfaz():
     boton_ejecutar_batch = tk.Button(
         pestaña_batch,
         text="Ejecutar dump de entidades por lotes",
-        command=lambda: parsing.ejecutar_dump_batch(text_area_batch, treeview_entidades, maps_dir, ents_dir),
+        command=lambda: parsing.ejecutar_dump_batch(text_area_batch, treeview_entidades, maps_dir, ents_dir, planificador),
         font=("Arial", 12),
         bg="#4CAF50",
         fg="white",
@@ -174,6 +583,119 @@ def crear_interfaz():
     )
     boton_ejecutar_batch.pack(pady=10)
 
+    def ejecutar_extraccion_remota():
+        parametros = rcon_ftp.cargar_configuracion()
+        if not all([parametros["ip"], parametros["puerto"], parametros["usuario"], parametros["password"]]):
+            messagebox.showerror("Error", "Configura el servidor en herramienta.ini.")
+            return
+        text_area_batch.delete('1.0', tk.END)
+
+        def proceso_extraccion(trabajo):
+            return rcon_ftp.extraer_entidades_remotas(
+                parametros["ip"], parametros["puerto"], parametros["usuario"], parametros["password"],
+                parametros["ruta_principal"], ents_dir, trabajo.salida(text_area_batch), trabajo=trabajo
+            )
+
+        def terminar(trabajo):
+            parsing.actualizar_lista_entidades(treeview_entidades, maps_dir, ents_dir, text_area_view)
+            trabajos.notificar_fin(trabajo, "Completado", "Extracción de entidades del servidor completada.")
+
+        if planificador.enviar("Extracción remota de entidades", proceso_extraccion, al_terminar=terminar) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Botón para extraer entidades directamente de los mapas del servidor
+    boton_extraccion_remota = tk.Button(
+        pestaña_batch,
+        text="Extraer entidades de los mapas del servidor",
+        command=ejecutar_extraccion_remota,
+        font=("Arial", 12),
+        bg="#607D8B",
+        fg="white",
+        padx=10,
+        pady=5
+    )
+    boton_extraccion_remota.pack(pady=5)
+
+    def ejecutar_analisis_recursos(construir):
+        # Mapas de la rotación personalizada o, si está vacía, todos los de 'maps'
+        mapas = custom_listbox.get(0, tk.END)
+        if mapas:
+            bsp_paths = [os.path.join(maps_dir, f"{m}.bsp") for m in mapas]
+        elif os.path.isdir(maps_dir):
+            bsp_paths = [os.path.join(maps_dir, f) for f in sorted(os.listdir(maps_dir)) if f.lower().endswith('.bsp')]
+        else:
+            bsp_paths = []
+        faltantes = [p for p in bsp_paths if not os.path.isfile(p)]
+        if not bsp_paths or faltantes:
+            messagebox.showerror("Error", f"No se encontraron los .bsp de la rotación en {maps_dir}.")
+            return
+
+        salida_pak = None
+        if construir:
+            salida_pak = filedialog.asksaveasfilename(title="Guardar pak de la rotación", defaultextension=".pak",
+                                                      filetypes=[("Archivos PAK", "*.pak")], initialdir=script_dir)
+            if not salida_pak:
+                return
+
+        parametros = rcon_ftp.cargar_configuracion()
+        dirs_juego = [d.strip() for d in parametros["dirs_recursos"].split(",") if d.strip()] or [script_dir]
+        excluidos = [p.strip() for p in parametros["paks_excluidos"].split(",") if p.strip()]
+        text_area_batch.delete('1.0', tk.END)
+
+        def proceso_recursos(trabajo):
+            salida = trabajo.salida(text_area_batch)
+            analisis = assets.analizar_rotacion(bsp_paths, dirs_juego, os.path.join(script_dir, assets.ARCHIVO_CACHE))
+            salida.insert(tk.END, assets.formatear_analisis(analisis) + "\n")
+            if salida_pak:
+                trabajo.verificar()
+                cantidad = assets.construir_pak(salida_pak, analisis, bsp_paths, excluidos)
+                salida.insert(tk.END, f"Pak generado: {salida_pak} ({cantidad} archivos)\n")
+
+        if planificador.enviar("Análisis de recursos", proceso_recursos,
+                               al_terminar=lambda t: trabajos.notificar_fin(t, "Completado", "Análisis de recursos completado.")) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Botones para analizar los recursos de la rotación y armar un pak para distribuir
+    frame_recursos = tk.Frame(pestaña_batch)
+    frame_recursos.pack(pady=5)
+    tk.Button(frame_recursos, text="Analizar recursos de la rotación", command=lambda: ejecutar_analisis_recursos(False),
+              font=("Arial", 12), bg="#009688", fg="white", padx=10, pady=5).pack(side='left', padx=5)
+    tk.Button(frame_recursos, text="Construir pak de la rotación", command=lambda: ejecutar_analisis_recursos(True),
+              font=("Arial", 12), bg="#009688", fg="white", padx=10, pady=5).pack(side='left', padx=5)
+
+    def ejecutar_verificacion(comparar):
+        bsp_paths = [os.path.join(maps_dir, f) for f in sorted(os.listdir(maps_dir)) if f.lower().endswith('.bsp')] if os.path.isdir(maps_dir) else []
+        if not bsp_paths:
+            messagebox.showerror("Error", f"No se encontraron archivos .bsp en {maps_dir}.")
+            return
+        parametros = rcon_ftp.cargar_configuracion()
+        if comparar and not all([parametros["ip"], parametros["puerto"], parametros["usuario"], parametros["password"]]):
+            messagebox.showerror("Error", "Configura el servidor en herramienta.ini.")
+            return
+        text_area_batch.delete('1.0', tk.END)
+        ruta_cache = os.path.join(script_dir, verificador_bsp.ARCHIVO_CACHE)
+
+        def proceso_verificacion(trabajo):
+            salida = trabajo.salida(text_area_batch)
+            resultados = verificador_bsp.verificar_mapas(bsp_paths, ruta_cache)
+            salida.insert(tk.END, verificador_bsp.formatear_verificacion(resultados) + "\n")
+            if comparar:
+                trabajo.verificar()
+                rcon_ftp.comparar_mapas_remotos(parametros["ip"], parametros["puerto"], parametros["usuario"], parametros["password"],
+                                                parametros["ruta_principal"], resultados, salida, ruta_cache, trabajo)
+
+        if planificador.enviar("Verificación de mapas", proceso_verificacion,
+                               al_terminar=lambda t: trabajos.notificar_fin(t, "Completado", "Verificación de mapas completada.")) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Botones para validar los .bsp y compararlos con los del servidor
+    frame_verificacion = tk.Frame(pestaña_batch)
+    frame_verificacion.pack(pady=5)
+    tk.Button(frame_verificacion, text="Verificar integridad de los mapas", command=lambda: ejecutar_verificacion(False),
+              font=("Arial", 12), bg="#795548", fg="white", padx=10, pady=5).pack(side='left', padx=5)
+    tk.Button(frame_verificacion, text="Comparar mapas con el servidor", command=lambda: ejecutar_verificacion(True),
+              font=("Arial", 12), bg="#795548", fg="white", padx=10, pady=5).pack(side='left', padx=5)
+
     # Área de texto para mostrar mensajes de Batch Processing
     text_area_batch = scrolledtext.ScrolledText(pestaña_batch, width=140, height=30, font=("Consolas", 10))
     text_area_batch.pack(pady=10)
@@ -187,7 +709,7 @@ def crear_interfaz():
     boton_ejecutar_single = tk.Button(
         pestaña_single,
         text="Ejecutar dump de entidades (Archivo Único)",
-        command=lambda: parsing.ejecutar_dump_single(text_area_single, treeview_entidades, maps_dir, ents_dir),
+        command=lambda: parsing.ejecutar_dump_single(text_area_single, treeview_entidades, maps_dir, ents_dir, planificador),
         font=("Arial", 12),
         bg="#2196F3",
         fg="white",
@@ -210,18 +732,20 @@ def crear_interfaz():
     frame_tree.pack(pady=5, padx=20, fill='both', expand=True)
 
     # Treeview para listar las entidades
-    columns = ("Archivo", "Estado", "Nombre del Mapa", "Nextmap Aliados", "Nextmap Nazis")
+    columns = ("Archivo", "Estado", "Nombre del Mapa", "Nextmap Aliados", "Nextmap Nazis", "Carga p50 / p95")
     treeview_entidades = ttk.Treeview(frame_tree, columns=columns, show='headings')
     treeview_entidades.heading("Archivo", text="Archivo")
     treeview_entidades.heading("Estado", text="Estado")
     treeview_entidades.heading("Nombre del Mapa", text="Nombre del Mapa")
     treeview_entidades.heading("Nextmap Aliados", text="Nextmap Aliados")
     treeview_entidades.heading("Nextmap Nazis", text="Nextmap Nazis")
+    treeview_entidades.heading("Carga p50 / p95", text="Carga p50 / p95")
     treeview_entidades.column("Archivo", width=200, anchor='center')
     treeview_entidades.column("Estado", width=100, anchor='center')
     treeview_entidades.column("Nombre del Mapa", width=250, anchor='center')
     treeview_entidades.column("Nextmap Aliados", width=200, anchor='center')
     treeview_entidades.column("Nextmap Nazis", width=200, anchor='center')
+    treeview_entidades.column("Carga p50 / p95", width=140, anchor='center')
     treeview_entidades.pack(side='left', fill='both', expand=True)
 
     # Scrollbar para el Treeview
@@ -306,11 +830,144 @@ def crear_interfaz():
     )
     boton_bajar.pack(pady=5)
 
+    def mostrar_diferencias(resultados):
+        # Panel de revisión: un nodo por mapa con las entidades agregadas, eliminadas y cambiadas
+        ventana_diff = tk.Toplevel(pestaña_view)
+        ventana_diff.title("Cambios entre ents y ents_modificados")
+        ventana_diff.geometry("900x600")
+        treeview_diff = ttk.Treeview(ventana_diff, columns=("Detalle",), show='tree headings')
+        treeview_diff.heading("#0", text="Mapa / Entidad")
+        treeview_diff.heading("Detalle", text="Detalle")
+        treeview_diff.column("#0", width=320)
+        treeview_diff.column("Detalle", width=540)
+        scrollbar_diff = ttk.Scrollbar(ventana_diff, orient=tk.VERTICAL, command=treeview_diff.yview)
+        treeview_diff.configure(yscrollcommand=scrollbar_diff.set)
+        scrollbar_diff.pack(side='right', fill='y')
+        treeview_diff.pack(side='left', fill='both', expand=True)
+
+        for r in resultados:
+            if not ent_diff.hay_cambios(r):
+                continue
+            if r.get("error"):
+                treeview_diff.insert('', 'end', text=r["mapa"], values=(r["error"],))
+                continue
+            resumen = f"+{len(r['agregadas'])}  -{len(r['eliminadas'])}  ~{len(r['cambiadas'])}"
+            nodo = treeview_diff.insert('', 'end', text=r["mapa"], values=(resumen,), open=False)
+            for e in r["agregadas"]:
+                treeview_diff.insert(nodo, 'end', text=f"+ {e['classname']}", values=(str(e["claves"]),))
+            for e in r["eliminadas"]:
+                treeview_diff.insert(nodo, 'end', text=f"- {e['classname']}", values=(str(e["claves"]),))
+            for c in r["cambiadas"]:
+                hijo = treeview_diff.insert(nodo, 'end', text=f"~ {c['classname']}", values=(str(c["identidad"]),))
+                for k, v in c["agregadas"].items():
+                    treeview_diff.insert(hijo, 'end', text=f"+ {k}", values=(v,))
+                for k, v in c["eliminadas"].items():
+                    treeview_diff.insert(hijo, 'end', text=f"- {k}", values=(v,))
+                for k, (a, b) in c["modificadas"].items():
+                    treeview_diff.insert(hijo, 'end', text=f"~ {k}", values=(f"{a} -> {b}",))
+        if not treeview_diff.get_children():
+            treeview_diff.insert('', 'end', text="Sin diferencias", values=("",))
+
+    def revisar_cambios():
+        modificados_dir = os.path.join(script_dir, 'ents_modificados')
+        if not os.path.isdir(modificados_dir):
+            messagebox.showwarning("Advertencia", "Todavía no se generaron ents modificados.")
+            return
+
+        def terminar(trabajo):
+            if trabajo.estado == trabajos.COMPLETADO:
+                mostrar_diferencias(trabajo.resultado)
+            else:
+                trabajos.notificar_fin(trabajo, "Completado", "")
+
+        if planificador.enviar("Diferencias de entidades",
+                               lambda trabajo: ent_diff.diferencias_rotacion(ents_dir, modificados_dir),
+                               al_terminar=terminar) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Botón para revisar los cambios antes de subir
+    boton_revisar = tk.Button(
+        frame_buttons,
+        text="Revisar cambios",
+        command=revisar_cambios,
+        font=("Arial", 12),
+        bg="#607D8B",
+        fg="white",
+        padx=10,
+        pady=5
+    )
+    boton_revisar.pack(pady=5)
+
+    def aplicar_reglas():
+        modificados_dir = os.path.join(script_dir, 'ents_modificados')
+        if not os.path.isdir(modificados_dir):
+            messagebox.showwarning("Advertencia", "Todavía no se generaron ents modificados.")
+            return
+        archivo_reglas = filedialog.askopenfilename(
+            title="Selecciona un archivo de reglas",
+            filetypes=[("Reglas JSON", "*.json")],
+            initialdir=script_dir
+        )
+        if not archivo_reglas:
+            return
+        try:
+            definicion = reglas.cargar_reglas(archivo_reglas)
+            reglas.compilar_reglas(definicion)
+        except Exception as e:
+            messagebox.showerror("Error", f"Reglas no válidas: {e}")
+            return
+
+        # Aplicar a los mapas de la lista personalizada o, si está vacía, a todos los generados
+        mapas = custom_listbox.get(0, tk.END) or [os.path.splitext(f)[0] for f in os.listdir(modificados_dir) if f.lower().endswith('.ent')]
+        rutas = [os.path.join(modificados_dir, f"{m}.ent") for m in mapas if os.path.isfile(os.path.join(modificados_dir, f"{m}.ent"))]
+        simular = simular_reglas.get()
+
+        def proceso_reglas(trabajo):
+            if simular:
+                return reglas.aplicar_reglas(definicion, rutas, simular) + (None,)
+            # Versión con los .ent tal como estaban, para poder deshacer la edición desde la lista de versiones
+            version_previa = reglas.respaldar_directorio(script_dir, modificados_dir)
+            resultados, totales = reglas.aplicar_reglas(definicion, rutas, simular)
+            reglas.respaldar_directorio(script_dir, modificados_dir)
+            return resultados, totales, version_previa
+
+        def terminar(trabajo):
+            if trabajo.estado == trabajos.COMPLETADO:
+                resultados, totales, version_previa = trabajo.resultado
+                text_area_view.insert(tk.END, reglas.formatear_resultado(resultados, totales, simular) + "\n")
+                if version_previa:
+                    text_area_view.insert(tk.END, f"Versión anterior guardada: {version_previa}\n")
+                    actualizar_versiones()
+                text_area_view.see(tk.END)
+            trabajos.notificar_fin(trabajo, "Completado", "Reglas procesadas." if not simular else "Simulación terminada.")
+
+        if planificador.enviar(f"Reglas {os.path.basename(archivo_reglas)}", proceso_reglas,
+                               al_terminar=terminar) is None:
+            messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+
+    # Botón para aplicar un archivo de reglas a los ents modificados
+    boton_reglas = tk.Button(
+        frame_buttons,
+        text="Aplicar reglas",
+        command=aplicar_reglas,
+        font=("Arial", 12),
+        bg="#795548",
+        fg="white",
+        padx=10,
+        pady=5
+    )
+    boton_reglas.pack(pady=5)
+
+    simular_reglas = tk.BooleanVar(value=True)
+    tk.Checkbutton(frame_buttons, text="Simulación", variable=simular_reglas).pack()
+
     # Botón para generar entidades modificadas
+    presupuesto_entidades = rcon_ftp.leer_entero(parametros, "presupuesto_entidades", minificador.MAX_MAP_ENTSTRING)
     boton_generar_modificados = tk.Button(
         pestaña_view,
         text="Generar Ents Modificados",
-        command=lambda: server_list.generar_ents_modificados(custom_listbox, ents_dir, os.path.join(script_dir, 'ents_modificados'), text_area_view),
+        command=lambda: server_list.generar_ents_modificados(custom_listbox, ents_dir, os.path.join(script_dir, 'ents_modificados'), text_area_view, planificador, actualizar_versiones,
+                                                             presupuesto_entidades),
         font=("Arial", 12),
         bg="#9C27B0",
         fg="white",
@@ -319,6 +976,43 @@ def crear_interfaz():
     )
     boton_generar_modificados.pack(pady=10)
 
+    # Versiones guardadas de la rotación: permite volver a cualquiera al instante
+    frame_versiones = tk.Frame(pestaña_view)
+    frame_versiones.pack(pady=5)
+
+    tk.Label(frame_versiones, text="Versión:", font=("Arial", 12)).pack(side='left', padx=5)
+    combo_versiones = ttk.Combobox(frame_versiones, width=70, state='readonly')
+    combo_versiones.pack(side='left', padx=5)
+
+    def actualizar_versiones():
+        actual = snapshots.version_actual(script_dir)
+        valores = []
+        for manifiesto in snapshots.listar_snapshots(script_dir):
+            fecha = time.strftime("%Y-%m-%d %H:%M", time.localtime(manifiesto["fecha"]))
+            marca = " (actual)" if manifiesto["id"] == actual else ""
+            valores.append(f"{manifiesto['id']}  {fecha}  {len(manifiesto['mapas'])} mapas{marca}")
+        combo_versiones.configure(values=valores)
+        if valores:
+            combo_versiones.current(0)
+
+    def restaurar_version():
+        seleccion = combo_versiones.get()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Selecciona una versión para restaurar.")
+            return
+        build_id = seleccion.split()[0]
+        try:
+            escritos = snapshots.restaurar_snapshot(script_dir, os.path.join(script_dir, 'ents_modificados'), build_id)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo restaurar la versión {build_id}: {e}")
+            return
+        text_area_view.insert(tk.END, f"Versión {build_id} restaurada ({escritos} archivos cambiados).\n")
+        text_area_view.see(tk.END)
+        actualizar_versiones()
+
+    tk.Button(frame_versiones, text="Restaurar", command=restaurar_version, font=("Arial", 12)).pack(side='left', padx=5)
+    tk.Button(frame_versiones, text="Actualizar", command=lambda: actualizar_versiones(), font=("Arial", 12)).pack(side='left', padx=5)
+
     # Obtener directorio donde se encuentra el script para la pestaña View Entities
     script_dir = os.path.dirname(os.path.abspath(__file__))
     maps_dir = os.path.join(script_dir, 'maps')
@@ -326,10 +1020,39 @@ def crear_interfaz():
 
     # Inicializar la lista de entidades al iniciar la aplicación
     parsing.actualizar_lista_entidades(treeview_entidades, maps_dir, ents_dir, text_area_view)
+    actualizar_versiones()
+
+    # Perfilador de tiempos de carga alimentado por la consola RCON
+    perfilador = tiempos_carga.PerfiladorCarga(os.path.join(script_dir, tiempos_carga.ARCHIVO_TIEMPOS))
+
+    estado_tiempos = None
+
+    def refrescar_tiempos_carga():
+        # Actualizar solo la columna de tiempos cuando el perfilador registró muestras nuevas
+        # o cuando se volvió a llenar la lista de entidades
+        nonlocal estado_tiempos
+        estado = (perfilador.version, treeview_entidades.get_children())
+        if estado != estado_tiempos:
+            estado_tiempos = estado
+            for item in treeview_entidades.get_children():
+                mapa = treeview_entidades.item(item, 'values')[0]
+                treeview_entidades.set(item, "Carga p50 / p95", tiempos_carga.formatear_resumen(perfilador.resumen(mapa)))
+        ventana.after(2000, refrescar_tiempos_carga)
+
+    refrescar_tiempos_carga()
 
     # Integrar la nueva pestaña de FTP
-    crear_pestana_ftp(notebook)
-    crear_pestana_rcon(notebook)
+    crear_pestana_ftp(notebook, planificador)
+    crear_pestana_rcon(notebook, planificador, perfilador)
+    crear_pestana_estadisticas(notebook)
+    actualizar_fila_trabajo = crear_pestana_trabajos(notebook, planificador)
+
+    def drenar_eventos():
+        # Aplicar por lotes los eventos publicados por los trabajos, siempre en el hilo de Tk
+        planificador.procesar_eventos(actualizar_fila_trabajo)
+        ventana.after(50, drenar_eventos)
+
+    drenar_eventos()
 
     ventana.mainloop()
 
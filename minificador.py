@@ -0,0 +1,67 @@
+import re
+
+# Tamaño máximo de la cadena de entidades que acepta el motor (MAX_MAP_ENTSTRING en qfiles.h)
+MAX_MAP_ENTSTRING = 0x40000
+# Claves cuyo valor es el que el motor asigna de todos modos si la clave no está
+VALORES_DEFECTO = {
+    "spawnflags": "0",
+    "angle": "0",
+    "angles": "0 0 0",
+    "delay": "0",
+}
+# Claves que el motor escribe en el mismo campo: "angle" fija la orientación que dio "angles"
+# (o al revés, según cuál venga después), así que un valor por defecto junto a la otra no es neutro
+CLAVES_RELACIONADAS = {"angle": "angles", "angles": "angle"}
+# Claves que nunca se eliminan aunque estén vacías
+CLAVES_OBLIGATORIAS = {"classname"}
+# Valores numéricos o vectores ("0 0 64") en los que se puede normalizar el espacio interno
+PATRON_NUMERICO = re.compile(r'^\s*-?[\d.]+(?:\s+-?[\d.]+)*\s*$')
+
+class PresupuestoExcedido(ValueError):
+    """
+    Uno o más mapas superan el tamaño máximo permitido para la cadena de entidades.
+    """
+
+def tamano_cadena(texto):
+    """
+    Bytes que ocupa la cadena de entidades en el lump, incluido el nulo final.
+    """
+    return len(texto.encode('utf-8')) + 1
+
+def minificar_entidades(entidades, valores_defecto=VALORES_DEFECTO):
+    """
+    Devuelve una copia de 'entidades' (listas de pares clave/valor) sin claves vacías ni con
+    su valor por defecto (salvo que la entidad tenga una clave relacionada), con los espacios de los valores numéricos normalizados y con una
+    sola aparición por clave. Como el motor se queda con el último valor de una clave
+    repetida, se conserva ese valor en la posición de la primera aparición.
+    """
+    resultado = []
+    for entidad in entidades:
+        valores = {}
+        orden = []
+        for clave, valor in entidad:
+            clave = clave.strip()
+            if PATRON_NUMERICO.match(valor):
+                valor = " ".join(valor.split())
+            if clave not in valores:
+                orden.append(clave)
+            valores[clave] = valor
+        nueva = []
+        for clave in orden:
+            valor = valores[clave]
+            if clave in CLAVES_OBLIGATORIAS:
+                pass
+            elif valor == "":
+                continue
+            elif valores_defecto.get(clave) == valor and CLAVES_RELACIONADAS.get(clave) not in valores:
+                continue
+            nueva.append((clave, valor))
+        resultado.append(nueva)
+    return resultado
+
+def formatear_tamano(mapa, antes, despues, presupuesto=MAX_MAP_ENTSTRING):
+    ahorro = (1 - despues / antes) * 100 if antes else 0
+    texto = f"{mapa}: {antes} -> {despues} bytes ({ahorro:.1f}% menos, {despues * 100 / presupuesto:.0f}% del máximo)"
+    if despues > presupuesto:
+        texto += f" EXCEDE EL MÁXIMO DE {presupuesto} bytes"
+    return texto
@@ -5,6 +5,8 @@ import struct
 import re
 from tkinter import filedialog
 
+import trabajos
+
 # Definiciones similares a las de C
 MAGIC = 0x50534249  # 'PSBI' en big endian, equivalente a 'IBSP' en little endian
 HEADERLEN = 4 * 40   # 160 bytes
@@ -20,6 +22,7 @@ class BSPFile:
         self.offsets = []
         self.lengths = []
         self.entities = b''
+        self.bytes_leidos = 0
 
     def read_int(self, data):
         """
@@ -31,33 +34,42 @@ class BSPFile:
         self.pos += 4
         return i
 
+    def parse_header(self, header):
+        """
+        Analiza el header de 160 bytes y llena los offsets y lengths de los 19 lumps.
+        Devuelve None si el header es válido o un mensaje de error.
+        """
+        if len(header) < HEADERLEN:
+            return f"Error: Header demasiado corto en {self.filename}"
+
+        self.pos = 0
+        check = self.read_int(header)
+        version = self.read_int(header)
+
+        if check != MAGIC:
+            return f"Archivo BSP inválido: {self.filename}"
+
+        # Leer 19 lumps (offsets y lengths) y ajustar los offsets restando HEADERLEN
+        self.offsets = []
+        self.lengths = []
+        for i in range(19):
+            offset = self.read_int(header) - HEADERLEN  # Ajuste aquí
+            length = self.read_int(header)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            # Puedes descomentar la siguiente línea para depuración
+            # print(f"Lump {i}: Offset={offset}, Length={length}")
+        return None
+
     def parse(self):
         """
         Lee y analiza el archivo BSP, extrayendo los offsets y lengths de los lumps.
         """
         try:
             with open(self.filename, 'rb') as f:
-                header = f.read(HEADERLEN)
-                if len(header) < HEADERLEN:
-                    return f"Error: Header demasiado corto en {self.filename}"
-
-                self.pos = 0
-                check = self.read_int(header)
-                version = self.read_int(header)
-
-                if check != MAGIC:
-                    return f"Archivo BSP inválido: {self.filename}"
-
-                # Leer 19 lumps (offsets y lengths) y ajustar los offsets restando HEADERLEN
-                self.offsets = []
-                self.lengths = []
-                for i in range(19):
-                    offset = self.read_int(header) - HEADERLEN  # Ajuste aquí
-                    length = self.read_int(header)
-                    self.offsets.append(offset)
-                    self.lengths.append(length)
-                    # Puedes descomentar la siguiente línea para depuración
-                    # print(f"Lump {i}: Offset={offset}, Length={length}")
+                error = self.parse_header(f.read(HEADERLEN))
+                if error:
+                    return error
 
                 # Leer el lump de entidades
                 entities_offset = self.offsets[ENTITIES] + HEADERLEN  # Esto ahora apunta al offset correcto
@@ -75,10 +87,44 @@ class BSPFile:
         except Exception as e:
             return f"Error al leer {self.filename}: {e}"
 
+    def parse_remote(self, sftp):
+        """
+        Igual que parse(), pero sobre un archivo remoto abierto por SFTP. Solo se transfieren
+        el header y el lump de entidades, este último con lecturas por rango en paralelo (readv).
+        Devuelve el mensaje de resultado y guarda en self.bytes_leidos lo transferido.
+        """
+        self.bytes_leidos = 0
+        try:
+            # Sin buffer para que la lectura del header transfiera exactamente HEADERLEN bytes
+            with sftp.open(self.filename, 'rb', bufsize=0) as f:
+                header = f.read(HEADERLEN)
+                self.bytes_leidos += len(header)
+                error = self.parse_header(header)
+                if error:
+                    return error
+
+                entities_offset = self.offsets[ENTITIES] + HEADERLEN
+                entities_length = self.lengths[ENTITIES]
+                if entities_length:
+                    self.entities = b''.join(f.readv([(entities_offset, entities_length)]))
+                else:
+                    self.entities = b''
+                self.bytes_leidos += len(self.entities)
+                if len(self.entities) < entities_length:
+                    return f"Error: Lump de entidades demasiado corto en {self.filename}"
+
+                return "Parseo exitoso."
+        except FileNotFoundError:
+            return f"Archivo no encontrado: {self.filename}"
+        except Exception as e:
+            return f"Error al leer {self.filename}: {e}"
+
     def save_entities_to_ent(self, output_dir):
         """
         Guarda las entidades decodificadas en un archivo .ent con el mismo nombre base que el .bsp.
         Por ejemplo, 'dust.bsp' se guarda como 'dust.ent' en 'output_dir'.
+        Se guardan tal como vienen en el .bsp, porque ents/ es la base de las comparaciones;
+        la minificación se hace al generar ents_modificados/.
         """
         try:
             # Encontrar el primer byte nulo para cortar la cadena (opcional)
@@ -104,6 +150,47 @@ class BSPFile:
         except Exception as e:
             return f"Error al guardar entidades en {self.filename}: {e}"
 
+# Tokens de una cadena de entidades: cadenas entre comillas o llaves
+PATRON_TOKEN_ENTIDAD = re.compile(r'"([^"]*)"|([{}])')
+
+def parse_entities(content):
+    """
+    Analiza el texto de un lump de entidades o de un archivo .ent y devuelve una lista de
+    entidades, cada una como lista de pares (clave, valor) en el orden original.
+    Se conservan las claves repetidas, igual que las lee el motor.
+    """
+    entidades = []
+    actual = None
+    clave = None
+    for m in PATRON_TOKEN_ENTIDAD.finditer(content):
+        llave = m.group(2)
+        if llave == '{':
+            actual = []
+            clave = None
+        elif llave == '}':
+            if actual is not None:
+                entidades.append(actual)
+            actual = None
+        elif actual is not None:
+            if clave is None:
+                clave = m.group(1)
+            else:
+                actual.append((clave, m.group(1)))
+                clave = None
+    return entidades
+
+def serializar_entidades(entidades):
+    """
+    Convierte una lista de entidades (listas de pares clave/valor) al formato de los .ent.
+    """
+    partes = []
+    for entidad in entidades:
+        partes.append("{\n")
+        for clave, valor in entidad:
+            partes.append(f'"{clave}" "{valor}"\n')
+        partes.append("}\n")
+    return "".join(partes)
+
 def parse_ent_file(ent_path):
     """
     Analiza un archivo .ent y extrae:
@@ -147,21 +234,30 @@ def actualizar_lista_entidades(treeview, maps_dir, ents_dir, text_area):
     """
     Actualiza la lista de entidades en la tercera pestaña.
     Lista todos los archivos .bsp en 'maps' y verifica si su correspondiente .ent existe en 'ents'.
-    Muestra solo el nombre sin la extensión .ent y añade información adicional.
+    Muestra solo el nombre sin la extensión .ent y añade información adicional. La columna
+    del tiempo de carga queda en "-"; la completa la interfaz con el perfilador de la consola.
     """
     # Limpiar el Treeview
     for item in treeview.get_children():
         treeview.delete(item)
 
     # Listar todos los archivos .bsp en 'maps'
-    bsp_files = [f for f in os.listdir(maps_dir) if f.lower().endswith('.bsp')]
+    bsp_files = [f for f in os.listdir(maps_dir) if f.lower().endswith('.bsp')] if os.path.isdir(maps_dir) else []
+    bsp_locales = {os.path.splitext(f)[0] for f in bsp_files}
+
+    # Incluir también los .ent extraídos de mapas que solo están en el servidor
+    if os.path.isdir(ents_dir):
+        for ent_file in sorted(os.listdir(ents_dir)):
+            base_name, extension = os.path.splitext(ent_file)
+            if extension.lower() == '.ent' and base_name not in bsp_locales:
+                bsp_files.append(f"{base_name}.bsp")
 
     for bsp_file in bsp_files:
         base_name = os.path.splitext(bsp_file)[0]
         ent_filename = f"{base_name}.ent"
         ent_path = os.path.join(ents_dir, ent_filename)
         if os.path.isfile(ent_path):
-            status = "Generado"
+            status = "Generado" if base_name in bsp_locales else "Generado (servidor)"
             # Extraer información adicional del archivo .ent
             nombre_del_mapa, nextmap_aliados, nextmap_nazis = parse_ent_file(ent_path)
         else:
@@ -170,15 +266,72 @@ def actualizar_lista_entidades(treeview, maps_dir, ents_dir, text_area):
             nextmap_aliados = "N/A"
             nextmap_nazis = "N/A"
         # Insertar en el Treeview sin la extensión .ent
-        treeview.insert('', 'end', values=(base_name, status, nombre_del_mapa, nextmap_aliados, nextmap_nazis))
+        treeview.insert('', 'end', values=(base_name, status, nombre_del_mapa, nextmap_aliados, nextmap_nazis,
+                                           "-"))
 
     # Mostrar mensaje en el área de texto
     text_area.insert(tk.END, "Lista de entidades actualizada.\n")
 
-def ejecutar_dump_batch(text_area, treeview_entidades, maps_dir, ents_dir):
+def procesar_bsps(bsp_paths, ents_dir, text_area, trabajo=None):
+    """
+    Extrae las entidades de cada .bsp de 'bsp_paths' y las guarda como .ent en 'ents_dir'.
+    Si se ejecuta como trabajo en segundo plano, informa el progreso y puede cancelarse entre archivos.
+    Devuelve la cantidad de archivos procesados correctamente.
+    """
+    correctos = 0
+    for i, bsp_path in enumerate(bsp_paths):
+        if trabajo:
+            trabajo.verificar()
+            trabajo.informar_progreso(i, len(bsp_paths))
+        text_area.insert(tk.END, f"Procesando: {bsp_path}\n")
+        bsp = BSPFile(bsp_path)
+        parse_result = bsp.parse()
+        text_area.insert(tk.END, f"Parseo: {parse_result}\n")
+        if parse_result == "Parseo exitoso.":
+            save_result = bsp.save_entities_to_ent(ents_dir)
+            text_area.insert(tk.END, f"{save_result}\n")
+            correctos += 1
+        else:
+            text_area.insert(tk.END, f"No se pudo procesar: {os.path.basename(bsp_path)}\n")
+        text_area.insert(tk.END, '-' * 60 + "\n")
+    if trabajo:
+        trabajo.informar_progreso(len(bsp_paths), len(bsp_paths))
+    return correctos
+
+def _lanzar_dump(text_area, treeview_entidades, maps_dir, ents_dir, bsp_paths, nombre, mensaje_fin, planificador):
+    """
+    Ejecuta procesar_bsps como trabajo del planificador (o directamente si no hay uno) y
+    al terminar actualiza la lista de entidades desde el hilo de Tk.
+    """
+    def terminar(trabajo=None):
+        # Actualizar la lista de entidades después del procesamiento
+        actualizar_lista_entidades(treeview_entidades, maps_dir, ents_dir, text_area)
+        if trabajo is None:
+            messagebox.showinfo("Completado", mensaje_fin)
+        else:
+            if trabajo.estado == trabajos.CANCELADO:
+                text_area.insert(tk.END, "Procesamiento cancelado.\n")
+            trabajos.notificar_fin(trabajo, "Completado", mensaje_fin)
+
+    if planificador is None:
+        procesar_bsps(bsp_paths, ents_dir, text_area)
+        terminar()
+        return None
+
+    trabajo = planificador.enviar(
+        nombre,
+        lambda trabajo: procesar_bsps(bsp_paths, ents_dir, trabajo.salida(text_area), trabajo),
+        al_terminar=terminar
+    )
+    if trabajo is None:
+        messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+    return trabajo
+
+def ejecutar_dump_batch(text_area, treeview_entidades, maps_dir, ents_dir, planificador=None):
     """
     Función que se ejecuta al presionar el botón de Batch Processing.
     Procesa todos los archivos .bsp en 'maps' y guarda los .ent en 'ents'.
+    Con un planificador, el procesamiento corre en segundo plano.
     """
     # Limpiar el área de texto
     text_area.delete('1.0', tk.END)
@@ -202,27 +355,11 @@ def ejecutar_dump_batch(text_area, treeview_entidades, maps_dir, ents_dir):
         messagebox.showwarning("Advertencia", message)
         return
 
-    # Procesar cada archivo .bsp
-    for bsp_file in bsp_files:
-        bsp_path = os.path.join(maps_dir, bsp_file)
-        message = f"Procesando: {bsp_path}"
-        text_area.insert(tk.END, message + "\n")
-        bsp = BSPFile(bsp_path)
-        parse_result = bsp.parse()
-        text_area.insert(tk.END, f"Parseo: {parse_result}\n")
-        if parse_result == "Parseo exitoso.":
-            save_result = bsp.save_entities_to_ent(ents_dir)
-            text_area.insert(tk.END, f"{save_result}\n")
-        else:
-            text_area.insert(tk.END, f"No se pudo procesar: {bsp_file}\n")
-        text_area.insert(tk.END, '-' * 60 + "\n")
-
-    # Actualizar la lista de entidades después del procesamiento por lotes
-    actualizar_lista_entidades(treeview_entidades, maps_dir, ents_dir, text_area)
-
-    messagebox.showinfo("Completado", "Dump de entidades por lotes completado.")
+    bsp_paths = [os.path.join(maps_dir, bsp_file) for bsp_file in bsp_files]
+    return _lanzar_dump(text_area, treeview_entidades, maps_dir, ents_dir, bsp_paths,
+                        "Dump de entidades por lotes", "Dump de entidades por lotes completado.", planificador)
 
-def ejecutar_dump_single(text_area, treeview_entidades, maps_dir, ents_dir):
+def ejecutar_dump_single(text_area, treeview_entidades, maps_dir, ents_dir, planificador=None):
     """
     Función que se ejecuta al presionar el botón de Single File Processing.
     Permite seleccionar un archivo .bsp y procesa solo ese archivo.
@@ -248,18 +385,5 @@ def ejecutar_dump_single(text_area, treeview_entidades, maps_dir, ents_dir):
         messagebox.showerror("Error", message)
         return
 
-    # Procesar el archivo seleccionado
-    bsp = BSPFile(archivo_bsp)
-    parse_result = bsp.parse()
-    text_area.insert(tk.END, f"Parseo: {parse_result}\n")
-    if parse_result == "Parseo exitoso.":
-        save_result = bsp.save_entities_to_ent(ents_dir)
-        text_area.insert(tk.END, f"{save_result}\n")
-    else:
-        text_area.insert(tk.END, f"No se pudo procesar: {archivo_bsp}\n")
-    text_area.insert(tk.END, '-' * 60 + "\n")
-
-    # Actualizar la lista de entidades después del procesamiento de un archivo único
-    actualizar_lista_entidades(treeview_entidades, maps_dir, ents_dir, text_area)
-
-    messagebox.showinfo("Completado", "Dump de entidades completado.")
\ No newline at end of file
+    return _lanzar_dump(text_area, treeview_entidades, maps_dir, ents_dir, [archivo_bsp],
+                        f"Dump de {os.path.basename(archivo_bsp)}", "Dump de entidades completado.", planificador)
@@ -1,11 +1,43 @@
+import codecs
 import configparser
-import re
-import paramiko
-import tkinter as tk
+import hashlib
 import os
+import posixpath
+import re
+import shlex
+import socket
+import tarfile
 import threading
+import time
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 
-def conectar_rcon(ip, puerto, usuario, contrasena, cuadro_estado):
+import paramiko
+
+import parsing
+import snapshots
+import trabajos
+import verificador_bsp
+
+# Tamaño de cada bloque en las subidas reanudables (256 KiB)
+TAMANO_BLOQUE = 256 * 1024
+# Cada cuántos segundos se informa el progreso de una subida
+INTERVALO_PROGRESO = 1.0
+# Segundos de espera al conectar, para que un servidor caído no bloquee el despliegue
+TIMEOUT_CONEXION = 15
+# Segundos sin respuesta en una operación ya conectada (SFTP o canal exec) antes de abandonarla
+TIMEOUT_OPERACION = 60
+# Prefijo de las secciones de herramienta.ini que definen servidores de la flota
+PREFIJO_PERFIL = "servidor:"
+
+def conectar_rcon(ip, puerto, usuario, contrasena, cuadro_estado, oyentes=None):
+    """
+    Abre la consola del servidor (shell + screen) y muestra su salida en 'cuadro_estado'.
+    Cada fragmento de texto recibido, ya sin códigos ANSI, también se entrega a las funciones
+    de la lista 'oyentes', que puede modificarse mientras la conexión está abierta.
+    """
+    if oyentes is None:
+        oyentes = []
     try:
         transport = paramiko.Transport((ip, int(puerto)))
         transport.connect(username=usuario, password=contrasena)
@@ -18,16 +50,29 @@ def conectar_rcon(ip, puerto, usuario, contrasena, cuadro_estado):
             ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
             # Eliminar caracteres no imprimibles como \b y \r
             control_chars = re.compile(r'[\b\r]')
+            # Decodificador incremental: un carácter UTF-8 puede quedar partido entre dos recv
+            decodificador = codecs.getincrementaldecoder('utf-8')(errors='replace')
 
             while True:
                 try:
-                    datos = client.recv(1024).decode('utf-8')
+                    crudo = client.recv(1024)
+                    if not crudo:
+                        cuadro_estado.insert(tk.END, "Conexión cerrada por el servidor.\n")
+                        cuadro_estado.see(tk.END)
+                        break
+                    datos = decodificador.decode(crudo)
                     if datos:
                         # Eliminar códigos ANSI y caracteres de control
                         texto_limpio = ansi_escape.sub('', datos)
                         texto_limpio = control_chars.sub('', texto_limpio)
                         cuadro_estado.insert(tk.END, texto_limpio)
                         cuadro_estado.see(tk.END)
+                        for oyente in list(oyentes):
+                            try:
+                                oyente(texto_limpio)
+                            except Exception:
+                                # Un oyente con errores no debe cortar la recepción de la consola
+                                pass
                 except Exception as e:
                     cuadro_estado.insert(tk.END, f"Error al recibir datos: {e}\n")
                     cuadro_estado.see(tk.END)
@@ -51,7 +96,16 @@ def cargar_configuracion():
         "puerto": "",
         "usuario": "",
         "password": "",
-        "ruta_principal": ""
+        "ruta_principal": "",
+        "ruta_log": "qconsole.log",
+        "max_trabajos": "2",
+        "dirs_recursos": "",
+        "paks_excluidos": "pak0.pak,pak1.pak,pak2.pak",
+        "presupuesto_entidades": "262144",
+        "maxclients": "24",
+        "comando_rotacion": 'gamemap "{mapa}"',
+        "patron_fin_nivel": "",
+        "intervalo_rotacion": "30"
     }
 
     # Determinar la ruta del archivo herramienta.ini relativa al script
@@ -66,7 +120,16 @@ def cargar_configuracion():
                 "puerto": config.get("DEFAULT", "puerto", fallback=""),
                 "usuario": config.get("DEFAULT", "usuario", fallback=""),
                 "password": config.get("DEFAULT", "password", fallback=""),
-                "ruta_principal": config.get("DEFAULT", "ruta_principal", fallback="")
+                "ruta_principal": config.get("DEFAULT", "ruta_principal", fallback=""),
+                "ruta_log": config.get("DEFAULT", "ruta_log", fallback="qconsole.log"),
+                "max_trabajos": config.get("DEFAULT", "max_trabajos", fallback="2"),
+                "dirs_recursos": config.get("DEFAULT", "dirs_recursos", fallback=""),
+                "paks_excluidos": config.get("DEFAULT", "paks_excluidos", fallback="pak0.pak,pak1.pak,pak2.pak"),
+                "presupuesto_entidades": config.get("DEFAULT", "presupuesto_entidades", fallback="262144"),
+                "maxclients": config.get("DEFAULT", "maxclients", fallback="24"),
+                "comando_rotacion": config.get("DEFAULT", "comando_rotacion", raw=True, fallback='gamemap "{mapa}"'),
+                "patron_fin_nivel": config.get("DEFAULT", "patron_fin_nivel", raw=True, fallback=""),
+                "intervalo_rotacion": config.get("DEFAULT", "intervalo_rotacion", fallback="30")
             })
         except Exception as e:
             print(f"Error al cargar configuración: {e}")
@@ -75,6 +138,69 @@ def cargar_configuracion():
 
     return parametros
 
+def leer_entero(parametros, clave, defecto, minimo=1):
+    """
+    Valor entero de 'clave' en la configuración. Si está vacío, no es un número o es menor
+    que 'minimo' se usa 'defecto' (y se avisa por consola) en lugar de impedir que arranque
+    la herramienta.
+    """
+    valor = str(parametros.get(clave, "")).strip()
+    try:
+        numero = int(valor)
+    except ValueError:
+        numero = None
+    if numero is None or numero < minimo:
+        if valor:
+            print(f"Valor no válido para {clave}: '{valor}', se usa {defecto}.")
+        return defecto
+    return numero
+
+def cargar_perfiles():
+    """
+    Carga los perfiles de servidores definidos en herramienta.ini como secciones
+    [servidor:nombre]. Cada perfil hereda los valores de [DEFAULT] que no defina.
+    Si no hay perfiles, la configuración de [DEFAULT] se usa como único servidor.
+    Devuelve una tupla (perfiles, concurrencia) donde perfiles es un dict nombre -> parámetros.
+    """
+    config = configparser.ConfigParser()
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    config_path = os.path.join(script_dir, "herramienta.ini")
+    perfiles = {}
+    concurrencia = 4
+
+    if os.path.exists(config_path):
+        try:
+            config.read(config_path)
+            concurrencia = config.getint("DEFAULT", "concurrencia_flota", fallback=4)
+            for seccion in config.sections():
+                if not seccion.startswith(PREFIJO_PERFIL):
+                    continue
+                nombre = seccion[len(PREFIJO_PERFIL):].strip()
+                perfiles[nombre] = {
+                    clave: config.get(seccion, clave, fallback="")
+                    for clave in ("ip", "puerto", "usuario", "password", "ruta_principal")
+                }
+        except Exception as e:
+            print(f"Error al cargar perfiles: {e}")
+
+    if not perfiles:
+        parametros = cargar_configuracion()
+        if parametros["ip"]:
+            perfiles[parametros["ip"]] = parametros
+
+    return perfiles, max(1, concurrencia)
+
+def abrir_transport(ip, puerto, usuario, contrasena, timeout=TIMEOUT_CONEXION):
+    """
+    Abre y autentica un paramiko.Transport con un tiempo máximo de conexión.
+    """
+    sock = socket.create_connection((ip, int(puerto)), timeout=timeout)
+    transport = paramiko.Transport(sock)
+    transport.banner_timeout = timeout
+    transport.auth_timeout = timeout
+    transport.connect(username=usuario, password=contrasena)
+    return transport
+
 def subir_archivo_sftp(ip, puerto, usuario, contrasena, ruta, archivo, cuadro_estado):
     try:
         cuadro_estado.insert(tk.END, f"Conectando al servidor SFTP {ip}:{puerto}...\n")
@@ -120,20 +246,198 @@ def subir_archivo_sftp(ip, puerto, usuario, contrasena, ruta, archivo, cuadro_es
         cuadro_estado.see(tk.END)
         return f"Error inesperado: {e}"
 
-def subir_varios_archivos_sftp(ip, puerto, usuario, contrasena, base_ruta, cuadro_estado):
+def _informar(cuadro_estado, mensaje):
+    """
+    Escribe un mensaje en el cuadro de estado y desplaza la vista al final.
+    """
+    cuadro_estado.insert(tk.END, mensaje)
+    cuadro_estado.see(tk.END)
+
+def _formatear_bytes(cantidad):
+    """
+    Devuelve una representación legible de una cantidad de bytes.
+    """
+    for unidad in ("B", "KiB", "MiB"):
+        if cantidad < 1024:
+            return f"{cantidad:.1f} {unidad}"
+        cantidad /= 1024
+    return f"{cantidad:.1f} GiB"
+
+def sha256_local(ruta):
+    """
+    Calcula el SHA-256 de un archivo local leyéndolo por bloques.
+    """
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def ejecutar_remoto(transport, comando):
+    """
+    Ejecuta un comando en el servidor a través de un canal exec.
+    Devuelve una tupla (codigo_salida, stdout, stderr) con las salidas decodificadas.
+    """
+    canal = transport.open_session()
+    try:
+        canal.exec_command(comando)
+        return _leer_salidas(canal)
+    finally:
+        canal.close()
+
+def _leer_salidas(canal, timeout=TIMEOUT_OPERACION):
+    """
+    Lee stdout y stderr de un canal exec a la vez hasta que el comando termina. Leerlos uno
+    después del otro puede trabar la conexión: si el comando llena la ventana del canal con
+    la salida que no se está leyendo, se detiene y la otra nunca termina.
+    Devuelve una tupla (codigo_salida, stdout, stderr) con las salidas decodificadas.
+    """
+    stdout = bytearray()
+    stderr = bytearray()
+    ultimo_dato = time.monotonic()
+    while True:
+        leido = False
+        while canal.recv_ready():
+            stdout += canal.recv(TAMANO_BLOQUE)
+            leido = True
+        while canal.recv_stderr_ready():
+            stderr += canal.recv_stderr(TAMANO_BLOQUE)
+            leido = True
+        if canal.exit_status_ready() and not canal.recv_ready() and not canal.recv_stderr_ready():
+            break
+        ahora = time.monotonic()
+        if leido:
+            ultimo_dato = ahora
+        elif ahora - ultimo_dato > timeout:
+            raise socket.timeout(f"El comando remoto no respondió en {timeout} s")
+        else:
+            time.sleep(0.01)
+    return (canal.recv_exit_status(), stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace'))
+
+def sha256_remoto(transport, ruta_remota):
+    """
+    Calcula el SHA-256 de un archivo remoto con 'sha256sum'. Devuelve None si no se pudo calcular.
+    """
+    codigo, stdout, _ = ejecutar_remoto(transport, f"sha256sum -- {shlex.quote(ruta_remota)}")
+    if codigo != 0 or not stdout:
+        return None
+    return stdout.split()[0].lower()
+
+def renombrar_remoto(transport, sftp, origen, destino):
+    """
+    Renombra un archivo remoto de forma atómica con posix-rename o, si el servidor no
+    soporta esa extensión, con 'mv' (también atómico dentro del mismo directorio).
+    Lanza IOError si no se pudo renombrar.
+    """
+    try:
+        sftp.posix_rename(origen, destino)
+    except IOError:
+        codigo, _, stderr = ejecutar_remoto(transport, f"mv -f -- {shlex.quote(origen)} {shlex.quote(destino)}")
+        if codigo != 0:
+            raise IOError(stderr.strip() or f"mv terminó con código {codigo}")
+
+def subir_archivo_reanudable(transport, sftp, archivo, ruta_remota, cuadro_estado, trabajo=None):
+    """
+    Sube un archivo grande (por ejemplo un .bsp) por bloques a 'ruta_remota'.
+    Los datos se escriben en 'ruta_remota.part'; si ya existe una subida parcial se continúa
+    desde su tamaño. Al terminar se verifica el SHA-256 en el servidor con 'sha256sum' y el
+    archivo se renombra a su destino de forma atómica. Si se cancela el trabajo, la subida
+    parcial queda en el servidor para reanudarla después.
+    Devuelve True si el archivo quedó en el servidor y verificado.
+    """
+    nombre = os.path.basename(archivo)
+    ruta_remota = posixpath.join(sftp.normalize(posixpath.dirname(ruta_remota) or "."), posixpath.basename(ruta_remota))
+    ruta_parcial = ruta_remota + '.part'
+    total = os.path.getsize(archivo)
+    hash_local = sha256_local(archivo)
+
+    # Si el destino ya existe con el mismo contenido no hay nada que subir
+    try:
+        if sftp.stat(ruta_remota).st_size == total and sha256_remoto(transport, ruta_remota) == hash_local:
+            _informar(cuadro_estado, f"{nombre} ya está actualizado en el servidor, se omite.\n")
+            return True
+    except IOError:
+        pass
+
+    try:
+        desplazamiento = sftp.stat(ruta_parcial).st_size
+    except IOError:
+        desplazamiento = 0
+    if desplazamiento > total:
+        desplazamiento = 0
+
+    if desplazamiento:
+        _informar(cuadro_estado, f"Reanudando {nombre} desde {_formatear_bytes(desplazamiento)} de {_formatear_bytes(total)}...\n")
+        remoto = sftp.open(ruta_parcial, 'r+b')
+        remoto.seek(desplazamiento)
+    else:
+        _informar(cuadro_estado, f"Subiendo {nombre} ({_formatear_bytes(total)})...\n")
+        remoto = sftp.open(ruta_parcial, 'wb')
+
+    inicio = time.monotonic()
+    ultimo_informe = inicio
+    enviados = 0
+    try:
+        remoto.set_pipelined(True)
+        with open(archivo, 'rb') as local:
+            local.seek(desplazamiento)
+            for bloque in iter(lambda: local.read(TAMANO_BLOQUE), b''):
+                if trabajo:
+                    trabajo.verificar()
+                remoto.write(bloque)
+                enviados += len(bloque)
+                ahora = time.monotonic()
+                if ahora - ultimo_informe >= INTERVALO_PROGRESO:
+                    ultimo_informe = ahora
+                    velocidad = enviados / (ahora - inicio)
+                    restante = total - desplazamiento - enviados
+                    eta = restante / velocidad if velocidad else 0
+                    _informar(cuadro_estado, f"  {nombre}: {_formatear_bytes(desplazamiento + enviados)}/{_formatear_bytes(total)} "
+                                             f"a {_formatear_bytes(velocidad)}/s, ETA {eta:.0f} s\n")
+    finally:
+        remoto.close()
+
+    duracion = max(time.monotonic() - inicio, 1e-6)
+    _informar(cuadro_estado, f"  {nombre}: {_formatear_bytes(enviados)} en {duracion:.1f} s ({_formatear_bytes(enviados / duracion)}/s)\n")
+
+    hash_remoto = sha256_remoto(transport, ruta_parcial)
+    if hash_remoto != hash_local:
+        # Una subida parcial corrupta no sirve para reanudar, se descarta
+        sftp.remove(ruta_parcial)
+        _informar(cuadro_estado, f"Error: checksum de {nombre} no coincide (local {hash_local}, remoto {hash_remoto}).\n")
+        return False
+
+    try:
+        renombrar_remoto(transport, sftp, ruta_parcial, ruta_remota)
+    except IOError as e:
+        _informar(cuadro_estado, f"Error al renombrar {nombre}: {e}\n")
+        return False
+
+    _informar(cuadro_estado, f"Archivo {nombre} subido y verificado (sha256 {hash_local[:12]}...).\n")
+    return True
+
+def subir_varios_archivos_sftp(ip, puerto, usuario, contrasena, base_ruta, cuadro_estado, trabajo=None):
+    """
+    Sube maplist.txt, server.cfg, los .ent de ./ents_modificados y los mapas de ./maps
+    al servidor. Devuelve True si todos los archivos se subieron correctamente.
+    """
+    errores = 0
+    transport = None
     try:
         cuadro_estado.insert(tk.END, f"Conectando al servidor SFTP {ip}:{puerto}...\n")
         cuadro_estado.see(tk.END)
         try:
-            transport = paramiko.Transport((ip, int(puerto)))
-            transport.connect(username=usuario, password=contrasena)
+            transport = abrir_transport(ip, puerto, usuario, contrasena)
             cuadro_estado.insert(tk.END, "Conexión y autenticación exitosa.\n")
         except Exception as e:
             cuadro_estado.insert(tk.END, f"Error al conectar o autenticar: {e}\n")
             cuadro_estado.see(tk.END)
-            return f"Error al conectar o autenticar: {e}"
+            return False
 
         sftp = paramiko.SFTPClient.from_transport(transport)
+        # Un servidor que deja de responder a mitad de la subida no debe colgar el despliegue
+        sftp.get_channel().settimeout(TIMEOUT_OPERACION)
 
         try:
             cuadro_estado.insert(tk.END, f"Cambiando al directorio base: {base_ruta}...\n")
@@ -143,6 +447,7 @@ def subir_varios_archivos_sftp(ip, puerto, usuario, contrasena, base_ruta, cuadr
             cuadro_estado.insert(tk.END, f"Directorio no encontrado en el servidor, creando: {base_ruta}...\n")
             sftp.mkdir(base_ruta)
             sftp.chdir(base_ruta)
+        base_absoluta = sftp.getcwd()
 
         # Subir maplist.txt y server.cfg
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -152,12 +457,15 @@ def subir_varios_archivos_sftp(ip, puerto, usuario, contrasena, base_ruta, cuadr
         ]
 
         for archivo in archivos_a_subir:
+            if trabajo:
+                trabajo.verificar()
             try:
                 cuadro_estado.insert(tk.END, f"Subiendo archivo: {archivo}...\n")
                 sftp.put(archivo, os.path.basename(archivo))
                 cuadro_estado.insert(tk.END, f"Archivo {os.path.basename(archivo)} subido exitosamente.\n")
             except Exception as e:
                 cuadro_estado.insert(tk.END, f"Error al subir {os.path.basename(archivo)}: {e}\n")
+                errores += 1
 
         # Subir todos los archivos en ./ents_modificados al directorio 'ents'
         ents_local_dir = os.path.join(script_dir, "ents_modificados")
@@ -172,13 +480,500 @@ def subir_varios_archivos_sftp(ip, puerto, usuario, contrasena, base_ruta, cuadr
 
         for root, _, files in os.walk(ents_local_dir):
             for file in files:
+                if trabajo:
+                    trabajo.verificar()
                 local_path = os.path.join(root, file)
                 cuadro_estado.insert(tk.END, f"Subiendo archivo: {local_path}...\n")
                 sftp.put(local_path, file)
                 cuadro_estado.insert(tk.END, f"Archivo {file} subido exitosamente.\n")
 
-        transport.close()
+        # Subir los mapas .bsp de ./maps al directorio 'maps' con subida reanudable y verificada
+        maps_local_dir = os.path.join(script_dir, "maps")
+        bsp_files = []
+        if os.path.isdir(maps_local_dir):
+            bsp_files = sorted(f for f in os.listdir(maps_local_dir) if f.lower().endswith('.bsp'))
+        if bsp_files:
+            maps_remote_dir = f"{base_absoluta}/maps"
+            try:
+                sftp.stat(maps_remote_dir)
+            except IOError:
+                cuadro_estado.insert(tk.END, f"Directorio remoto no encontrado, creando: {maps_remote_dir}...\n")
+                sftp.mkdir(maps_remote_dir)
+            fallidos = []
+            for bsp_file in bsp_files:
+                try:
+                    if not subir_archivo_reanudable(transport, sftp, os.path.join(maps_local_dir, bsp_file),
+                                                    f"{maps_remote_dir}/{bsp_file}", cuadro_estado, trabajo):
+                        fallidos.append(bsp_file)
+                except trabajos.Cancelado:
+                    raise
+                except Exception as e:
+                    cuadro_estado.insert(tk.END, f"Error al subir {bsp_file}: {e}\n")
+                    fallidos.append(bsp_file)
+            if fallidos:
+                cuadro_estado.insert(tk.END, f"Mapas no subidos: {', '.join(fallidos)}. Vuelve a intentar para reanudar.\n")
+                errores += len(fallidos)
+
+        if errores:
+            cuadro_estado.insert(tk.END, f"Carga finalizada con {errores} error(es).\n")
+            return False
         cuadro_estado.insert(tk.END, "Todos los archivos se subieron exitosamente.\n")
+        return True
+    except trabajos.Cancelado:
+        cuadro_estado.insert(tk.END, "Carga cancelada.\n")
+        raise
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error inesperado: {e}\n")
+        cuadro_estado.see(tk.END)
+        return False
+    finally:
+        if transport:
+            transport.close()
+
+# Preparación del directorio de staging en el servidor para los despliegues atómicos. El staging
+# se borra al salir aunque el script falle (por ejemplo con un paquete cortado).
+SCRIPT_STAGING = """set -e
+mkdir -p {base}
+cd {base}
+staging=.staging-$$
+nuevo=.ents-v-$(date +%s)-$$
+rm -rf "$staging"
+trap 'rm -rf "$staging"' EXIT
+mkdir "$staging"
+"""
+
+# Activación del staging: arma una versión nueva de 'ents' con los .ent activos más los del
+# staging (los mapas que no están en la rotación conservan su .ent), cambia 'ents' (un enlace
+# simbólico a esa versión) con un rename atómico y reemplaza maplist.txt y server.cfg.
+# El 'ents' original, si era un directorio, queda como respaldo en '.ents-original' y nunca
+# se borra; solo se eliminan las versiones anteriores creadas por la herramienta (.ents-v-*).
+# Un rename no puede reemplazar un directorio por un enlace, así que en la primera activación
+# se intercambian con 'mv --exchange' (coreutils 9.5 o posterior, renameat2 de Linux). Si el
+# servidor no lo soporta, 'ents' se mueve al respaldo y luego se crea el enlace: durante ese
+# instante no existe 'ents', y el script lo informa con un aviso por la salida estándar.
+SCRIPT_ACTIVACION = """mkdir -p "$staging/ents"
+mkdir "$nuevo"
+if [ -d ents ]; then cp -pR ents/. "$nuevo"/; fi
+cp -pR "$staging/ents/." "$nuevo"/
+ln -s "$nuevo" "ents.tmp-$$"
+if [ -d ents ] && [ ! -L ents ]; then
+    respaldo=.ents-original
+    if [ -e "$respaldo" ]; then respaldo=".ents-original-$(date +%s)-$$"; fi
+    if mv --exchange -T "ents.tmp-$$" ents 2>/dev/null; then
+        mv "ents.tmp-$$" "$respaldo"
+    else
+        echo "Aviso: el servidor no soporta 'mv --exchange'; en esta primera activación 'ents' dejó de existir un instante mientras se reemplazaba por el enlace."
+        mv ents "$respaldo"
+        mv -T "ents.tmp-$$" ents
+    fi
+else
+    mv -T "ents.tmp-$$" ents
+fi
+mv -f "$staging/maplist.txt" maplist.txt
+mv -f "$staging/server.cfg" server.cfg
+rm -rf "$staging"
+for d in .ents-v-*; do
+    if [ -d "$d" ] && [ "$d" != "$nuevo" ]; then rm -rf "$d"; fi
+done
+"""
+
+# Último miembro del paquete: sin él (subida cancelada o cortada) el staging no se activa
+MARCA_PAQUETE = ".paquete-completo"
+
+# Script remoto del modo paquete: extrae el tar.gz recibido por stdin en el staging y lo activa
+# solo si llegó completo
+SCRIPT_EXTRACCION = SCRIPT_STAGING + f"""tar -xzf - -C "$staging"
+if [ ! -f "$staging/{MARCA_PAQUETE}" ]; then
+    rm -rf "$staging"
+    echo "Paquete incompleto, no se activa." >&2
+    exit 1
+fi
+rm -f "$staging/{MARCA_PAQUETE}"
+""" + SCRIPT_ACTIVACION
+
+def subir_paquete_sftp(ip, puerto, usuario, contrasena, base_ruta, cuadro_estado, trabajo=None):
+    """
+    Modo paquete: empaqueta maplist.txt, server.cfg y ./ents_modificados en un único tar.gz
+    que se envía en streaming por un solo canal exec, donde se extrae y se activa de forma
+    atómica. Evita los viajes de ida y vuelta por archivo de sftp.put.
+    Devuelve True si el despliegue terminó correctamente.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    archivos = [os.path.join(script_dir, "maplist.txt"), os.path.join(script_dir, "server.cfg")]
+    ents_local_dir = os.path.join(script_dir, "ents_modificados")
+
+    for archivo in archivos:
+        if not os.path.isfile(archivo):
+            cuadro_estado.insert(tk.END, f"Error: falta {archivo}. Genera la rotación antes de subirla.\n")
+            cuadro_estado.see(tk.END)
+            return False
+
+    cuadro_estado.insert(tk.END, f"Conectando al servidor {ip}:{puerto}...\n")
+    cuadro_estado.see(tk.END)
+    try:
+        transport = abrir_transport(ip, puerto, usuario, contrasena)
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error al conectar o autenticar: {e}\n")
+        cuadro_estado.see(tk.END)
+        return False
+
+    try:
+        inicio = time.monotonic()
+        canal = transport.open_session()
+        canal.settimeout(TIMEOUT_OPERACION)
+        canal.exec_command(f"sh -c {shlex.quote(SCRIPT_EXTRACCION.replace('{base}', shlex.quote(base_ruta)))}")
+
+        entrada = canal.makefile('wb')
+        cantidad = 0
+        # Sin 'with': al cancelar, cerrar el TarFile completaría un gzip válido con el paquete a medias
+        paquete = tarfile.open(fileobj=entrada, mode='w|gz')
+        try:
+            for archivo in archivos:
+                paquete.add(archivo, arcname=os.path.basename(archivo))
+            if os.path.isdir(ents_local_dir):
+                for file in sorted(os.listdir(ents_local_dir)):
+                    if trabajo:
+                        trabajo.verificar()
+                    local_path = os.path.join(ents_local_dir, file)
+                    if os.path.isfile(local_path):
+                        paquete.add(local_path, arcname=f"ents/{file}")
+                        cantidad += 1
+            if trabajo:
+                trabajo.verificar()
+        except BaseException:
+            # Cortar el canal sin EOF ni marca final: el servidor descarta el staging
+            canal.close()
+            raise
+        paquete.addfile(tarfile.TarInfo(MARCA_PAQUETE))
+        paquete.close()
+        entrada.flush()
+        canal.shutdown_write()
+
+        codigo, stdout, stderr = _leer_salidas(canal)
+        canal.close()
+
+        if codigo != 0:
+            cuadro_estado.insert(tk.END, f"Error en la extracción remota (código {codigo}): {stderr.strip()}\n")
+            cuadro_estado.see(tk.END)
+            return False
+        if stdout.strip():
+            cuadro_estado.insert(tk.END, stdout.strip() + "\n")
+
+        cuadro_estado.insert(tk.END, f"Paquete con {cantidad} .ent, maplist.txt y server.cfg desplegado en "
+                                     f"{time.monotonic() - inicio:.2f} s.\n")
+        cuadro_estado.see(tk.END)
+        return True
+    except trabajos.Cancelado:
+        cuadro_estado.insert(tk.END, "Despliegue cancelado.\n")
+        raise
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error inesperado: {e}\n")
+        cuadro_estado.see(tk.END)
+        return False
+    finally:
+        transport.close()
+
+def desplegar_snapshot(ip, puerto, usuario, contrasena, base_ruta, build_id, cuadro_estado, trabajo=None):
+    """
+    Despliega una versión del almacén local de snapshots. El servidor mantiene su propio
+    almacén de objetos en '<base>/.snapshots/objects', así que solo se suben los objetos que
+    le faltan; luego la versión se arma en un staging descomprimiendo los objetos con
+    'gzip -dc' y se activa de forma atómica como en el modo paquete.
+    Devuelve True si la versión quedó activa en el servidor.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    manifiesto = snapshots.cargar_manifiesto(script_dir, build_id)
+
+    cuadro_estado.insert(tk.END, f"Conectando al servidor {ip}:{puerto}...\n")
+    cuadro_estado.see(tk.END)
+    try:
+        transport = abrir_transport(ip, puerto, usuario, contrasena)
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error al conectar o autenticar: {e}\n")
+        cuadro_estado.see(tk.END)
+        return False
+
+    try:
+        sftp = paramiko.SFTPClient.from_transport(transport)
+        sftp.get_channel().settimeout(TIMEOUT_OPERACION)
+        base_absoluta = sftp.normalize(base_ruta)
+        objetos_remotos = posixpath.join(base_absoluta, snapshots.DIRECTORIO_ALMACEN, "objects")
+        codigo, _, stderr = ejecutar_remoto(transport, f"mkdir -p {shlex.quote(objetos_remotos)}")
+        if codigo != 0:
+            cuadro_estado.insert(tk.END, f"Error al crear {objetos_remotos}: {stderr.strip()}\n")
+            return False
+
+        existentes = set(sftp.listdir(objetos_remotos))
+        necesarios = sorted(set(manifiesto["archivos"].values()))
+        faltantes = [h for h in necesarios if f"{h}.gz" not in existentes]
+        cuadro_estado.insert(tk.END, f"Versión {build_id}: {len(necesarios)} objetos, "
+                                     f"{len(faltantes)} faltan en el servidor.\n")
+        cuadro_estado.see(tk.END)
+
+        enviados = 0
+        for hash_contenido in faltantes:
+            if trabajo:
+                trabajo.verificar()
+            local = snapshots.ruta_objeto(script_dir, hash_contenido)
+            remoto = posixpath.join(objetos_remotos, f"{hash_contenido}.gz")
+            # Subir con otro nombre y renombrar, para que nunca quede un objeto a medias con el nombre final
+            sftp.put(local, f"{remoto}.tmp")
+            renombrar_remoto(transport, sftp, f"{remoto}.tmp", remoto)
+            enviados += os.path.getsize(local)
+        if trabajo:
+            trabajo.verificar()
+
+        comandos = []
+        for nombre, hash_contenido in sorted(manifiesto["archivos"].items()):
+            objeto = shlex.quote(f"{snapshots.DIRECTORIO_ALMACEN}/objects/{hash_contenido}.gz")
+            comandos.append(f'gzip -dc {objeto} > "$staging"/{shlex.quote(nombre)}')
+        script = (SCRIPT_STAGING + 'mkdir -p "$staging/ents"\n' + "\n".join(comandos) + "\n" + SCRIPT_ACTIVACION
+                  + f"echo {shlex.quote(build_id)} > {snapshots.DIRECTORIO_ALMACEN}/{snapshots.ARCHIVO_ACTUAL}\n")
+        codigo, stdout, stderr = ejecutar_remoto(transport, f"sh -c {shlex.quote(script.replace('{base}', shlex.quote(base_absoluta)))}")
+        if codigo != 0:
+            cuadro_estado.insert(tk.END, f"Error al activar la versión (código {codigo}): {stderr.strip()}\n")
+            cuadro_estado.see(tk.END)
+            return False
+        if stdout.strip():
+            cuadro_estado.insert(tk.END, stdout.strip() + "\n")
+
+        cuadro_estado.insert(tk.END, f"Versión {build_id} activa en el servidor ({_formatear_bytes(enviados)} enviados).\n")
+        cuadro_estado.see(tk.END)
+        return True
+    except trabajos.Cancelado:
+        cuadro_estado.insert(tk.END, "Despliegue cancelado.\n")
+        raise
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error inesperado: {e}\n")
+        cuadro_estado.see(tk.END)
+        return False
+    finally:
+        transport.close()
+
+class SalidaCola:
+    """
+    Adaptador con la interfaz mínima de un cuadro de texto (insert/see) que publica cada
+    mensaje en una cola. Permite usar las funciones de subida desde hilos sin tocar Tk.
+    """
+    def __init__(self, cola, nombre):
+        self.cola = cola
+        self.nombre = nombre
+
+    def insert(self, indice, texto):
+        self.cola.put(("mensaje", self.nombre, texto))
+
+    def see(self, indice):
+        pass
+
+def desplegar_flota(perfiles, cola, max_concurrentes=4, modo_paquete=False, trabajo=None):
+    """
+    Sube la rotación generada a todos los servidores de 'perfiles' en paralelo, con como
+    máximo 'max_concurrentes' conexiones simultáneas. Con 'modo_paquete' cada servidor
+    recibe un único tar.gz (ver subir_paquete_sftp). Cada operación remota tiene un límite
+    de TIMEOUT_OPERACION segundos, así que un servidor colgado termina en error sin retener
+    su hilo. El progreso se publica en 'cola' como tuplas ("estado" | "mensaje", nombre,
+    texto) y al final ("fin", None, resultados).
+    Devuelve un dict nombre -> True/False.
+    """
+    def desplegar(nombre, parametros):
+        if trabajo and trabajo.cancelado():
+            cola.put(("estado", nombre, "Cancelado"))
+            return False
+        cola.put(("estado", nombre, "Subiendo"))
+        subir = subir_paquete_sftp if modo_paquete else subir_varios_archivos_sftp
+        try:
+            ok = subir(
+                parametros["ip"], parametros["puerto"], parametros["usuario"], parametros["password"],
+                parametros["ruta_principal"], SalidaCola(cola, nombre), trabajo
+            )
+        except trabajos.Cancelado:
+            cola.put(("estado", nombre, "Cancelado"))
+            return False
+        except Exception as e:
+            cola.put(("mensaje", nombre, f"Error inesperado: {e}\n"))
+            ok = False
+        cola.put(("estado", nombre, "OK" if ok else "Error"))
+        return ok
+
+    for nombre in perfiles:
+        cola.put(("estado", nombre, "En cola"))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrentes)) as executor:
+        futuros = {nombre: executor.submit(desplegar, nombre, parametros) for nombre, parametros in perfiles.items()}
+    resultados = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
+    cola.put(("fin", None, resultados))
+    return resultados
+
+def extraer_entidades_remotas(ip, puerto, usuario, contrasena, base_ruta, ents_dir, cuadro_estado, max_hilos=8, trabajo=None):
+    """
+    Extrae los .ent de los .bsp que están en el directorio 'maps' del servidor sin descargarlos:
+    de cada mapa solo se leen el header y el lump de entidades con lecturas por rango.
+    Los mapas se procesan en paralelo, cada hilo con su propio canal SFTP sobre la misma conexión.
+    Devuelve True si todos los mapas se extrajeron correctamente.
+    """
+    cuadro_estado.insert(tk.END, f"Conectando al servidor SFTP {ip}:{puerto}...\n")
+    cuadro_estado.see(tk.END)
+    try:
+        transport = abrir_transport(ip, puerto, usuario, contrasena)
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error al conectar o autenticar: {e}\n")
+        cuadro_estado.see(tk.END)
+        return False
+
+    try:
+        sftp = paramiko.SFTPClient.from_transport(transport)
+        maps_remote_dir = posixpath.join(sftp.normalize(base_ruta), "maps")
+        try:
+            atributos = sftp.listdir_attr(maps_remote_dir)
+        except IOError as e:
+            cuadro_estado.insert(tk.END, f"No se pudo listar {maps_remote_dir}: {e}\n")
+            cuadro_estado.see(tk.END)
+            return False
+
+        mapas = sorted((a.filename, a.st_size) for a in atributos if a.filename.lower().endswith('.bsp'))
+        if not mapas:
+            cuadro_estado.insert(tk.END, f"No se encontraron archivos .bsp en {maps_remote_dir}\n")
+            cuadro_estado.see(tk.END)
+            return False
+
+        os.makedirs(ents_dir, exist_ok=True)
+        cuadro_estado.insert(tk.END, f"Extrayendo entidades de {len(mapas)} mapas remotos...\n")
+        cuadro_estado.see(tk.END)
+
+        # Un cliente SFTP por hilo: cada uno usa su propio canal y las peticiones no se serializan
+        local = threading.local()
+        clientes = []
+        clientes_lock = threading.Lock()
+
+        def extraer(nombre):
+            if trabajo:
+                trabajo.verificar()
+            if not hasattr(local, "sftp"):
+                local.sftp = paramiko.SFTPClient.from_transport(transport)
+                with clientes_lock:
+                    clientes.append(local.sftp)
+            bsp = parsing.BSPFile(posixpath.join(maps_remote_dir, nombre))
+            resultado = bsp.parse_remote(local.sftp)
+            if resultado == "Parseo exitoso.":
+                resultado = bsp.save_entities_to_ent(ents_dir)
+                return nombre, True, resultado, bsp.bytes_leidos
+            return nombre, False, resultado, bsp.bytes_leidos
+
+        inicio = time.monotonic()
+        transferidos = 0
+        fallidos = []
+        with ThreadPoolExecutor(max_workers=max(1, max_hilos)) as executor:
+            for i, (nombre, ok, resultado, leidos) in enumerate(executor.map(extraer, [m[0] for m in mapas])):
+                if trabajo:
+                    trabajo.informar_progreso(i + 1, len(mapas))
+                transferidos += leidos
+                cuadro_estado.insert(tk.END, f"{nombre}: {resultado} ({_formatear_bytes(leidos)})\n")
+                cuadro_estado.see(tk.END)
+                if not ok:
+                    fallidos.append(nombre)
+
+        for cliente in clientes:
+            cliente.close()
+
+        tamano_total = sum(m[1] or 0 for m in mapas)
+        cuadro_estado.insert(tk.END, f"Extracción remota terminada en {time.monotonic() - inicio:.1f} s: "
+                                     f"{_formatear_bytes(transferidos)} transferidos de {_formatear_bytes(tamano_total)} en mapas.\n")
+        if fallidos:
+            cuadro_estado.insert(tk.END, f"Mapas con errores: {', '.join(fallidos)}\n")
+        cuadro_estado.see(tk.END)
+        return not fallidos
+    except trabajos.Cancelado:
+        cuadro_estado.insert(tk.END, "Extracción cancelada.\n")
+        raise
     except Exception as e:
         cuadro_estado.insert(tk.END, f"Error inesperado: {e}\n")
-        cuadro_estado.see(tk.END)
\ No newline at end of file
+        cuadro_estado.see(tk.END)
+        return False
+    finally:
+        transport.close()
+
+def comparar_mapas_remotos(ip, puerto, usuario, contrasena, base_ruta, resultados, cuadro_estado, ruta_cache=None, trabajo=None):
+    """
+    Compara los mapas verificados localmente ('resultados' de verificador_bsp.verificar_mapas)
+    con los del directorio 'maps' del servidor. Del servidor solo se pide un listado con tamaño
+    y fecha de todos los .bsp y el sha256sum de los que cambiaron desde la última comparación;
+    los demás se toman de la caché de verificación.
+    Devuelve un dict mapa -> "igual", "distinto", "solo local" o "solo servidor", o None si falla.
+    """
+    cuadro_estado.insert(tk.END, f"Conectando al servidor {ip}:{puerto}...\n")
+    cuadro_estado.see(tk.END)
+    try:
+        transport = abrir_transport(ip, puerto, usuario, contrasena)
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error al conectar o autenticar: {e}\n")
+        cuadro_estado.see(tk.END)
+        return None
+
+    try:
+        maps_remoto = posixpath.join(base_ruta, "maps")
+        codigo, stdout, stderr = ejecutar_remoto(
+            transport, f"cd {shlex.quote(maps_remoto)} && find . -maxdepth 1 -iname '*.bsp' -printf '%s:%T@ %f\\n'"
+        )
+        if codigo != 0:
+            cuadro_estado.insert(tk.END, f"No se pudo listar {maps_remoto}: {stderr.strip()}\n")
+            return None
+        huellas_remotas = {}
+        for linea in stdout.splitlines():
+            huella, _, nombre = linea.partition(" ")
+            if nombre:
+                huellas_remotas[nombre] = huella
+
+        cache = verificador_bsp.cargar_cache(ruta_cache)
+        remotos = cache["remoto"]
+        prefijo = f"{ip}:{maps_remoto}/"
+        pendientes = [n for n, h in huellas_remotas.items() if remotos.get(prefijo + n, {}).get("huella") != h]
+        if trabajo:
+            trabajo.verificar()
+        if pendientes:
+            cuadro_estado.insert(tk.END, f"Calculando SHA-256 de {len(pendientes)} mapas en el servidor...\n")
+            cuadro_estado.see(tk.END)
+            comando = f"cd {shlex.quote(maps_remoto)} && sha256sum -- " + " ".join(shlex.quote(n) for n in pendientes)
+            _, stdout, _ = ejecutar_remoto(transport, comando)
+            for linea in stdout.splitlines():
+                partes = linea.split(None, 1)
+                if len(partes) == 2:
+                    nombre = partes[1].lstrip('*')
+                    remotos[prefijo + nombre] = {"huella": huellas_remotas.get(nombre), "sha256": partes[0].lower()}
+            if ruta_cache:
+                verificador_bsp.guardar_cache(ruta_cache, cache)
+
+        hashes_remotos = {os.path.splitext(n)[0].lower(): remotos.get(prefijo + n, {}).get("sha256") for n in huellas_remotas}
+        comparacion = {}
+        for r in resultados:
+            mapa = r["mapa"].lower()
+            if mapa not in hashes_remotos:
+                comparacion[r["mapa"]] = "solo local"
+            elif hashes_remotos[mapa] == r["sha256"]:
+                comparacion[r["mapa"]] = "igual"
+            else:
+                comparacion[r["mapa"]] = "distinto"
+        locales = {r["mapa"].lower() for r in resultados}
+        for mapa in sorted(hashes_remotos):
+            if mapa not in locales:
+                comparacion[mapa] = "solo servidor"
+
+        distintos = [m for m, e in comparacion.items() if e == "distinto"]
+        cuadro_estado.insert(tk.END, f"Comparación con el servidor: {sum(1 for e in comparacion.values() if e == 'igual')} iguales, "
+                                     f"{len(distintos)} distintos.\n")
+        for mapa, estado in comparacion.items():
+            if estado != "igual":
+                cuadro_estado.insert(tk.END, f"  {mapa}: {estado}\n")
+        if distintos:
+            cuadro_estado.insert(tk.END, "Los clientes con la versión local de los mapas distintos verán 'map differs from server'.\n")
+        cuadro_estado.see(tk.END)
+        return comparacion
+    except trabajos.Cancelado:
+        cuadro_estado.insert(tk.END, "Comparación cancelada.\n")
+        raise
+    except Exception as e:
+        cuadro_estado.insert(tk.END, f"Error inesperado: {e}\n")
+        cuadro_estado.see(tk.END)
+        return None
+    finally:
+        transport.close()
@@ -0,0 +1,134 @@
+import itertools
+import re
+import threading
+import time
+from collections import namedtuple
+
+# Tiempo máximo por comando si no se indica otro
+TIMEOUT_COMANDO = 10.0
+# Máximo de texto pendiente de procesar que se conserva si no llega ningún marcador
+MAX_BUFFER = 256 * 1024
+
+ResultadoComando = namedtuple("ResultadoComando", ["comando", "salida", "duracion", "completo"])
+
+_tokens = itertools.count(1)
+
+def leer_script(texto):
+    """
+    Separa un script de comandos en una lista. Acepta un comando por línea o varios
+    separados por ';' y descarta las líneas vacías y los comentarios ('#' o '//').
+    """
+    comandos = []
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea or linea.startswith('#') or linea.startswith('//'):
+            continue
+        comandos.extend(c.strip() for c in linea.split(';') if c.strip())
+    return comandos
+
+class EjecutorComandos:
+    """
+    Ejecuta comandos en la consola del servidor abierta con rcon_ftp.conectar_rcon y separa
+    la respuesta de cada uno. Los comandos se envían todos juntos (pipelining) y el fin de
+    cada respuesta se detecta por un marcador: con 'prompt=None' se envía tras cada comando
+    un 'echo' con un centinela único; si se indica una expresión 'prompt', cada aparición
+    del prompt cierra la respuesta del comando en curso.
+    """
+    def __init__(self, canal, oyentes, prompt=None, timeout=TIMEOUT_COMANDO):
+        self.canal = canal
+        self.oyentes = oyentes
+        self.prompt = re.compile(prompt, re.MULTILINE) if prompt else None
+        self.timeout = timeout
+        self._buffer = ""
+        self._cond = threading.Condition()
+        self._lock_ejecucion = threading.Lock()
+        oyentes.append(self._recibir)
+
+    def cerrar(self):
+        if self._recibir in self.oyentes:
+            self.oyentes.remove(self._recibir)
+
+    def _recibir(self, texto):
+        with self._cond:
+            self._buffer += texto
+            if len(self._buffer) > MAX_BUFFER:
+                self._buffer = self._buffer[-MAX_BUFFER:]
+            self._cond.notify_all()
+
+    def _esperar_marcador(self, marcador, limite):
+        """
+        Espera hasta 'limite' a que aparezca 'marcador' en el buffer. Devuelve el texto
+        anterior al marcador (y lo consume) o None si se agotó el tiempo.
+        """
+        with self._cond:
+            while True:
+                m = marcador.search(self._buffer)
+                if m:
+                    salida = self._buffer[:m.start()]
+                    self._buffer = self._buffer[m.end():]
+                    return salida
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._cond.wait(restante)
+
+    def _enviar(self, texto):
+        self.canal.sendall(texto.encode('utf-8'))
+
+    def _limpiar_salida(self, comando, salida):
+        # Quitar el eco del propio comando y de los centinelas que muestra la consola
+        # (la consola de Quake 2 antepone ']' a lo que se escribe)
+        lineas = []
+        for linea in salida.splitlines():
+            escrito = linea.strip().lstrip(']').strip()
+            if escrito and escrito != comando and not escrito.startswith("echo __fin_"):
+                lineas.append(linea)
+        return "\n".join(lineas)
+
+    def ejecutar(self, comandos, timeout=None):
+        """
+        Envía 'comandos' y devuelve un ResultadoComando por cada uno con su salida, la
+        duración desde el envío y si la respuesta se completó antes del timeout.
+        """
+        timeout = timeout or self.timeout
+        with self._lock_ejecucion:
+            token = f"{int(time.time())}_{next(_tokens)}"
+            if self.prompt is None:
+                marcadores = [re.compile(rf'^\s*__fin_{token}_{i}__\s*$', re.MULTILINE) for i in range(len(comandos) + 1)]
+                # Sincronizar: descartar lo que haya en la consola antes del primer centinela
+                self._enviar(f"echo __fin_{token}_0__\n")
+                self._esperar_marcador(marcadores[0], time.monotonic() + timeout)
+                lote = "".join(f"{c}\necho __fin_{token}_{i + 1}__\n" for i, c in enumerate(comandos))
+                marcadores = marcadores[1:]
+            else:
+                with self._cond:
+                    self._buffer = ""
+                lote = "".join(f"{c}\n" for c in comandos)
+                marcadores = [self.prompt] * len(comandos)
+
+            inicio = time.monotonic()
+            self._enviar(lote)
+
+            resultados = []
+            limite = inicio + timeout
+            for comando, marcador in zip(comandos, marcadores):
+                salida = self._esperar_marcador(marcador, limite)
+                ahora = time.monotonic()
+                if salida is None:
+                    with self._cond:
+                        salida, self._buffer = self._buffer, ""
+                    resultados.append(ResultadoComando(comando, self._limpiar_salida(comando, salida), ahora - inicio, False))
+                else:
+                    resultados.append(ResultadoComando(comando, self._limpiar_salida(comando, salida), ahora - inicio, True))
+                # Cada comando tiene su propio plazo, contado desde que terminó el anterior
+                limite = ahora + timeout
+            return resultados
+
+def formatear_resultados(resultados):
+    lineas = []
+    for r in resultados:
+        estado = "" if r.completo else "  [TIMEOUT]"
+        lineas.append(f"> {r.comando}  ({r.duracion * 1000:.0f} ms){estado}")
+        if r.salida:
+            lineas.append(r.salida)
+    return "\n".join(lineas)
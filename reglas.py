@@ -0,0 +1,213 @@
+"""
+Motor de reglas para editar entidades de muchos mapas a la vez.
+
+Las reglas se escriben en un archivo JSON con una lista de objetos como este:
+
+    {
+        "nombre": "spawn_protect del eje",
+        "mapas": ["dday2", "dust"],
+        "coincide": {"classname": "spawn_protect", "claves": {"obj_owner": "1", "message": {"existe": false}}},
+        "acciones": [
+            {"asignar": {"obj_owner": "2"}},
+            {"eliminar": ["noise"]},
+            {"renombrar": {"msg": "message"}},
+            {"eliminar_entidad": true}
+        ],
+        "insertar": [{"classname": "light", "origin": "0 0 0"}]
+    }
+
+'mapas' es opcional (por defecto la regla se aplica a todos). En 'coincide', 'classname'
+puede ser un texto o una lista, y cada clave se compara con un texto exacto o con un
+predicado: {"existe": bool}, {"distinto": texto} o {"regex": expresión}. Las entidades de
+'insertar' se agregan una vez por mapa al que se aplica la regla.
+"""
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import parsing
+import snapshots
+
+# Reglas compiladas en cada proceso del pool (se compilan una sola vez por proceso). Solo
+# la usan los procesos del pool; en el proceso principal las reglas se pasan como argumento.
+_reglas_proceso = None
+
+class ErrorRegla(ValueError):
+    """
+    Error en la definición de una regla.
+    """
+
+def cargar_reglas(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        reglas = json.load(f)
+    if not isinstance(reglas, list):
+        raise ErrorRegla("El archivo de reglas debe contener una lista de reglas.")
+    return reglas
+
+def _compilar_predicado(clave, condicion):
+    if isinstance(condicion, str):
+        return lambda claves: claves.get(clave) == condicion
+    if isinstance(condicion, dict) and "existe" in condicion:
+        existe = bool(condicion["existe"])
+        return lambda claves: (clave in claves) == existe
+    if isinstance(condicion, dict) and "distinto" in condicion:
+        valor = condicion["distinto"]
+        return lambda claves: claves.get(clave) != valor
+    if isinstance(condicion, dict) and "regex" in condicion:
+        try:
+            patron = re.compile(condicion["regex"])
+        except re.error as e:
+            raise ErrorRegla(f"Expresión regular no válida para la clave '{clave}': {e}")
+        return lambda claves: clave in claves and patron.search(claves[clave]) is not None
+    raise ErrorRegla(f"Condición no válida para la clave '{clave}': {condicion!r}")
+
+def _compilar_accion(accion):
+    if "asignar" in accion:
+        valores = dict(accion["asignar"])
+        def asignar(entidad):
+            restantes = dict(valores)
+            resultado = []
+            for k, v in entidad:
+                if k in restantes:
+                    resultado.append((k, restantes.pop(k)))
+                else:
+                    resultado.append((k, v))
+            return resultado + list(restantes.items())
+        return asignar
+    if "eliminar" in accion:
+        claves = set(accion["eliminar"])
+        return lambda entidad: [(k, v) for k, v in entidad if k not in claves]
+    if "renombrar" in accion:
+        nombres = dict(accion["renombrar"])
+        return lambda entidad: [(nombres.get(k, k), v) for k, v in entidad]
+    if accion.get("eliminar_entidad"):
+        return lambda entidad: None
+    raise ErrorRegla(f"Acción no válida: {accion!r}")
+
+def compilar_reglas(reglas):
+    """
+    Convierte las reglas en tuplas (nombre, mapas, coincide, acciones, insertar) con los
+    predicados y acciones ya preparados para aplicarlas muchas veces.
+    """
+    compiladas = []
+    nombres = set()
+    for i, regla in enumerate(reglas):
+        nombre = regla.get("nombre") or f"regla {i + 1}"
+        # Los aciertos se informan por nombre: dos reglas con el mismo sumarían sus cuentas
+        if nombre in nombres:
+            raise ErrorRegla(f"Hay más de una regla llamada '{nombre}'.")
+        nombres.add(nombre)
+        coincide = regla.get("coincide", {})
+        classname = coincide.get("classname")
+        if isinstance(classname, str):
+            classname = {classname}
+        elif classname is not None:
+            classname = set(classname)
+        predicados = [_compilar_predicado(k, c) for k, c in coincide.get("claves", {}).items()]
+
+        def coincide_entidad(claves, classname=classname, predicados=predicados):
+            if classname is not None and claves.get("classname") not in classname:
+                return False
+            return all(p(claves) for p in predicados)
+
+        acciones = [_compilar_accion(a) for a in regla.get("acciones", [])]
+        insertar = [list(e.items()) for e in regla.get("insertar", [])]
+        mapas = set(regla["mapas"]) if regla.get("mapas") else None
+        if not acciones and not insertar:
+            raise ErrorRegla(f"La regla '{nombre}' no tiene acciones ni entidades para insertar.")
+        compiladas.append((nombre, mapas, coincide_entidad, acciones, insertar))
+    return compiladas
+
+def aplicar_reglas_entidades(mapa, entidades, compiladas):
+    """
+    Aplica las reglas compiladas a las entidades de un mapa en una sola pasada.
+    Devuelve (entidades_nuevas, aciertos) donde aciertos es un dict nombre_regla -> cantidad.
+    """
+    aciertos = {nombre: 0 for nombre, *_ in compiladas}
+    aplicables = [r for r in compiladas if r[1] is None or mapa in r[1]]
+    resultado = []
+    for entidad in entidades:
+        for nombre, _, coincide_entidad, acciones, _ in aplicables:
+            if not acciones or not coincide_entidad(dict(entidad)):
+                continue
+            aciertos[nombre] += 1
+            for accion in acciones:
+                entidad = accion(entidad)
+                if entidad is None:
+                    break
+            if entidad is None:
+                break
+        if entidad is not None:
+            resultado.append(entidad)
+    for nombre, _, _, _, insertar in aplicables:
+        if insertar:
+            resultado.extend(list(e) for e in insertar)
+            aciertos[nombre] += len(insertar)
+    return resultado, aciertos
+
+def _inicializar_proceso(reglas):
+    global _reglas_proceso
+    _reglas_proceso = compilar_reglas(reglas)
+
+def _aplicar_archivo_proceso(args):
+    ruta, simular = args
+    return _aplicar_archivo(ruta, simular, _reglas_proceso)
+
+def _aplicar_archivo(ruta, simular, compiladas):
+    mapa = os.path.splitext(os.path.basename(ruta))[0]
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            entidades = parsing.parse_entities(f.read())
+        nuevas, aciertos = aplicar_reglas_entidades(mapa, entidades, compiladas)
+        if any(aciertos.values()) and not simular:
+            temporal = f"{ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write(parsing.serializar_entidades(nuevas))
+            os.replace(temporal, ruta)
+        return {"mapa": mapa, "aciertos": aciertos}
+    except Exception as e:
+        return {"mapa": mapa, "error": str(e), "aciertos": {}}
+
+def aplicar_reglas(reglas, rutas, simular=False, procesos=None):
+    """
+    Aplica 'reglas' a los .ent de 'rutas' en un pool de procesos; cada proceso compila las
+    reglas una vez y cada archivo se analiza una sola vez. Con 'simular' no se escribe nada.
+    Devuelve (resultados_por_mapa, aciertos_totales_por_regla).
+    """
+    # Compilar aquí primero para informar los errores de las reglas antes de lanzar procesos
+    compiladas = compilar_reglas(reglas)
+    if len(rutas) < 8 or procesos == 1:
+        resultados = [_aplicar_archivo(ruta, simular, compiladas) for ruta in rutas]
+    else:
+        tareas = [(ruta, simular) for ruta in rutas]
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_inicializar_proceso, initargs=(reglas,)) as executor:
+            resultados = list(executor.map(_aplicar_archivo_proceso, tareas, chunksize=4))
+
+    totales = {nombre: 0 for nombre, *_ in compiladas}
+    for r in resultados:
+        for nombre, cantidad in r["aciertos"].items():
+            totales[nombre] += cantidad
+    return resultados, totales
+
+def respaldar_directorio(script_dir, directorio):
+    """
+    Guarda una versión (ver snapshots.crear_snapshot) con todos los .ent de 'directorio',
+    para poder volver atrás una edición en el lugar. Devuelve el id de la versión.
+    """
+    mapas = sorted(os.path.splitext(f)[0] for f in os.listdir(directorio) if f.lower().endswith('.ent'))
+    return snapshots.crear_snapshot(script_dir, directorio, mapas)
+
+def formatear_resultado(resultados, totales, simular):
+    lineas = ["Simulación (no se modificó ningún archivo)" if simular else "Reglas aplicadas"]
+    for nombre, cantidad in totales.items():
+        lineas.append(f"  {nombre}: {cantidad} aciertos")
+    for r in resultados:
+        if r.get("error"):
+            lineas.append(f"  Error en {r['mapa']}: {r['error']}")
+        elif any(r["aciertos"].values()):
+            detalle = ", ".join(f"{n}={c}" for n, c in r["aciertos"].items() if c)
+            lineas.append(f"  {r['mapa']}: {detalle}")
+    return "\n".join(lineas)
@@ -0,0 +1,284 @@
+"""
+Rotación de mapas según la cantidad de jugadores.
+
+Cada mapa tiene una capacidad calculada de sus entidades (puntos de aparición, limitada por
+'maxclients'). Al crear el RotadorCarga se arma una tabla con un grupo de mapas adecuados
+para cada cantidad posible de jugadores (0..maxclients), así que en cada consulta la
+decisión es buscar el grupo y avanzar su puntero: O(1) sin importar cuántos mapas haya.
+El rotador consulta 'status' por RCON y recalcula su elección, pero solo la envía al
+servidor en el cambio de mapa: cuando la consola muestra el fin del nivel manda el comando
+configurable (por defecto 'gamemap', que cambia de mapa en el acto). El server.cfg generado
+rota con 'sv maplist', que ignora cvars como sv_maplist, así que fijar el próximo mapa de
+antemano no tendría efecto; si el rotador no llega a tiempo, sigue la rotación de maplist.txt.
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+
+import parsing
+from rcon_script import ResultadoComando
+
+# Plantilla por defecto del comando que cambia al mapa elegido al terminar el nivel
+COMANDO_SIGUIENTE = 'gamemap "{mapa}"'
+# Líneas de la consola que marcan el fin de un nivel (límite de tiempo o de frags, o la
+# victoria de un equipo). Las líneas de chat ("nombre: mensaje") no coinciden.
+PATRON_FIN_NIVEL = r'^(?:Timelimit hit|Fraglimit hit)\.?$|^[^:]+ (?:has|have) won\b'
+INTERVALO_CONSULTA = 30.0
+MAXCLIENTS = 24
+# Un mapa es adecuado desde esta fracción de su capacidad hasta su capacidad completa
+OCUPACION_MINIMA = 0.3
+# Clases de entidad en las que aparecen jugadores (Quake 2 y D-Day); info_player_intermission
+# es solo la cámara del fin de nivel
+CLASES_SPAWN = {"info_player_start", "info_player_deathmatch", "info_player_coop", "info_reinforcements_start"}
+
+Capacidad = namedtuple("Capacidad", ["mapa", "spawns", "capacidad", "minimo"])
+
+# Filas de jugadores de la salida de 'status' ("num score ping name lastmsg address qport")
+PATRON_JUGADOR_STATUS = re.compile(r'^\s*\d+\s+-?\d+\s+(?:\d+|CNCT|ZMBI)\s+\S')
+PATRON_MAPA_STATUS = re.compile(r'^\s*map\s*:\s*(\S+)', re.MULTILINE)
+
+def es_spawn(classname):
+    return classname in CLASES_SPAWN
+
+def capacidad_mapa(mapa, entidades, maxclients=MAXCLIENTS):
+    """
+    Capacidad de un mapa a partir de sus entidades: un jugador por punto de aparición,
+    limitado por 'maxclients'. Un 'maxclients' en worldspawn (si el mapa lo trae) lo reduce.
+    """
+    spawns = 0
+    limite = maxclients
+    for entidad in entidades:
+        claves = dict(entidad)
+        classname = claves.get("classname", "")
+        if es_spawn(classname):
+            spawns += 1
+        elif classname == "worldspawn" and claves.get("maxclients", "").isdigit():
+            limite = min(limite, int(claves["maxclients"]))
+    capacidad = max(1, min(spawns or limite, limite))
+    return Capacidad(mapa, spawns, capacidad, int(capacidad * OCUPACION_MINIMA))
+
+def capacidades_rotacion(ents_dir, mapas, maxclients=MAXCLIENTS):
+    capacidades = []
+    for mapa in mapas:
+        ruta = os.path.join(ents_dir, f"{mapa}.ent")
+        if not os.path.isfile(ruta):
+            continue
+        with open(ruta, 'r', encoding='utf-8') as f:
+            capacidades.append(capacidad_mapa(mapa, parsing.parse_entities(f.read()), maxclients))
+    return capacidades
+
+def jugadores_status(salida):
+    """
+    Devuelve (cantidad_de_jugadores, mapa_actual) a partir de la salida de 'status'.
+    """
+    jugadores = sum(1 for linea in salida.splitlines() if PATRON_JUGADOR_STATUS.match(linea))
+    m = PATRON_MAPA_STATUS.search(salida)
+    return jugadores, (m.group(1) if m else None)
+
+class RotadorCarga:
+    """
+    Elige el próximo mapa según los jugadores conectados. 'ejecutor' es un
+    rcon_script.EjecutorComandos (o un ServidorSimulado) y 'capacidades' la lista de
+    Capacidad de los mapas de la rotación, en el orden de la rotación. El rotador se agrega
+    a los oyentes de la consola del ejecutor para detectar el fin de cada nivel con
+    'patron_fin' y en ese momento envía 'comando' con el mapa elegido.
+    """
+    def __init__(self, ejecutor, capacidades, maxclients=MAXCLIENTS, comando=COMANDO_SIGUIENTE,
+                 intervalo=INTERVALO_CONSULTA, al_decidir=None, patron_fin=PATRON_FIN_NIVEL):
+        if not capacidades:
+            raise ValueError("La rotación no tiene mapas con entidades.")
+        self.ejecutor = ejecutor
+        self.maxclients = maxclients
+        self.comando = comando
+        self.intervalo = intervalo
+        self.al_decidir = al_decidir
+        self.patron_fin = re.compile(patron_fin)
+        self.capacidades = {c.mapa: c for c in capacidades}
+        self.grupos = self._armar_grupos(capacidades)
+        self.punteros = [0] * len(self.grupos)
+        self.mapa_actual = None
+        self.elegido = None
+        self.enviado = None
+        self.ultimo_error = None
+        self._parcial = ""
+        self._fin_nivel = threading.Event()
+        # Mapa que se estaba jugando cuando terminó el nivel
+        self._mapa_fin = None
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        ejecutor.oyentes.append(self.recibir)
+
+    def _armar_grupos(self, capacidades):
+        """
+        Para cada cantidad de jugadores, los mapas cuya ventana [mínimo, capacidad] la
+        contiene; si no hay ninguno, los de la ventana más cercana.
+        """
+        grupos = []
+        for n in range(self.maxclients + 1):
+            adecuados = [c.mapa for c in capacidades if c.minimo <= n <= c.capacidad]
+            if not adecuados:
+                distancia = lambda c: c.minimo - n if n < c.minimo else n - c.capacidad
+                menor = min(distancia(c) for c in capacidades)
+                adecuados = [c.mapa for c in capacidades if distancia(c) == menor]
+            grupos.append(adecuados)
+        return grupos
+
+    def recibir(self, texto):
+        """
+        Oyente de la consola: marca el fin del nivel y despierta al hilo del rotador, que
+        envía el comando (aquí no se puede, porque este es el hilo que lee las respuestas).
+        """
+        partes = (self._parcial + texto).split("\n")
+        self._parcial = partes.pop()
+        if any(self.patron_fin.search(linea.strip()) for linea in partes):
+            self._mapa_fin = self.mapa_actual
+            self._fin_nivel.set()
+            self._despertar.set()
+
+    def decidir(self, jugadores):
+        """
+        Próximo mapa para 'jugadores': el siguiente del grupo en orden de rotación, evitando
+        repetir el mapa actual si el grupo tiene otro.
+        """
+        n = max(0, min(jugadores, self.maxclients))
+        grupo = self.grupos[n]
+        indice = self.punteros[n] % len(grupo)
+        if grupo[indice] == self.mapa_actual and len(grupo) > 1:
+            indice = (indice + 1) % len(grupo)
+        return grupo[indice], indice
+
+    def paso(self):
+        """
+        Una consulta: lee 'status', avanza la rotación si el mapa cambió y recalcula la
+        elección. Si desde la consulta anterior terminó el nivel, envía la elección al
+        servidor, salvo que el servidor ya haya pasado a otro mapa por su cuenta. El fin del
+        nivel se olvida recién cuando se resolvió: si 'status' falla, la próxima consulta
+        vuelve a intentarlo. Devuelve (jugadores, elegido).
+        """
+        fin_nivel = self._fin_nivel.is_set()
+        mapa_fin = self._mapa_fin
+        resultado = self.ejecutor.ejecutar(["status"])[0]
+        jugadores, mapa = jugadores_status(resultado.salida)
+        jugadores = min(jugadores, self.maxclients)
+        if mapa and mapa != self.mapa_actual:
+            # El mapa cambió: si es el elegido ya se jugó y el grupo pasa al siguiente
+            if self.elegido and mapa == self.elegido[0]:
+                grupo_jugadores, indice = self.elegido[1], self.elegido[2]
+                self.punteros[grupo_jugadores] = indice + 1
+            self.mapa_actual = mapa
+        elegido, indice = self.decidir(jugadores)
+        self.elegido = (elegido, jugadores, indice)
+        if fin_nivel and mapa_fin and mapa and mapa != mapa_fin:
+            # La rotación del servidor ganó la carrera: un gamemap ahora cortaría el mapa nuevo
+            self._fin_nivel.clear()
+        elif fin_nivel:
+            comando = self.comando.format(mapa=elegido)
+            respuesta = self.ejecutor.ejecutar([comando])[0]
+            self._fin_nivel.clear()
+            if "Unknown command" in respuesta.salida:
+                raise ValueError(f"El servidor no reconoce el comando de rotación '{comando}'.")
+            self.enviado = elegido
+        if self.al_decidir:
+            self.al_decidir(jugadores, self.mapa_actual, elegido)
+        return jugadores, elegido
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.paso()
+                self.ultimo_error = None
+            except Exception as e:
+                # Un fallo de la consola no detiene el rotador; se reintenta en la próxima consulta
+                self.ultimo_error = e
+            # El fin de un nivel adelanta la próxima consulta
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def iniciar(self):
+        if self.activo():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        if self.recibir in self.ejecutor.oyentes:
+            self.ejecutor.oyentes.remove(self.recibir)
+
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive() and not self._detener.is_set()
+
+class ServidorSimulado:
+    """
+    Servidor falso con la interfaz de EjecutorComandos para probar el rotador sin red.
+    'jugadores' es una función tick -> cantidad de jugadores. Cada nivel dura 'duracion'
+    ticks; al terminar imprime "Timelimit hit." en la consola y, si en el tick siguiente
+    nadie cambió de mapa, pasa al siguiente de 'maplist' como 'sv maplist'. Solo entiende
+    'status', 'map' y 'gamemap'; cualquier otro comando responde "Unknown command".
+    """
+    def __init__(self, mapa_inicial, jugadores, duracion=20, maplist=None):
+        self.mapa = mapa_inicial
+        self.jugadores = jugadores
+        self.duracion = duracion
+        self.maplist = list(maplist or [mapa_inicial])
+        self.oyentes = []
+        self.tick = 0
+        self.inicio_nivel = 0
+        self.intermision = False
+        self.historial = [(0, mapa_inicial)]
+        self.comandos = []
+
+    def _cambiar_mapa(self, mapa):
+        self.mapa = mapa
+        self.inicio_nivel = self.tick
+        self.intermision = False
+        self.historial.append((self.tick, mapa))
+
+    def ejecutar(self, comandos, timeout=None):
+        resultados = []
+        for comando in comandos:
+            self.comandos.append((self.tick, comando))
+            partes = comando.replace('"', ' ').split()
+            if comando == "status":
+                filas = "\n".join(f"{i:3d} {0:5d} {50:4d} jugador{i:<11d} 0 10.0.0.{i}:27901 {1000 + i}"
+                                  for i in range(self.jugadores(self.tick)))
+                salida = f"map              : {self.mapa}\nnum score ping name            lastmsg address               qport\n--- ----- ---- --------------- ------- --------------------- ------\n{filas}"
+            elif len(partes) == 2 and partes[0] in ("map", "gamemap"):
+                self._cambiar_mapa(partes[1])
+                salida = ""
+            else:
+                salida = f'Unknown command "{partes[0] if partes else comando}"'
+            resultados.append(ResultadoComando(comando, salida, 0.0, True))
+        return resultados
+
+    def avanzar(self):
+        self.tick += 1
+        if self.intermision:
+            # Nadie eligió el mapa durante la intermisión: sigue la rotación de maplist.txt
+            siguiente = self.maplist[(self.maplist.index(self.mapa) + 1) % len(self.maplist)] if self.mapa in self.maplist else self.maplist[0]
+            self._cambiar_mapa(siguiente)
+        elif self.tick - self.inicio_nivel >= self.duracion:
+            self.intermision = True
+            for oyente in list(self.oyentes):
+                oyente("Timelimit hit.\n")
+
+def simular(capacidades, jugadores, ticks=200, duracion=20, maxclients=MAXCLIENTS, comando=COMANDO_SIGUIENTE):
+    """
+    Ejecuta el rotador contra un ServidorSimulado durante 'ticks' consultas y devuelve una
+    lista (tick, jugadores, mapa, capacidad) con cada mapa jugado.
+    """
+    servidor = ServidorSimulado(capacidades[0].mapa, jugadores, duracion, [c.mapa for c in capacidades])
+    rotador = RotadorCarga(servidor, capacidades, maxclients, comando)
+    por_mapa = {c.mapa: c for c in capacidades}
+    for _ in range(ticks):
+        try:
+            rotador.paso()
+        except ValueError as e:
+            # Como en el bucle real: el error queda registrado y la simulación sigue
+            rotador.ultimo_error = e
+        servidor.avanzar()
+    return [(tick, jugadores(tick), mapa, por_mapa[mapa].capacidad) for tick, mapa in servidor.historial]
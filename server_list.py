@@ -3,6 +3,11 @@ import os
 import tkinter as tk
 import re
 
+import minificador
+import parsing
+import snapshots
+import trabajos
+
 def generar_maplist_txt(entidades, script_dir, text_area):
     """
     Genera el archivo maplist.txt en el directorio raíz del script con la lista de mapas proporcionada.
@@ -109,16 +114,53 @@ def generar_server_cfg(entidades, script_dir, text_area):
         message = f"Error al generar server.cfg: {e}"
         text_area.insert(tk.END, message + "\n")
 
-def generar_ents_modificados(custom_listbox, ents_dir, output_dir, text_area):
+def generar_ents_modificados(custom_listbox, ents_dir, output_dir, text_area, planificador=None, al_terminar=None,
+                             presupuesto=minificador.MAX_MAP_ENTSTRING):
     """
     Genera nuevos archivos .ent con el campo 'nextmap' actualizado según la lista personalizada
     y crea un archivo maplist.txt y server.cfg en el directorio raíz del script.
+    Con un planificador, la generación corre en segundo plano. 'al_terminar()' se llama
+    desde el hilo de Tk cuando la generación termina.
     """
     entidades = custom_listbox.get(0, tk.END)
     if not entidades:
         messagebox.showwarning("Advertencia", "La lista personalizada está vacía.")
         return
 
+    mensaje_fin = "Generación de entidades modificadas, maplist.txt y server.cfg completada."
+    if planificador is None:
+        try:
+            generar_rotacion(entidades, ents_dir, output_dir, text_area, presupuesto=presupuesto)
+        except minificador.PresupuestoExcedido as e:
+            messagebox.showerror("Error", str(e))
+            return None
+        if al_terminar:
+            al_terminar()
+        messagebox.showinfo("Completado", mensaje_fin)
+        return None
+
+    def terminar(trabajo):
+        if al_terminar:
+            al_terminar()
+        trabajos.notificar_fin(trabajo, "Completado", mensaje_fin)
+
+    trabajo = planificador.enviar(
+        "Generar ents modificados",
+        lambda trabajo: generar_rotacion(entidades, ents_dir, output_dir, trabajo.salida(text_area), trabajo, presupuesto),
+        al_terminar=terminar
+    )
+    if trabajo is None:
+        messagebox.showwarning("Advertencia", "Hay demasiados trabajos en cola. Intenta más tarde.")
+    return trabajo
+
+def generar_rotacion(entidades, ents_dir, output_dir, text_area, trabajo=None, presupuesto=minificador.MAX_MAP_ENTSTRING):
+    """
+    Escribe en 'output_dir' los .ent de 'entidades' con su 'nextmap' apuntando al siguiente
+    mapa de la lista y genera maplist.txt y server.cfg. No usa Tk, por lo que puede
+    ejecutarse como trabajo en segundo plano.
+    Los .ent se guardan minificados (son los que se despliegan); si alguno supera
+    'presupuesto' bytes se lanza PresupuestoExcedido sin escribir ningún archivo.
+    """
     # Crear el directorio 'ents_modificados' si no existe
     os.makedirs(output_dir, exist_ok=True)
 
@@ -126,7 +168,13 @@ def generar_ents_modificados(custom_listbox, ents_dir, output_dir, text_area):
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
     total = len(entidades)
+    excedidos = []
+    generados = []
     for i, entidad in enumerate(entidades):
+        if trabajo:
+            trabajo.verificar()
+            trabajo.informar_progreso(i, total)
+
         # Determinar el nuevo 'nextmap'
         nuevo_nextmap = entidades[(i + 1) % total]
 
@@ -166,23 +214,48 @@ def generar_ents_modificados(custom_listbox, ents_dir, output_dir, text_area):
             # Esto evita que se agreguen líneas en blanco extra
             nuevo_content = re.sub(r'\n\s*\n', '\n', nuevo_content)
 
-            # Guardar el nuevo contenido en el directorio 'ents_modificados'
-            ent_modificado_path = os.path.join(output_dir, f"{entidad}.ent")
-            with open(ent_modificado_path, 'w', encoding='utf-8') as file:
-                file.write(nuevo_content)
-
-            # Informar al usuario
-            text_area.insert(tk.END, f"Generado: {ent_modificado_path}\n")
+            # Minificar y comprobar que el mapa entre en el tamaño máximo de entidades
+            antes = minificador.tamano_cadena(nuevo_content)
+            nuevo_content = parsing.serializar_entidades(minificador.minificar_entidades(parsing.parse_entities(nuevo_content)))
+            despues = minificador.tamano_cadena(nuevo_content)
+            if despues > presupuesto:
+                excedidos.append(entidad)
+            text_area.insert(tk.END, f"  {minificador.formatear_tamano(entidad, antes, despues, presupuesto)}\n")
+            generados.append((entidad, nuevo_content))
         except Exception as e:
             message = f"Error al modificar {ent_original_path}: {e}"
             text_area.insert(tk.END, message + "\n")
 
+    # El presupuesto se comprueba antes de escribir, para no dejar en 'output_dir' un .ent
+    # que el motor no puede cargar
+    if excedidos:
+        text_area.insert(tk.END, '-' * 60 + "\n")
+        raise minificador.PresupuestoExcedido(
+            f"{len(excedidos)} mapas superan el máximo de {presupuesto} bytes de entidades: {', '.join(excedidos)}"
+        )
+
+    # Guardar el nuevo contenido en el directorio 'ents_modificados'
+    for entidad, nuevo_content in generados:
+        ent_modificado_path = os.path.join(output_dir, f"{entidad}.ent")
+        try:
+            with open(ent_modificado_path, 'w', encoding='utf-8') as file:
+                file.write(nuevo_content)
+            text_area.insert(tk.END, f"Generado: {ent_modificado_path}\n")
+        except OSError as e:
+            text_area.insert(tk.END, f"Error al guardar {ent_modificado_path}: {e}\n")
+
     # Después de modificar los archivos .ent, generar maplist.txt y server.cfg
     generar_maplist_txt(entidades, script_dir, text_area)
     generar_server_cfg(entidades, script_dir, text_area)
 
+    # Guardar la rotación generada en el almacén de versiones
+    try:
+        build_id = snapshots.crear_snapshot(script_dir, output_dir, entidades)
+        text_area.insert(tk.END, f"Versión guardada: {build_id}\n")
+    except Exception as e:
+        text_area.insert(tk.END, f"Error al guardar la versión: {e}\n")
+
     text_area.insert(tk.END, '-' * 60 + "\n")
-    messagebox.showinfo("Completado", "Generación de entidades modificadas, maplist.txt y server.cfg completada.")
 
 def agregar_elemento(treeview, custom_listbox):
     """
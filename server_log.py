@@ -0,0 +1,324 @@
+import posixpath
+import re
+import shlex
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import paramiko
+
+import rcon_ftp
+
+# Máximo de bytes leídos del log en cada consulta
+TAMANO_LECTURA = 64 * 1024
+# Bytes del inicio del log usados para detectar que el archivo fue rotado
+TAMANO_FIRMA = 64
+# Límites de memoria del agregador
+MAX_JUGADORES = 2000
+MAX_MAPAS = 500
+MAX_EVENTOS_RECIENTES = 200
+
+Evento = namedtuple("Evento", ["tipo", "tiempo", "mapa", "datos"])
+CambioMapa = namedtuple("CambioMapa", ["tipo", "mapa", "duracion"])
+
+# Líneas de un cambio de mapa. El motor siempre imprime "Server Initialization" y la línea de
+# guiones con la que SV_SpawnServer termina; "SpawnServer: <mapa>" solo aparece con developer 1.
+# El nombre se toma del comando que pidió el cambio (escrito en la consola, "]map dust", o tal
+# como el servidor registra lo recibido por RCON, "rcon <clave> gamemap dust") o del campo 'map'
+# de la salida de 'status'. 'sv maplist' cambia de mapa sin nombrarlo.
+PATRON_COMANDO_MAPA = re.compile(
+    r'^(?:\]\s*|rcon\s+\S+\s+)?(?:(?:map|gamemap|newmap|sv\s+newmap)(?:\s+"?\*?(?P<mapa>[^\s"$;*]+)[^\s"]*"?)?'
+    r'|sv\s+maplist\s+(?:next|start|goto\b.*))(?:\s|$)', re.IGNORECASE)
+PATRON_INICIALIZACION = re.compile(r'^-+\s*Server Initialization\s*-+$')
+PATRON_FIN_CARGA = re.compile(r'^-{10,}$')
+PATRON_MAPA = re.compile(r'^SpawnServer:\s+(?P<mapa>\S+)')
+PATRON_MAPA_STATUS = re.compile(r'^map\s*:\s*(?P<mapa>\S+)')
+# Una carga que no termina en este tiempo se da por perdida
+MAX_CARGA = 120.0
+
+# Expresiones de las líneas de consola que interesan. El orden importa: el chat
+# ("nombre: mensaje") es el patrón más genérico y se prueba al final.
+PATRON_ENTRADA = re.compile(r'^(?P<jugador>.+?) entered the game')
+PATRON_SALIDA = re.compile(r'^(?P<jugador>.+?) disconnected')
+PATRON_MUERTE = re.compile(r"^(?P<victima>.+?) (?:was|were) (?P<accion>[\w\s]+?) by (?P<asesino>.+?)(?:'s? .*)?$")
+PATRON_SUICIDIO = re.compile(r'^(?P<victima>.+?) (?:suicides|killed (?:himself|herself|itself)|died)\.?$')
+# Chat tal como lo imprime el juego en la consola: "nombre: mensaje" o "(nombre): mensaje" para
+# el chat de equipo; los nombres tienen como máximo 15 caracteres (netname de 16 con el nulo)
+PATRON_CHAT = re.compile(r'^(?P<equipo>\()?(?P<jugador>[^\s:()\[\]][^:()\[\]]{0,14})(?(equipo)\)): (?P<mensaje>.*)$')
+# Prefijos de mensajes del motor con el mismo formato que el chat ("Warning: ...")
+PREFIJOS_MOTOR = {"warning", "error", "usage", "spawnserver", "serverinfo", "userinfo", "gamedir",
+                  "map", "version", "info", "loading", "game", "server"}
+
+class DetectorMapa:
+    """
+    Sigue los cambios de mapa línea a línea sin depender de developer 1. Una carga empieza con
+    el comando de cambio o con "Server Initialization" y termina con la línea de guiones; si
+    hasta entonces no se supo el nombre (ni por el comando ni por SpawnServer), la carga queda
+    pendiente hasta la próxima salida de 'status'.
+    procesar() devuelve un CambioMapa o None:
+    - ("inicio", None, None) al empezar una carga;
+    - ("fin", mapa, segundos) cuando terminó y se conoce el mapa; 'segundos' es la duración
+      de la carga, sin contar la espera del nombre;
+    - ("actual", mapa, None) si 'status' muestra un mapa distinto sin que se haya visto la
+      carga (por ejemplo, al empezar a leer con el servidor ya en marcha).
+    """
+    def __init__(self, max_carga=MAX_CARGA):
+        self.max_carga = max_carga
+        self.mapa = None
+        self._inicio = None
+        self._nombre = None
+        self._inicializando = False
+        self._duracion = None
+
+    def _iniciar(self, ahora, nueva):
+        # Un comando y el "Server Initialization" que provoca son una sola carga
+        if nueva or self._inicio is None or self._duracion is not None or ahora - self._inicio > self.max_carga:
+            self._inicio = ahora
+            self._nombre = None
+            self._duracion = None
+            return CambioMapa("inicio", None, None)
+        return None
+
+    def _terminar(self):
+        cambio = CambioMapa("fin", self._nombre, self._duracion)
+        self.mapa = self._nombre
+        self._inicio = None
+        self._nombre = None
+        self._duracion = None
+        return cambio
+
+    def procesar(self, linea, ahora):
+        linea = linea.strip()
+        # Antes que los comandos: "map : dday1" de 'status' también empieza con "map"
+        m = PATRON_MAPA_STATUS.match(linea)
+        if m:
+            if self._duracion is not None:
+                self._nombre = m.group("mapa")
+                return self._terminar()
+            if m.group("mapa") != self.mapa and not self._inicializando:
+                self.mapa = m.group("mapa")
+                return CambioMapa("actual", self.mapa, None)
+            return None
+        m = PATRON_COMANDO_MAPA.match(linea)
+        if m:
+            cambio = self._iniciar(ahora, nueva=False)
+            if m.group("mapa"):
+                self._nombre = m.group("mapa")
+            return cambio
+        if PATRON_INICIALIZACION.match(linea):
+            cambio = self._iniciar(ahora, nueva=self._inicializando)
+            self._inicializando = True
+            return cambio
+        m = PATRON_MAPA.match(linea)
+        if m and self._inicio is not None:
+            self._nombre = m.group("mapa")
+            return None
+        if self._inicializando and PATRON_FIN_CARGA.match(linea):
+            self._inicializando = False
+            self._duracion = ahora - self._inicio
+            return self._terminar() if self._nombre else None
+        return None
+
+def parsear_linea(linea, mapa_actual=None, tiempo=None):
+    """
+    Convierte una línea de la consola del servidor en un Evento, o devuelve None si la
+    línea no corresponde a una muerte, entrada, salida o mensaje de chat. Los cambios de
+    mapa dependen de varias líneas y los detecta DetectorMapa.
+    """
+    linea = linea.strip()
+    if not linea:
+        return None
+    tiempo = tiempo if tiempo is not None else time.time()
+
+    m = PATRON_ENTRADA.match(linea)
+    if m:
+        return Evento("entrada", tiempo, mapa_actual, {"jugador": m.group("jugador")})
+    m = PATRON_SALIDA.match(linea)
+    if m:
+        return Evento("salida", tiempo, mapa_actual, {"jugador": m.group("jugador")})
+    m = PATRON_MUERTE.match(linea)
+    if m:
+        return Evento("muerte", tiempo, mapa_actual, {
+            "victima": m.group("victima"), "asesino": m.group("asesino"), "accion": m.group("accion").strip()
+        })
+    m = PATRON_SUICIDIO.match(linea)
+    if m:
+        return Evento("muerte", tiempo, mapa_actual, {"victima": m.group("victima"), "asesino": None, "accion": "suicidio"})
+    m = PATRON_CHAT.match(linea)
+    if m and m.group("jugador").strip().lower() not in PREFIJOS_MOTOR:
+        return Evento("chat", tiempo, mapa_actual, {"jugador": m.group("jugador"), "mensaje": m.group("mensaje"),
+                                                    "equipo": bool(m.group("equipo"))})
+    return None
+
+class Estadisticas:
+    """
+    Agrega los eventos de forma incremental en estadísticas por mapa y por jugador.
+    La memoria está acotada: los jugadores y mapas menos recientes se descartan al superar
+    los límites y solo se guardan los últimos eventos.
+    """
+    def __init__(self, max_jugadores=MAX_JUGADORES, max_mapas=MAX_MAPAS):
+        self.max_jugadores = max_jugadores
+        self.max_mapas = max_mapas
+        self.mapa_actual = None
+        self.mapas = OrderedDict()
+        self.jugadores = OrderedDict()
+        self.recientes = deque(maxlen=MAX_EVENTOS_RECIENTES)
+        self.lock = threading.Lock()
+
+    def _entrada(self, tabla, clave, limite, campos):
+        fila = tabla.get(clave)
+        if fila is None:
+            fila = dict.fromkeys(campos, 0)
+            tabla[clave] = fila
+            if len(tabla) > limite:
+                tabla.popitem(last=False)
+        else:
+            tabla.move_to_end(clave)
+        return fila
+
+    def _mapa(self, nombre):
+        return self._entrada(self.mapas, nombre or "desconocido", self.max_mapas,
+                             ("partidas", "muertes", "entradas", "mensajes"))
+
+    def _jugador(self, nombre):
+        return self._entrada(self.jugadores, nombre, self.max_jugadores,
+                             ("muertes", "bajas", "entradas", "mensajes"))
+
+    def agregar(self, evento):
+        with self.lock:
+            self.recientes.append(evento)
+            if evento.tipo == "mapa":
+                self.mapa_actual = evento.mapa
+                self._mapa(evento.mapa)["partidas"] += 1
+            elif evento.tipo == "actual":
+                self.mapa_actual = evento.mapa
+            elif evento.tipo == "entrada":
+                self._mapa(evento.mapa)["entradas"] += 1
+                self._jugador(evento.datos["jugador"])["entradas"] += 1
+            elif evento.tipo == "muerte":
+                self._mapa(evento.mapa)["muertes"] += 1
+                self._jugador(evento.datos["victima"])["muertes"] += 1
+                asesino = evento.datos["asesino"]
+                if asesino and asesino != evento.datos["victima"]:
+                    self._jugador(asesino)["bajas"] += 1
+            elif evento.tipo == "chat":
+                self._mapa(evento.mapa)["mensajes"] += 1
+                self._jugador(evento.datos["jugador"])["mensajes"] += 1
+
+    def resumen(self):
+        """
+        Devuelve una copia de las estadísticas para mostrarlas sin bloquear al agregador.
+        """
+        with self.lock:
+            return {
+                "mapa_actual": self.mapa_actual,
+                "mapas": {k: dict(v) for k, v in self.mapas.items()},
+                "jugadores": {k: dict(v) for k, v in self.jugadores.items()},
+                "recientes": list(self.recientes),
+            }
+
+def identidad_archivo(transport, ruta):
+    """
+    Devuelve "dispositivo:inodo" de un archivo remoto (SFTP no informa el inodo, se usa
+    'stat' por un canal exec), o None si el servidor no pudo calcularlo.
+    """
+    codigo, stdout, _ = rcon_ftp.ejecutar_remoto(transport, f"stat -L -c '%d:%i' -- {shlex.quote(ruta)}")
+    identidad = stdout.strip()
+    return identidad if codigo == 0 and identidad else None
+
+class SeguidorLog:
+    """
+    Sigue el log de consola del servidor por SFTP leyendo solo los bytes nuevos desde el
+    último offset. Detecta truncados y rotaciones (el archivo se achica, cambia su inicio o
+    pasa a ser otro archivo, con otro dispositivo/inodo) y vuelve a empezar desde el
+    principio. Corre en un hilo en segundo plano.
+    """
+    def __init__(self, parametros, ruta_log, estadisticas=None, intervalo=2.0):
+        self.parametros = parametros
+        self.ruta_log = ruta_log
+        self.estadisticas = estadisticas or Estadisticas()
+        self.intervalo = intervalo
+        self.offset = 0
+        self.firma = b''
+        self.identidad = None
+        self.pendiente = b''
+        self.detector = DetectorMapa()
+        self.error = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def activo(self):
+        return bool(self._hilo and self._hilo.is_alive())
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            transport = None
+            try:
+                p = self.parametros
+                transport = rcon_ftp.abrir_transport(p["ip"], p["puerto"], p["usuario"], p["password"])
+                sftp = paramiko.SFTPClient.from_transport(transport)
+                ruta = self.ruta_log
+                if not posixpath.isabs(ruta):
+                    ruta = posixpath.join(sftp.normalize(p["ruta_principal"] or "."), ruta)
+                self.error = None
+                while not self._detener.is_set():
+                    self.leer_nuevos(sftp, ruta, identidad_archivo(transport, ruta))
+                    self._detener.wait(self.intervalo)
+            except Exception as e:
+                self.error = str(e)
+                self._detener.wait(self.intervalo * 5)
+            finally:
+                if transport:
+                    transport.close()
+
+    def leer_nuevos(self, sftp, ruta, identidad=None):
+        """
+        Lee lo agregado al log desde el último offset y procesa las líneas completas.
+        'identidad' es el "dispositivo:inodo" actual del log (ver identidad_archivo), o None
+        si no se pudo obtener; un cambio indica que el log fue rotado aunque empiece igual.
+        """
+        tamano = sftp.stat(ruta).st_size
+        with sftp.open(ruta, 'rb') as f:
+            firma = f.read(TAMANO_FIRMA)
+            rotado = bool(identidad and self.identidad and identidad != self.identidad)
+            if rotado or tamano < self.offset or (self.firma and not firma.startswith(self.firma[:len(firma)])):
+                # Log truncado o rotado: empezar de nuevo
+                self.offset = 0
+                self.pendiente = b''
+            self.firma = firma
+            if identidad:
+                self.identidad = identidad
+            while self.offset < tamano and not self._detener.is_set():
+                f.seek(self.offset)
+                datos = f.read(min(TAMANO_LECTURA, tamano - self.offset))
+                if not datos:
+                    break
+                self.offset += len(datos)
+                self._procesar(datos)
+
+    def _procesar(self, datos):
+        lineas = (self.pendiente + datos).split(b'\n')
+        # La última línea puede estar incompleta, se guarda para la próxima lectura
+        self.pendiente = lineas.pop()
+        if len(self.pendiente) > TAMANO_LECTURA:
+            self.pendiente = b''
+        for linea in lineas:
+            texto = linea.decode('utf-8', errors='replace')
+            ahora = time.time()
+            cambio = self.detector.procesar(texto, ahora)
+            if cambio and cambio.tipo in ("fin", "actual"):
+                self.estadisticas.agregar(Evento("mapa" if cambio.tipo == "fin" else "actual", ahora, cambio.mapa, {}))
+                continue
+            evento = parsear_linea(texto, self.estadisticas.mapa_actual, ahora)
+            if evento:
+                self.estadisticas.agregar(evento)
@@ -0,0 +1,234 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+# Directorio de las sesiones grabadas, relativo al directorio del script
+DIRECTORIO_SESIONES = "sesiones_rcon"
+# Un bloque comprimido se cierra al llegar a este tamaño sin comprimir o tras este intervalo
+TAMANO_BLOQUE = 64 * 1024
+INTERVALO_BLOQUE = 15.0
+# Un segmento se rota al superar este tamaño comprimido o al cambiar el día
+TAMANO_SEGMENTO = 8 * 1024 * 1024
+# Filtro de Bloom por bloque para el índice de palabras. Se indexan los comienzos de cada
+# palabra (de MIN_PREFIJO a MAX_PREFIJO caracteres) para que una búsqueda por el comienzo
+# de una palabra ('dday' -> 'dday2') también pueda descartar bloques
+BITS_BLOOM = 16384
+HASHES_BLOOM = 3
+MIN_PREFIJO = 3
+MAX_PREFIJO = 16
+PATRON_PALABRA = re.compile(r'\w+')
+
+def palabras(texto):
+    """
+    Divide un texto en palabras en minúsculas; se usa igual para las líneas y las búsquedas.
+    """
+    return PATRON_PALABRA.findall(texto.lower())
+
+def coincide(consulta, linea):
+    """
+    True si cada palabra de 'consulta' (lista de palabras()) es el comienzo de alguna
+    palabra de 'linea'.
+    """
+    propias = palabras(linea)
+    return all(any(p.startswith(c) for p in propias) for c in consulta)
+
+def _posiciones_bloom(palabra):
+    digest = hashlib.blake2b(palabra.encode('utf-8'), digest_size=4 * HASHES_BLOOM).digest()
+    return [int.from_bytes(digest[i * 4:i * 4 + 4], 'little') % BITS_BLOOM for i in range(HASHES_BLOOM)]
+
+def _bloom(texto):
+    bits = bytearray(BITS_BLOOM // 8)
+    prefijos = set()
+    for palabra in set(palabras(texto)):
+        for largo in range(MIN_PREFIJO, min(len(palabra), MAX_PREFIJO) + 1):
+            prefijos.add(palabra[:largo])
+    for prefijo in prefijos:
+        for p in _posiciones_bloom(prefijo):
+            bits[p >> 3] |= 1 << (p & 7)
+    return bits
+
+def _bloom_contiene(bits, palabra):
+    return all(bits[p >> 3] & (1 << (p & 7)) for p in _posiciones_bloom(palabra))
+
+class GrabadorSesion:
+    """
+    Graba la salida de la consola RCON en segmentos de solo anexado. Cada línea se guarda con
+    su hora; las líneas se agrupan en bloques comprimidos con zlib e independientes entre sí,
+    y por cada bloque se agrega al índice (.idx) su rango de tiempo, su posición en el segmento
+    y un filtro de Bloom con sus palabras. Se usa como oyente de rcon_ftp.conectar_rcon.
+    """
+    def __init__(self, directorio, tamano_segmento=TAMANO_SEGMENTO, intervalo=INTERVALO_BLOQUE):
+        self.directorio = directorio
+        self.tamano_segmento = tamano_segmento
+        self.intervalo = intervalo
+        self._parcial = ""
+        self._lineas = []
+        self._tamano = 0
+        self._inicio_bloque = None
+        self._segmento = None
+        self._dia_segmento = None
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        os.makedirs(directorio, exist_ok=True)
+        threading.Thread(target=self._vaciar_periodicamente, daemon=True).start()
+
+    def __call__(self, texto):
+        self.recibir(texto)
+
+    def recibir(self, texto, ahora=None):
+        ahora = ahora if ahora is not None else time.time()
+        with self._lock:
+            partes = (self._parcial + texto).split("\n")
+            self._parcial = partes.pop()
+            for linea in partes:
+                if not linea.strip():
+                    continue
+                if self._inicio_bloque is None:
+                    self._inicio_bloque = ahora
+                registro = f"{ahora:.3f}\t{linea}\n"
+                self._lineas.append(registro)
+                self._tamano += len(registro)
+            if self._tamano >= TAMANO_BLOQUE:
+                self._escribir_bloque(ahora)
+
+    def _vaciar_periodicamente(self):
+        while not self._detener.wait(self.intervalo):
+            self.vaciar()
+
+    def vaciar(self):
+        with self._lock:
+            if self._lineas:
+                self._escribir_bloque(time.time())
+
+    def cerrar(self):
+        self._detener.set()
+        with self._lock:
+            if self._parcial.strip():
+                ahora = time.time()
+                self._inicio_bloque = self._inicio_bloque or ahora
+                self._lineas.append(f"{ahora:.3f}\t{self._parcial}\n")
+                self._parcial = ""
+            if self._lineas:
+                self._escribir_bloque(time.time())
+
+    def _ruta_segmento(self, ahora):
+        dia = time.strftime("%Y%m%d", time.localtime(ahora))
+        if self._segmento is None or dia != self._dia_segmento or os.path.getsize(self._segmento) >= self.tamano_segmento:
+            nombre = time.strftime("%Y%m%d-%H%M%S", time.localtime(ahora))
+            self._segmento = os.path.join(self.directorio, f"{nombre}.seg")
+            self._dia_segmento = dia
+        return self._segmento
+
+    def _escribir_bloque(self, ahora):
+        texto = "".join(self._lineas)
+        comprimido = zlib.compress(texto.encode('utf-8'), 6)
+        segmento = self._ruta_segmento(ahora)
+        with open(segmento, 'ab') as f:
+            offset = f.tell()
+            f.write(comprimido)
+        entrada = {
+            "ini": self._inicio_bloque,
+            "fin": ahora,
+            "off": offset,
+            "len": len(comprimido),
+            "bloom": base64.b64encode(bytes(_bloom(texto))).decode('ascii'),
+        }
+        with open(segmento[:-4] + ".idx", 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entrada) + "\n")
+        self._lineas = []
+        self._tamano = 0
+        self._inicio_bloque = None
+
+def _inicio_segmento(base):
+    try:
+        return time.mktime(time.strptime(os.path.basename(base), "%Y%m%d-%H%M%S"))
+    except ValueError:
+        return None
+
+def _segmentos(directorio, desde=None, hasta=None):
+    """
+    Segmentos (ruta sin extensión) que pueden tener líneas entre 'desde' y 'hasta'. El nombre
+    de cada segmento es su hora de inicio, así que un segmento termina donde empieza el siguiente.
+    """
+    if not os.path.isdir(directorio):
+        return []
+    bases = sorted(os.path.join(directorio, f[:-4]) for f in os.listdir(directorio) if f.endswith('.idx'))
+    seleccion = []
+    for i, base in enumerate(bases):
+        inicio = _inicio_segmento(base)
+        siguiente = _inicio_segmento(bases[i + 1]) if i + 1 < len(bases) else None
+        if hasta is not None and inicio is not None and inicio > hasta:
+            continue
+        if desde is not None and siguiente is not None and siguiente < desde:
+            continue
+        seleccion.append(base)
+    return seleccion
+
+def buscar(directorio, desde=None, hasta=None, texto=None, limite=5000):
+    """
+    Devuelve las líneas (hora, texto) grabadas entre 'desde' y 'hasta' (epoch, opcionales)
+    que contienen todas las palabras de 'texto', en cualquier orden; cada palabra buscada
+    puede ser el comienzo de una palabra de la línea ('Player' encuentra 'Player1').
+    Solo se leen los índices y se descomprimen los bloques cuyo rango de tiempo y filtro de
+    Bloom pueden contener resultados. Sin 'texto' sirve para reproducir una ventana de tiempo.
+    """
+    consulta = palabras(texto or "")
+    # Las palabras de menos de MIN_PREFIJO caracteres no están en el Bloom; solo se comprueban en las líneas
+    claves = [c[:MAX_PREFIJO] for c in consulta if len(c) >= MIN_PREFIJO]
+    resultados = []
+    for base in _segmentos(directorio, desde, hasta):
+        with open(base + ".idx", 'r', encoding='utf-8') as f:
+            entradas = [json.loads(l) for l in f if l.strip()]
+        candidatos = []
+        for e in entradas:
+            if desde is not None and e["fin"] < desde:
+                continue
+            if hasta is not None and e["ini"] > hasta:
+                continue
+            if claves:
+                bits = base64.b64decode(e["bloom"])
+                if not all(_bloom_contiene(bits, c) for c in claves):
+                    continue
+            candidatos.append(e)
+        if not candidatos:
+            continue
+        with open(base + ".seg", 'rb') as seg:
+            for e in candidatos:
+                seg.seek(e["off"])
+                bloque = zlib.decompress(seg.read(e["len"])).decode('utf-8', errors='replace')
+                for registro in bloque.splitlines():
+                    marca, _, linea = registro.partition("\t")
+                    hora = float(marca)
+                    if desde is not None and hora < desde:
+                        continue
+                    if hasta is not None and hora > hasta:
+                        continue
+                    if consulta and not coincide(consulta, linea):
+                        continue
+                    resultados.append((hora, linea))
+                    if len(resultados) >= limite:
+                        return resultados
+    return resultados
+
+def leer_hora(texto):
+    """
+    Convierte 'AAAA-MM-DD', 'AAAA-MM-DD HH:MM' o 'AAAA-MM-DD HH:MM:SS' (hora local) a epoch.
+    Devuelve None si el texto está vacío.
+    """
+    texto = texto.strip()
+    if not texto:
+        return None
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(texto, formato))
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha no válida: '{texto}' (usar AAAA-MM-DD HH:MM)")
+
+def formatear_lineas(lineas):
+    return "\n".join(f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(h))}] {l}" for h, l in lineas)
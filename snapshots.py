@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+# Directorio del almacén, relativo al directorio del script
+DIRECTORIO_ALMACEN = ".snapshots"
+# Archivo que guarda la versión que está materializada en el directorio de trabajo
+ARCHIVO_ACTUAL = "actual"
+
+def _rutas(script_dir):
+    base = os.path.join(script_dir, DIRECTORIO_ALMACEN)
+    return base, os.path.join(base, "objects"), os.path.join(base, "builds")
+
+def ruta_objeto(script_dir, hash_contenido):
+    """
+    Ruta local del objeto comprimido con el contenido de hash 'hash_contenido'.
+    """
+    return os.path.join(_rutas(script_dir)[1], f"{hash_contenido}.gz")
+
+def guardar_objeto(script_dir, datos):
+    """
+    Guarda 'datos' en el almacén direccionado por contenido y devuelve su SHA-256.
+    Si el objeto ya existe no se vuelve a escribir, así las versiones comparten los archivos iguales.
+    Los objetos se comprimen con gzip (sin fecha, para que sean reproducibles) y así el
+    servidor puede descomprimirlos con 'gzip -dc'.
+    """
+    hash_contenido = hashlib.sha256(datos).hexdigest()
+    ruta = ruta_objeto(script_dir, hash_contenido)
+    if not os.path.exists(ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(gzip.compress(datos, compresslevel=9, mtime=0))
+        os.replace(temporal, ruta)
+    return hash_contenido
+
+def leer_objeto(script_dir, hash_contenido):
+    with open(ruta_objeto(script_dir, hash_contenido), 'rb') as f:
+        return gzip.decompress(f.read())
+
+def crear_snapshot(script_dir, output_dir, entidades):
+    """
+    Guarda en el almacén la rotación recién generada: maplist.txt, server.cfg y los .ent de
+    'entidades' en 'output_dir'. Devuelve el identificador de la versión, derivado de su
+    contenido, de modo que generar dos veces la misma rotación no crea una versión nueva.
+    """
+    archivos = {}
+    for nombre in ("maplist.txt", "server.cfg"):
+        with open(os.path.join(script_dir, nombre), 'rb') as f:
+            archivos[nombre] = guardar_objeto(script_dir, f.read())
+    for entidad in entidades:
+        ruta = os.path.join(output_dir, f"{entidad}.ent")
+        if os.path.isfile(ruta):
+            with open(ruta, 'rb') as f:
+                archivos[f"ents/{entidad}.ent"] = guardar_objeto(script_dir, f.read())
+
+    canonico = json.dumps(archivos, sort_keys=True).encode('utf-8')
+    build_id = hashlib.sha256(canonico).hexdigest()[:12]
+
+    _, _, builds_dir = _rutas(script_dir)
+    os.makedirs(builds_dir, exist_ok=True)
+    ruta_manifiesto = os.path.join(builds_dir, f"{build_id}.json")
+    if not os.path.exists(ruta_manifiesto):
+        manifiesto = {"id": build_id, "fecha": time.time(), "mapas": list(entidades), "archivos": archivos}
+        with open(ruta_manifiesto, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=1)
+    _guardar_actual(script_dir, build_id)
+    return build_id
+
+def cargar_manifiesto(script_dir, build_id):
+    with open(os.path.join(_rutas(script_dir)[2], f"{build_id}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def listar_snapshots(script_dir):
+    """
+    Devuelve los manifiestos de todas las versiones guardadas, de la más reciente a la más antigua.
+    """
+    builds_dir = _rutas(script_dir)[2]
+    if not os.path.isdir(builds_dir):
+        return []
+    manifiestos = []
+    for archivo in os.listdir(builds_dir):
+        if archivo.endswith('.json'):
+            manifiestos.append(cargar_manifiesto(script_dir, archivo[:-5]))
+    return sorted(manifiestos, key=lambda m: m["fecha"], reverse=True)
+
+def version_actual(script_dir):
+    ruta = os.path.join(_rutas(script_dir)[0], ARCHIVO_ACTUAL)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return f.read().strip() or None
+
+def _guardar_actual(script_dir, build_id):
+    ruta = os.path.join(_rutas(script_dir)[0], ARCHIVO_ACTUAL)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(build_id)
+
+def _hash_archivo(ruta):
+    try:
+        with open(ruta, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def restaurar_snapshot(script_dir, output_dir, build_id):
+    """
+    Vuelve el directorio de trabajo (maplist.txt, server.cfg y 'output_dir') a la versión
+    'build_id'. Solo se escriben los archivos cuyo contenido en disco difiere del de la
+    versión (así se deshacen también las ediciones hechas a mano) y se borran los .ent que
+    no pertenecen a la versión restaurada. Devuelve la cantidad de archivos escritos.
+    """
+    manifiesto = cargar_manifiesto(script_dir, build_id)
+
+    os.makedirs(output_dir, exist_ok=True)
+    escritos = 0
+    for nombre, hash_contenido in manifiesto["archivos"].items():
+        if nombre.startswith("ents/"):
+            destino = os.path.join(output_dir, nombre[len("ents/"):])
+        else:
+            destino = os.path.join(script_dir, nombre)
+        if _hash_archivo(destino) == hash_contenido:
+            continue
+        temporal = f"{destino}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(leer_objeto(script_dir, hash_contenido))
+        os.replace(temporal, destino)
+        escritos += 1
+
+    for archivo in os.listdir(output_dir):
+        if archivo.endswith('.ent') and f"ents/{archivo}" not in manifiesto["archivos"]:
+            os.remove(os.path.join(output_dir, archivo))
+
+    _guardar_actual(script_dir, build_id)
+    return escritos
@@ -0,0 +1,52 @@
+import os
+import struct
+import sys
+
+import pytest
+
+# Los módulos de la herramienta están en la raíz del repositorio, sin paquete
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class CuadroFalso:
+    """
+    Cuadro de texto con la interfaz que usan las funciones de la herramienta (insert/see).
+    """
+    def __init__(self):
+        self.partes = []
+
+    def insert(self, indice, texto):
+        self.partes.append(texto)
+
+    def see(self, indice):
+        pass
+
+    @property
+    def texto(self):
+        return "".join(self.partes)
+
+@pytest.fixture
+def cuadro():
+    return CuadroFalso()
+
+def construir_bsp(entidades=b'', texturas=(), lumps=None):
+    """
+    Arma un .bsp de Quake 2 mínimo: header de 160 bytes, el lump de entidades, un texinfo
+    por textura y los demás lumps vacíos salvo los de 'lumps' (índice -> bytes).
+    """
+    contenido = dict(lumps or {})
+    contenido.setdefault(0, entidades)
+    if texturas:
+        contenido[5] = b''.join(struct.pack('<8f2i32si', *([0.0] * 8), 0, 0, t.encode('ascii'), -1) for t in texturas)
+    datos = b''
+    directorio = []
+    offset = 160
+    for i in range(19):
+        lump = contenido.get(i, b'')
+        directorio.append((offset + len(datos), len(lump)))
+        datos += lump + b'\x00' * (-len(lump) % 4)
+    header = b'IBSP' + struct.pack('<i', 38) + b''.join(struct.pack('<ii', o, l) for o, l in directorio)
+    return header + datos
+
+@pytest.fixture
+def bsp():
+    return construir_bsp
@@ -0,0 +1,167 @@
+import io
+import os
+import shlex
+import shutil
+import subprocess
+import tarfile
+
+import pytest
+
+pytest.importorskip("paramiko")
+
+import rcon_ftp
+
+def paquete(archivos, completo=True):
+    datos = io.BytesIO()
+    with tarfile.open(fileobj=datos, mode='w:gz') as tar:
+        for nombre, contenido in archivos.items():
+            info = tarfile.TarInfo(nombre)
+            info.size = len(contenido)
+            tar.addfile(info, io.BytesIO(contenido))
+        if completo:
+            tar.addfile(tarfile.TarInfo(rcon_ftp.MARCA_PAQUETE))
+    return datos.getvalue()
+
+def extraer(base, archivos, completo=True):
+    return ejecutar_script(base, paquete(archivos, completo))
+
+def ejecutar_script(base, datos, env=None):
+    script = rcon_ftp.SCRIPT_EXTRACCION.replace('{base}', shlex.quote(str(base)))
+    return subprocess.run(["sh", "-c", script], input=datos, capture_output=True, env=env)
+
+def rotacion(ents):
+    archivos = {"maplist.txt": b"dday1\n", "server.cfg": b"set maxclients 24\n"}
+    archivos.update({f"ents/{nombre}": contenido for nombre, contenido in ents.items()})
+    return archivos
+
+@pytest.fixture
+def base(tmp_path):
+    base = tmp_path / "dday"
+    (base / "ents").mkdir(parents=True)
+    (base / "ents" / "dday1.ent").write_bytes(b"original dday1")
+    (base / "ents" / "fuera_de_rotacion.ent").write_bytes(b"original otro")
+    return base
+
+def versiones(base):
+    return sorted(d for d in os.listdir(base) if d.startswith(".ents-v-"))
+
+def test_activar_conserva_los_ent_fuera_de_la_rotacion(base):
+    resultado = extraer(base, rotacion({"dday1.ent": b"nuevo dday1"}))
+    assert resultado.returncode == 0, resultado.stderr
+
+    assert os.path.islink(base / "ents")
+    assert (base / "ents" / "dday1.ent").read_bytes() == b"nuevo dday1"
+    assert (base / "ents" / "fuera_de_rotacion.ent").read_bytes() == b"original otro"
+    assert (base / ".ents-original" / "dday1.ent").read_bytes() == b"original dday1"
+    assert (base / "maplist.txt").read_bytes() == b"dday1\n"
+    assert not [d for d in os.listdir(base) if d.startswith(".staging-")]
+
+def test_redespliegue_solo_borra_versiones_de_la_herramienta(base):
+    (base / ".ents-manual").mkdir()
+    assert extraer(base, rotacion({"dday1.ent": b"v1"})).returncode == 0
+    primera = versiones(base)
+    resultado = extraer(base, rotacion({"dday2.ent": b"v2"}))
+    assert resultado.returncode == 0, resultado.stderr
+
+    actual = versiones(base)
+    assert len(actual) == 1 and actual != primera
+    assert os.readlink(base / "ents") == actual[0]
+    assert (base / "ents" / "dday1.ent").read_bytes() == b"v1"
+    assert (base / "ents" / "dday2.ent").read_bytes() == b"v2"
+    assert (base / "ents" / "fuera_de_rotacion.ent").read_bytes() == b"original otro"
+    assert (base / ".ents-original" / "dday1.ent").read_bytes() == b"original dday1"
+    assert (base / ".ents-manual").is_dir()
+
+def test_primera_activacion_sin_exchange_avisa(base):
+    resultado = extraer(base, rotacion({"dday1.ent": b"v1"}))
+    if b"Aviso" not in resultado.stdout:
+        pytest.skip("el mv local soporta --exchange")
+    assert os.path.islink(base / "ents")
+    # Las siguientes activaciones reemplazan un enlace por otro con un solo rename
+    assert b"Aviso" not in extraer(base, rotacion({"dday1.ent": b"v2"})).stdout
+
+# 'mv' falso con --exchange (como coreutils 9.5) para probar la rama atómica
+MV_EXCHANGE = """#!/usr/bin/env python3
+import os, sys
+args = sys.argv[1:]
+if "--exchange" in args:
+    origen, destino = [a for a in args if not a.startswith("-")]
+    temporal = destino + ".swap"
+    os.rename(destino, temporal)
+    os.rename(origen, destino)
+    os.rename(temporal, origen)
+else:
+    os.execv("{mv}", ["mv"] + args)
+"""
+
+def test_primera_activacion_con_exchange(base, tmp_path):
+    binarios = tmp_path / "bin"
+    binarios.mkdir()
+    mv = binarios / "mv"
+    mv.write_text(MV_EXCHANGE.replace("{mv}", shutil.which("mv")))
+    mv.chmod(0o755)
+    env = dict(os.environ, PATH=f"{binarios}{os.pathsep}{os.environ['PATH']}")
+
+    resultado = ejecutar_script(base, paquete(rotacion({"dday1.ent": b"nuevo dday1"})), env)
+
+    assert resultado.returncode == 0, resultado.stderr
+    assert b"Aviso" not in resultado.stdout
+    assert os.path.islink(base / "ents")
+    assert (base / "ents" / "dday1.ent").read_bytes() == b"nuevo dday1"
+    assert (base / ".ents-original" / "dday1.ent").read_bytes() == b"original dday1"
+    assert not [d for d in os.listdir(base) if d.startswith("ents.tmp-")]
+
+def test_primer_despliegue_sin_ents(tmp_path):
+    base = tmp_path / "nuevo"
+    resultado = extraer(base, rotacion({"dday1.ent": b"v1"}))
+    assert resultado.returncode == 0, resultado.stderr
+    assert (base / "ents" / "dday1.ent").read_bytes() == b"v1"
+    assert not (base / ".ents-original").exists()
+
+def test_paquete_sin_marca_final_no_se_activa(base):
+    resultado = extraer(base, rotacion({"dday1.ent": b"a medias"}), completo=False)
+    assert resultado.returncode != 0
+    assert b"incompleto" in resultado.stderr
+    assert not os.path.islink(base / "ents")
+    assert (base / "ents" / "dday1.ent").read_bytes() == b"original dday1"
+    assert not [d for d in os.listdir(base) if d.startswith((".staging-", ".ents-v-"))]
+
+def test_paquete_cortado_no_se_activa(base):
+    datos = paquete(rotacion({"dday1.ent": b"x" * 100000}))
+    resultado = ejecutar_script(base, datos[:len(datos) // 2])
+    assert resultado.returncode != 0
+    assert (base / "ents" / "dday1.ent").read_bytes() == b"original dday1"
+    assert not [d for d in os.listdir(base) if d.startswith(".staging-")]
+
+class CanalFalso:
+    """
+    Canal exec que produce mucho stderr antes de su stdout, como un comando que se
+    trabaría si solo se leyera uno de los dos flujos.
+    """
+    def __init__(self):
+        self.stdout = [b"a" * 1000] * 3
+        self.stderr = [b"e" * 1000] * 50
+
+    def recv_ready(self):
+        return bool(self.stdout) and not self.stderr
+
+    def recv(self, n):
+        return self.stdout.pop(0)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, n):
+        return self.stderr.pop(0)
+
+    def exit_status_ready(self):
+        return not self.stdout and not self.stderr
+
+    def recv_exit_status(self):
+        return 3
+
+def test_leer_salidas_lee_ambos_flujos():
+    codigo, stdout, stderr = rcon_ftp._leer_salidas(CanalFalso())
+    assert codigo == 3
+    assert stdout == "a" * 3000
+    assert stderr == "e" * 50000
@@ -0,0 +1,80 @@
+import struct
+
+import pytest
+
+import assets
+
+ENTIDADES = b'{\n"classname" "worldspawn"\n"sky" "desert"\n}\n{\n"classname" "target_speaker"\n"noise" "world/wind"\n}\n'
+
+def escribir_pak(ruta, archivos):
+    datos = b''
+    directorio = b''
+    for nombre, contenido in archivos.items():
+        directorio += struct.pack('<56sii', nombre.encode('latin-1'), 12 + len(datos), len(contenido))
+        datos += contenido
+    ruta.write_bytes(struct.pack('<4sii', assets.MAGIC_PAK, 12 + len(datos), len(directorio)) + datos + directorio)
+
+@pytest.fixture
+def juego(tmp_path, bsp):
+    mapa = tmp_path / "maps" / "dday1.bsp"
+    mapa.parent.mkdir()
+    mapa.write_bytes(bsp(ENTIDADES, texturas=("dday/muro", "dday/piso")))
+    base = tmp_path / "dday"
+    (base / "textures" / "dday").mkdir(parents=True)
+    (base / "textures" / "dday" / "muro.wal").write_bytes(b"wal")
+    (base / "textures" / "dday" / "piso.tga").write_bytes(b"tga")
+    (base / "env").mkdir()
+    for cara in assets.CARAS_CIELO:
+        (base / "env" / f"desert{cara}.png").write_bytes(cara.encode())
+    escribir_pak(base / "pak0.pak", {"sound/world/wind.wav": b"wav"})
+    return mapa, base
+
+def test_referencias_del_bsp(juego):
+    mapa, _ = juego
+    refs = assets.referencias_bsp(str(mapa))
+    assert "textures/dday/muro.wal" in refs
+    assert "sound/world/wind.wav" in refs
+    assert "env/desertup.pcx" in refs
+    assert not any(r.endswith(".tga") for r in refs)
+
+def test_reemplazos_tga_y_png(juego):
+    mapa, base = juego
+    analisis = assets.analizar_rotacion([str(mapa)], [str(base)])
+    archivos = analisis["archivos"]
+    assert archivos["textures/dday/muro.wal"] == "suelto"
+    assert archivos["textures/dday/piso.wal"] == "suelto (textures/dday/piso.tga)"
+    assert archivos["env/desertrt.pcx"] == "suelto (env/desertrt.png)"
+    assert archivos["sound/world/wind.wav"] == "pak:pak0.pak"
+    assert not [r for r, e in archivos.items() if e == "faltante"]
+
+def test_pak_incluye_los_reemplazos(juego, tmp_path):
+    mapa, base = juego
+    analisis = assets.analizar_rotacion([str(mapa)], [str(base)])
+    salida = tmp_path / "rotacion.pak"
+    assert assets.construir_pak(str(salida), analisis, [str(mapa)], excluir_paks=["pak0.pak"]) == 9
+    entradas = assets.leer_directorio_pak(str(salida))
+    assert "textures/dday/piso.tga" in entradas
+    assert "env/desertdn.png" in entradas
+    assert "maps/dday1.bsp" in entradas
+    assert "sound/world/wind.wav" not in entradas
+
+def test_indice_ignora_directorios_ocultos_y_de_la_herramienta(tmp_path):
+    (tmp_path / "sound").mkdir()
+    (tmp_path / "sound" / "a.wav").write_bytes(b"")
+    for directorio in (".git", ".snapshots", "__pycache__", "sesiones_rcon"):
+        (tmp_path / directorio).mkdir()
+        (tmp_path / directorio / "x.wav").write_bytes(b"")
+    assert set(assets.construir_indice([str(tmp_path)])) == {"sound/a.wav"}
+
+def test_nombre_largo_falla_sin_escribir_el_pak(tmp_path, bsp):
+    largo = "sound/" + "a" * 60 + ".wav"
+    (tmp_path / "sound").mkdir()
+    (tmp_path / largo).write_bytes(b"")
+    mapa = tmp_path / "dday1.bsp"
+    mapa.write_bytes(bsp(f'{{\n"classname" "target_speaker"\n"noise" "{largo[6:]}"\n}}\n'.encode()))
+    analisis = assets.analizar_rotacion([str(mapa)], [str(tmp_path)])
+    salida = tmp_path / "rotacion.pak"
+    with pytest.raises(ValueError, match="a" * 60):
+        assets.construir_pak(str(salida), analisis, [str(mapa)])
+    assert not salida.exists()
+    assert not (tmp_path / "rotacion.pak.tmp").exists()
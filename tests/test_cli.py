@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("paramiko")
+
+import cli
+
+@pytest.mark.parametrize("argv", [
+    ["diff", "--ents", "{falta}", "--modificados", "{existe}"],
+    ["diff", "--ents", "{existe}", "--modificados", "{falta}"],
+    ["reglas", "reglas.json", "--dir", "{falta}"],
+    ["verificar", "--maps", "{falta}"],
+    ["recursos", "--maps", "{falta}"],
+    ["rotacion", "--dir", "{falta}", "--simular"],
+])
+def test_directorio_inexistente(tmp_path, capsys, argv):
+    falta = str(tmp_path / "no_existe")
+    argv = [a.format(falta=falta, existe=str(tmp_path)) for a in argv]
+    assert cli.ejecutar_cli(argv) == 2
+    error = capsys.readouterr().err
+    assert error == f"Error: no existe el directorio {falta}\n"
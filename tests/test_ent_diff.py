@@ -0,0 +1,44 @@
+import ent_diff
+import parsing
+
+WORLD = [("classname", "worldspawn"), ("message", "Dday")]
+SPAWN = [("classname", "info_player_start"), ("origin", "0 0 24"), ("angle", "90")]
+PUERTA = [("classname", "func_door"), ("targetname", "puerta1"), ("speed", "100")]
+
+def test_mismas_entidades_en_otro_orden_no_son_cambios():
+    modificadas = [PUERTA, list(reversed(WORLD)), SPAWN]
+    assert not ent_diff.hay_cambios({"mapa": "x", **ent_diff.diferencias_entidades([WORLD, SPAWN, PUERTA], modificadas)})
+
+def test_cambios_agregados_y_eliminados():
+    puerta_rapida = [("classname", "func_door"), ("targetname", "puerta1"), ("speed", "300"), ("wait", "2")]
+    luz = [("classname", "light"), ("origin", "10 10 10")]
+    resultado = ent_diff.diferencias_entidades([WORLD, SPAWN, PUERTA], [WORLD, puerta_rapida, luz])
+
+    assert [e["classname"] for e in resultado["agregadas"]] == ["light"]
+    assert [e["classname"] for e in resultado["eliminadas"]] == ["info_player_start"]
+    [cambio] = resultado["cambiadas"]
+    assert cambio["identidad"] == {"targetname": "puerta1"}
+    assert cambio["modificadas"] == {"speed": ["100", "300"]}
+    assert cambio["agregadas"] == {"wait": "2"}
+
+def escribir(directorio, mapa, entidades):
+    directorio.mkdir(exist_ok=True)
+    (directorio / f"{mapa}.ent").write_text(parsing.serializar_entidades(entidades), encoding='utf-8')
+
+def test_diferencias_rotacion_en_paralelo_igual_que_secuencial(tmp_path):
+    ents = tmp_path / "ents"
+    modificados = tmp_path / "ents_modificados"
+    for i in range(ent_diff.MIN_MAPAS_PARALELO + 4):
+        escribir(ents, f"mapa{i:02d}", [WORLD, SPAWN])
+        escribir(modificados, f"mapa{i:02d}", [WORLD, SPAWN] + ([PUERTA] if i % 3 == 0 else []))
+    escribir(modificados, "solo_modificado", [WORLD])
+
+    secuencial = ent_diff.diferencias_rotacion(str(ents), str(modificados), procesos=1)
+    paralelo = ent_diff.diferencias_rotacion(str(ents), str(modificados), procesos=2)
+    assert paralelo == secuencial
+    cambiados = [r["mapa"] for r in paralelo if ent_diff.hay_cambios(r)]
+    assert cambiados == [f"mapa{i:02d}" for i in range(0, ent_diff.MIN_MAPAS_PARALELO + 4, 3)] + ["solo_modificado"]
+    assert paralelo[-1]["error"] == "falta el .ent original"
+
+    texto = ent_diff.formatear_diferencias(paralelo)
+    assert "== mapa00" in texto and "+ func_door" in texto and "== mapa01" not in texto
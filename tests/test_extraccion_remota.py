@@ -0,0 +1,52 @@
+import io
+
+import parsing
+
+ENTIDADES = b'{\n"classname" "worldspawn"\n"message" "Dday"\n}\n{\n"classname" "info_player_start"\n"origin" "0 0 24"\n}\n\x00'
+
+class ArchivoRemoto(io.BytesIO):
+    def __init__(self, datos, lecturas):
+        super().__init__(datos)
+        self.lecturas = lecturas
+
+    def read(self, n=-1):
+        datos = super().read(n)
+        self.lecturas.append(len(datos))
+        return datos
+
+    def readv(self, rangos):
+        for offset, largo in rangos:
+            self.seek(offset)
+            yield self.read(largo)
+
+class SFTPFalso:
+    def __init__(self, archivos):
+        self.archivos = archivos
+        self.lecturas = []
+        self.bufsize = None
+
+    def open(self, ruta, modo, bufsize=-1):
+        self.bufsize = bufsize
+        if ruta not in self.archivos:
+            raise FileNotFoundError(ruta)
+        return ArchivoRemoto(self.archivos[ruta], self.lecturas)
+
+def test_parse_remote_solo_lee_header_y_entidades(bsp, tmp_path):
+    datos = bsp(ENTIDADES, lumps={1: b'\x01' * 200000})
+    sftp = SFTPFalso({"/q2/dday/maps/dday1.bsp": datos})
+    mapa = parsing.BSPFile("/q2/dday/maps/dday1.bsp")
+
+    assert mapa.parse_remote(sftp) == "Parseo exitoso."
+    assert sftp.bufsize == 0
+    assert mapa.bytes_leidos == parsing.HEADERLEN + len(ENTIDADES)
+    assert sum(sftp.lecturas) == mapa.bytes_leidos < len(datos)
+    assert mapa.entities == ENTIDADES
+
+    assert "dday1.ent" in mapa.save_entities_to_ent(str(tmp_path))
+    assert (tmp_path / "dday1.ent").read_text(encoding='utf-8') == ENTIDADES[:-1].decode()
+
+def test_parse_remote_errores(bsp):
+    sftp = SFTPFalso({"/maps/roto.bsp": b'XXXX' + bsp(ENTIDADES)[4:], "/maps/corto.bsp": bsp(ENTIDADES)[:200]})
+    assert parsing.BSPFile("/maps/roto.bsp").parse_remote(sftp) == "Archivo BSP inválido: /maps/roto.bsp"
+    assert "demasiado corto" in parsing.BSPFile("/maps/corto.bsp").parse_remote(sftp)
+    assert parsing.BSPFile("/maps/falta.bsp").parse_remote(sftp) == "Archivo no encontrado: /maps/falta.bsp"
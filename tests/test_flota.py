@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("paramiko")
+
+import rcon_ftp
+import trabajos
+
+PERFILES = {f"srv{i}": {"ip": f"10.0.0.{i}", "puerto": "22", "usuario": "q2", "password": "x", "ruta_principal": "dday"}
+            for i in range(6)}
+
+def vaciar(cola):
+    eventos = []
+    while True:
+        try:
+            eventos.append(cola.get_nowait())
+        except queue.Empty:
+            return eventos
+
+def test_concurrencia_acotada_y_resultados(monkeypatch):
+    activos = []
+    maximo = []
+    lock = threading.Lock()
+
+    def subir(ip, puerto, usuario, contrasena, base, cuadro_estado, trabajo=None):
+        with lock:
+            activos.append(ip)
+            maximo.append(len(activos))
+        time.sleep(0.05)
+        with lock:
+            activos.remove(ip)
+        if ip == "10.0.0.3":
+            raise OSError("conexión reiniciada")
+        return ip != "10.0.0.5"
+
+    monkeypatch.setattr(rcon_ftp, "subir_varios_archivos_sftp", subir)
+    cola = queue.Queue()
+    resultados = rcon_ftp.desplegar_flota(PERFILES, cola, max_concurrentes=2)
+
+    assert max(maximo) <= 2
+    assert resultados == {"srv0": True, "srv1": True, "srv2": True, "srv3": False, "srv4": True, "srv5": False}
+    eventos = vaciar(cola)
+    assert eventos[-1] == ("fin", None, resultados)
+    assert ("mensaje", "srv3", "Error inesperado: conexión reiniciada\n") in eventos
+
+def test_cancelar_no_inicia_los_pendientes(monkeypatch):
+    class TrabajoCancelado:
+        def cancelado(self):
+            return True
+
+    def subir(*args):
+        raise AssertionError("no debería subir nada")
+
+    monkeypatch.setattr(rcon_ftp, "subir_varios_archivos_sftp", subir)
+    cola = queue.Queue()
+    resultados = rcon_ftp.desplegar_flota(PERFILES, cola, trabajo=TrabajoCancelado())
+    assert not any(resultados.values())
+    assert all(e[2] in ("En cola", "Cancelado") for e in vaciar(cola) if e[0] == "estado")
+
+class CanalFalso:
+    def __init__(self):
+        self.timeout = None
+
+    def settimeout(self, valor):
+        self.timeout = valor
+
+class SFTPFalso:
+    def __init__(self):
+        self.canal = CanalFalso()
+
+    def get_channel(self):
+        return self.canal
+
+    def chdir(self, ruta):
+        if ruta == "ents":
+            raise PermissionError("permiso denegado")
+
+    def getcwd(self):
+        return "/home/q2/dday"
+
+    def put(self, local, remoto):
+        pass
+
+class TransportFalso:
+    def __init__(self):
+        self.cerrado = False
+
+    def close(self):
+        self.cerrado = True
+
+@pytest.mark.parametrize("error", [PermissionError, trabajos.Cancelado])
+def test_transport_se_cierra_ante_errores(monkeypatch, cuadro, error):
+    transport = TransportFalso()
+    sftp = SFTPFalso()
+    if error is trabajos.Cancelado:
+        def chdir(ruta):
+            if ruta == "ents":
+                raise trabajos.Cancelado()
+        sftp.chdir = chdir
+    monkeypatch.setattr(rcon_ftp, "abrir_transport", lambda *args: transport)
+    monkeypatch.setattr(rcon_ftp.paramiko.SFTPClient, "from_transport", lambda t: sftp)
+
+    if error is trabajos.Cancelado:
+        with pytest.raises(trabajos.Cancelado):
+            rcon_ftp.subir_varios_archivos_sftp("10.0.0.1", "22", "q2", "x", "dday", cuadro)
+    else:
+        assert not rcon_ftp.subir_varios_archivos_sftp("10.0.0.1", "22", "q2", "x", "dday", cuadro)
+    assert transport.cerrado
+    assert sftp.canal.timeout == rcon_ftp.TIMEOUT_OPERACION
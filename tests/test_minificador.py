@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import ent_diff
+import minificador
+import parsing
+import server_list
+
+ENT = '''{
+"classname" "worldspawn"
+"message" "Normandía"
+}
+{
+"classname" "info_team_start"
+"origin" "0   0  64"
+"angle" "0"
+"spawnflags" "0"
+"target" ""
+"team" "1"
+"team" "2"
+}
+'''
+
+def test_minificar_entidades():
+    worldspawn, inicio = minificador.minificar_entidades(parsing.parse_entities(ENT))
+    assert worldspawn == [("classname", "worldspawn"), ("message", "Normandía")]
+    # Sin valores por defecto ni vacíos, vectores normalizados y el último valor de cada clave
+    assert inicio == [("classname", "info_team_start"), ("origin", "0 0 64"), ("team", "2")]
+
+def test_angulo_por_defecto_junto_a_angles():
+    # El motor aplica "angle" y "angles" en el orden en que aparecen: un "0" no es neutro
+    entidades = [[("classname", "misc_banner"), ("angles", "0 90 0"), ("angle", "0")],
+                 [("classname", "misc_banner"), ("angle", "0"), ("angles", "0 0 0")],
+                 [("classname", "misc_banner"), ("angle", "0")]]
+    assert minificador.minificar_entidades(entidades) == [
+        [("classname", "misc_banner"), ("angles", "0 90 0"), ("angle", "0")],
+        [("classname", "misc_banner"), ("angle", "0"), ("angles", "0 0 0")],
+        [("classname", "misc_banner")],
+    ]
+
+def test_classname_vacio_se_conserva():
+    assert minificador.minificar_entidades([[("classname", "")]]) == [[("classname", "")]]
+
+def test_tamano_y_formato():
+    assert minificador.tamano_cadena("ñ") == 3
+    assert "EXCEDE" in minificador.formatear_tamano("dday1", 200, 150, presupuesto=100)
+    assert "25.0% menos" in minificador.formatear_tamano("dday1", 200, 150)
+
+def test_save_entities_to_ent_conserva_el_original(tmp_path, bsp):
+    ruta = tmp_path / "dday1.bsp"
+    ruta.write_bytes(bsp(ENT.encode('utf-8')))
+    archivo = parsing.BSPFile(str(ruta))
+    archivo.entities = ENT.encode('utf-8') + b'\x00'
+    archivo.save_entities_to_ent(str(tmp_path))
+    assert (tmp_path / "dday1.ent").read_text(encoding='utf-8') == ENT
+
+@pytest.fixture
+def rotacion(tmp_path, monkeypatch, cuadro):
+    # generar_rotacion escribe maplist.txt y server.cfg junto al módulo
+    herramienta = tmp_path / "herramienta"
+    herramienta.mkdir()
+    monkeypatch.setattr(server_list, "__file__", str(herramienta / "server_list.py"))
+    ents = tmp_path / "ents"
+    ents.mkdir()
+    (ents / "dday1.ent").write_text(ENT, encoding='utf-8')
+    (ents / "dday2.ent").write_text(ENT + '{\n"classname" "light"\n"message" "%s"\n}\n' % ("x" * 500), encoding='utf-8')
+    return ents, tmp_path / "ents_modificados", herramienta
+
+def test_rotacion_minificada(rotacion, cuadro):
+    ents, salida, herramienta = rotacion
+    server_list.generar_rotacion(["dday1", "dday2"], str(ents), str(salida), cuadro)
+    contenido = (salida / "dday1.ent").read_text(encoding='utf-8')
+    assert '"nextmap" "dday2"' in contenido
+    assert '"spawnflags"' not in contenido
+    assert (herramienta / "maplist.txt").exists()
+    # ents/ no cambia: es la base de las comparaciones
+    assert (ents / "dday1.ent").read_text(encoding='utf-8') == ENT
+
+def test_diff_no_informa_la_minificacion(rotacion, cuadro):
+    ents, salida, _ = rotacion
+    server_list.generar_rotacion(["dday1", "dday2"], str(ents), str(salida), cuadro)
+    resultado = ent_diff.diferencias_mapa(("dday1", str(ents), str(salida)))
+    # Solo el nextmap agregado al worldspawn, no los valores por defecto quitados
+    assert resultado["eliminadas"] == [] and resultado["agregadas"] == []
+    assert [c["agregadas"] for c in resultado["cambiadas"]] == [{"nextmap": "dday2"}]
+
+def test_presupuesto_excedido_no_escribe_nada(rotacion, cuadro):
+    ents, salida, herramienta = rotacion
+    with pytest.raises(minificador.PresupuestoExcedido, match="dday2"):
+        server_list.generar_rotacion(["dday1", "dday2"], str(ents), str(salida), cuadro, presupuesto=300)
+    assert os.listdir(salida) == []
+    assert not (herramienta / "maplist.txt").exists()
+    assert "EXCEDE" in cuadro.texto
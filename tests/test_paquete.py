@@ -0,0 +1,105 @@
+import io
+import os
+
+import pytest
+
+pytest.importorskip("paramiko")
+
+import rcon_ftp
+import trabajos
+from test_activacion import ejecutar_script
+
+class Entrada(io.BytesIO):
+    def close(self):
+        pass
+
+class CanalPaquete:
+    def __init__(self):
+        self.entrada = Entrada()
+        self.cerrado = False
+        self.fin_escritura = False
+
+    def settimeout(self, valor):
+        pass
+
+    def exec_command(self, comando):
+        self.comando = comando
+
+    def makefile(self, modo):
+        return self.entrada
+
+    def shutdown_write(self):
+        self.fin_escritura = True
+
+    def recv_ready(self):
+        return False
+
+    def recv_stderr_ready(self):
+        return False
+
+    def exit_status_ready(self):
+        return True
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        self.cerrado = True
+
+class TransportPaquete:
+    def __init__(self):
+        self.canal = CanalPaquete()
+
+    def open_session(self):
+        return self.canal
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def herramienta(tmp_path, monkeypatch):
+    directorio = tmp_path / "herramienta"
+    (directorio / "ents_modificados").mkdir(parents=True)
+    (directorio / "maplist.txt").write_text("dday1\ndday2\n")
+    (directorio / "server.cfg").write_text("sv maplist maplist.txt 0\n")
+    for mapa in ("dday1", "dday2", "dday3"):
+        (directorio / "ents_modificados" / f"{mapa}.ent").write_text(f"nuevo {mapa}")
+    monkeypatch.setattr(rcon_ftp, "__file__", str(directorio / "rcon_ftp.py"))
+    transport = TransportPaquete()
+    monkeypatch.setattr(rcon_ftp, "abrir_transport", lambda *args: transport)
+    return transport.canal
+
+@pytest.fixture
+def servidor(tmp_path):
+    base = tmp_path / "dday"
+    (base / "ents").mkdir(parents=True)
+    (base / "ents" / "dday1.ent").write_text("original dday1")
+    return base
+
+def test_paquete_completo_se_activa(herramienta, servidor, cuadro):
+    assert rcon_ftp.subir_paquete_sftp("10.0.0.1", "22", "q2", "x", "dday", cuadro)
+    assert herramienta.fin_escritura
+    resultado = ejecutar_script(servidor, herramienta.entrada.getvalue())
+    assert resultado.returncode == 0, resultado.stderr
+    assert (servidor / "ents" / "dday3.ent").read_text() == "nuevo dday3"
+    assert not (servidor / "ents" / rcon_ftp.MARCA_PAQUETE).exists()
+
+def test_cancelar_corta_el_canal_sin_activar(herramienta, servidor, cuadro):
+    class TrabajoCancelable:
+        llamadas = 0
+        def verificar(self):
+            self.llamadas += 1
+            if self.llamadas == 2:
+                raise trabajos.Cancelado()
+
+    with pytest.raises(trabajos.Cancelado):
+        rcon_ftp.subir_paquete_sftp("10.0.0.1", "22", "q2", "x", "dday", cuadro, TrabajoCancelable())
+    assert herramienta.cerrado and not herramienta.fin_escritura
+    resultado = ejecutar_script(servidor, herramienta.entrada.getvalue())
+    assert resultado.returncode != 0
+    assert (servidor / "ents" / "dday1.ent").read_text() == "original dday1"
+    assert not (servidor / "ents" / "dday2.ent").exists()
+
+@pytest.mark.parametrize("valor, esperado", [("4", 4), ("", 2), ("0", 2), ("-3", 2), ("muchos", 2)])
+def test_leer_entero(valor, esperado):
+    assert rcon_ftp.leer_entero({"max_trabajos": valor}, "max_trabajos", 2) == esperado
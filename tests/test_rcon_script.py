@@ -0,0 +1,101 @@
+import re
+
+import rcon_script
+
+class ConsolaFalsa:
+    """
+    Canal falso con una consola de Quake 2: repite cada línea recibida con ']' delante y
+    entrega la respuesta a los oyentes en trozos chicos, como llega por SSH.
+    """
+    def __init__(self, oyentes, respuestas=None, prompt=None, trozo=7):
+        self.oyentes = oyentes
+        self.respuestas = respuestas or {}
+        self.prompt = prompt
+        self.trozo = trozo
+        self.recibido = []
+
+    def sendall(self, datos):
+        self.recibido.append(datos)
+        for linea in datos.decode('utf-8').splitlines():
+            texto = f"]{linea}\n"
+            if linea.startswith("echo "):
+                texto += linea[5:] + "\n"
+            elif linea in self.respuestas:
+                respuesta = self.respuestas[linea]
+                if respuesta is None:
+                    # La consola se traba: no responde nada más
+                    return
+                texto += respuesta
+            else:
+                texto += f"Unknown command \"{linea}\"\n"
+            if self.prompt:
+                texto += self.prompt
+            for i in range(0, len(texto), self.trozo):
+                for oyente in list(self.oyentes):
+                    oyente(texto[i:i + self.trozo])
+
+def test_leer_script():
+    texto = "# comentario\nstatus\n\n// otro\nsay hola; sv maplist goto dday2 ;\n"
+    assert rcon_script.leer_script(texto) == ["status", "say hola", "sv maplist goto dday2"]
+
+def test_respuestas_separadas_con_centinela():
+    oyentes = []
+    ejecutor = rcon_script.EjecutorComandos(None, oyentes)
+    consola = ConsolaFalsa(oyentes, {"status": "map : dday1\nnum score ping\n", "serverinfo": "maxclients 24\n"})
+    ejecutor.canal = consola
+
+    resultados = ejecutor.ejecutar(["status", "serverinfo", "fraglimit"])
+
+    assert [r.comando for r in resultados] == ["status", "serverinfo", "fraglimit"]
+    assert all(r.completo for r in resultados)
+    assert resultados[0].salida == "map : dday1\nnum score ping"
+    assert resultados[1].salida == "maxclients 24"
+    assert resultados[2].salida == 'Unknown command "fraglimit"'
+    assert resultados[0].duracion <= resultados[2].duracion
+    # Todos los comandos se envían en un solo lote después de la sincronización
+    assert len(consola.recibido) == 2
+
+def test_descarta_lo_anterior_a_la_sincronizacion():
+    oyentes = []
+    ejecutor = rcon_script.EjecutorComandos(None, oyentes)
+    ejecutor.canal = ConsolaFalsa(oyentes, {"status": "map : dday1\n"})
+    for oyente in oyentes:
+        oyente("Jugador1 entered the game\nviejo\n")
+    assert ejecutor.ejecutar(["status"])[0].salida == "map : dday1"
+
+def test_timeout_marca_la_respuesta_incompleta():
+    oyentes = []
+    ejecutor = rcon_script.EjecutorComandos(None, oyentes, timeout=0.2)
+    ejecutor.canal = ConsolaFalsa(oyentes, {"status": "map : dday1\n", "exec lento.cfg": None})
+
+    primero, lento = ejecutor.ejecutar(["status", "exec lento.cfg"])
+
+    assert primero.completo and primero.salida == "map : dday1"
+    assert not lento.completo
+    assert 0.2 <= lento.duracion < 2
+
+def test_modo_prompt():
+    oyentes = []
+    ejecutor = rcon_script.EjecutorComandos(None, oyentes, prompt=r'^> ')
+    consola = ConsolaFalsa(oyentes, {"status": "map : dday1\n", "serverinfo": "maxclients 24\n"}, prompt="> ")
+    ejecutor.canal = consola
+
+    resultados = ejecutor.ejecutar(["status", "serverinfo"])
+
+    assert [r.salida for r in resultados] == ["map : dday1", "maxclients 24"]
+    assert not any(b"echo" in datos for datos in consola.recibido)
+
+def test_buffer_acotado_y_cerrar():
+    oyentes = []
+    ejecutor = rcon_script.EjecutorComandos(None, oyentes)
+    ejecutor._recibir("x" * (rcon_script.MAX_BUFFER + 100))
+    assert len(ejecutor._buffer) == rcon_script.MAX_BUFFER
+    ejecutor.cerrar()
+    assert oyentes == []
+
+def test_formatear_resultados():
+    resultados = [rcon_script.ResultadoComando("status", "map : dday1", 0.012, True),
+                  rcon_script.ResultadoComando("exec lento.cfg", "", 10.0, False)]
+    texto = rcon_script.formatear_resultados(resultados)
+    assert texto.splitlines()[0] == "> status  (12 ms)"
+    assert re.search(r"exec lento\.cfg .*\[TIMEOUT\]$", texto)
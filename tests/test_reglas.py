@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+import parsing
+import reglas
+import snapshots
+
+ENTIDADES = [
+    [("classname", "worldspawn")],
+    [("classname", "spawn_protect"), ("obj_owner", "1"), ("noise", "x")],
+    [("classname", "spawn_protect"), ("obj_owner", "0"), ("message", "aliados")],
+    [("classname", "light"), ("origin", "0 0 0")],
+]
+
+def test_acciones_e_insercion():
+    definicion = [
+        {"nombre": "eje", "coincide": {"classname": "spawn_protect", "claves": {"obj_owner": "1"}},
+         "acciones": [{"asignar": {"obj_owner": "2"}}, {"eliminar": ["noise"]}]},
+        {"nombre": "sin luces", "coincide": {"classname": ["light"]}, "acciones": [{"eliminar_entidad": True}]},
+        {"nombre": "mensajes", "coincide": {"claves": {"message": {"regex": "^ali"}}},
+         "acciones": [{"renombrar": {"message": "msg"}}]},
+        {"nombre": "solo dday9", "mapas": ["dday9"], "insertar": [{"classname": "item_health"}]},
+    ]
+    nuevas, aciertos = reglas.aplicar_reglas_entidades("dday1", ENTIDADES, reglas.compilar_reglas(definicion))
+    assert nuevas == [
+        [("classname", "worldspawn")],
+        [("classname", "spawn_protect"), ("obj_owner", "2")],
+        [("classname", "spawn_protect"), ("obj_owner", "0"), ("msg", "aliados")],
+    ]
+    assert aciertos == {"eje": 1, "sin luces": 1, "mensajes": 1, "solo dday9": 0}
+
+@pytest.mark.parametrize("definicion, mensaje", [
+    ([{"nombre": "a", "acciones": [{"eliminar": ["x"]}]}, {"nombre": "a", "acciones": [{"eliminar": ["y"]}]}],
+     "más de una regla llamada 'a'"),
+    ([{"coincide": {"claves": {"target": {"regex": "(sin cerrar"}}}, "acciones": [{"eliminar": ["x"]}]}],
+     "Expresión regular no válida"),
+    ([{"nombre": "vacía"}], "no tiene acciones"),
+    ([{"acciones": [{"pintar": True}]}], "Acción no válida"),
+])
+def test_reglas_invalidas(definicion, mensaje):
+    with pytest.raises(reglas.ErrorRegla, match=mensaje):
+        reglas.compilar_reglas(definicion)
+
+def escribir_mapas(directorio, cantidad):
+    rutas = []
+    for i in range(cantidad):
+        ruta = directorio / f"dday{i}.ent"
+        ruta.write_text(parsing.serializar_entidades(ENTIDADES), encoding='utf-8')
+        rutas.append(str(ruta))
+    return rutas
+
+ELIMINAR_LUCES = [{"nombre": "luces", "coincide": {"classname": "light"}, "acciones": [{"eliminar_entidad": True}]}]
+PROTEGER = [{"nombre": "protect", "coincide": {"classname": "spawn_protect"}, "acciones": [{"asignar": {"obj_owner": "3"}}]}]
+
+def test_trabajos_simultaneos_usan_sus_propias_reglas(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    rutas_a = escribir_mapas(tmp_path / "a", 4)
+    rutas_b = escribir_mapas(tmp_path / "b", 4)
+    resultados = {}
+
+    def aplicar(clave, definicion, rutas):
+        totales = []
+        for _ in range(50):
+            totales.append(reglas.aplicar_reglas(definicion, rutas, simular=True)[1])
+        resultados[clave] = totales
+
+    hilos = [threading.Thread(target=aplicar, args=("a", ELIMINAR_LUCES, rutas_a)),
+             threading.Thread(target=aplicar, args=("b", PROTEGER, rutas_b))]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert all(t == {"luces": 4} for t in resultados["a"])
+    assert all(t == {"protect": 8} for t in resultados["b"])
+
+def test_pool_de_procesos_igual_que_secuencial(tmp_path):
+    (tmp_path / "seq").mkdir()
+    (tmp_path / "pool").mkdir()
+    secuencial = reglas.aplicar_reglas(PROTEGER, escribir_mapas(tmp_path / "seq", 10), procesos=1)
+    paralelo = reglas.aplicar_reglas(PROTEGER, escribir_mapas(tmp_path / "pool", 10), procesos=2)
+    assert paralelo == secuencial
+    assert paralelo[1] == {"protect": 20}
+    assert (tmp_path / "pool" / "dday3.ent").read_text(encoding='utf-8') == \
+        (tmp_path / "seq" / "dday3.ent").read_text(encoding='utf-8')
+
+def test_respaldo_antes_de_editar(tmp_path):
+    modificados = tmp_path / "ents_modificados"
+    modificados.mkdir()
+    (tmp_path / "maplist.txt").write_text("dday0\n")
+    (tmp_path / "server.cfg").write_text("")
+    rutas = escribir_mapas(modificados, 2)
+    original = (modificados / "dday0.ent").read_text(encoding='utf-8')
+
+    previa = reglas.respaldar_directorio(str(tmp_path), str(modificados))
+    reglas.aplicar_reglas(ELIMINAR_LUCES, rutas)
+    assert (modificados / "dday0.ent").read_text(encoding='utf-8') != original
+    snapshots.restaurar_snapshot(str(tmp_path), str(modificados), previa)
+    assert (modificados / "dday0.ent").read_text(encoding='utf-8') == original
@@ -0,0 +1,132 @@
+import pytest
+
+import rotacion_dinamica
+from rotacion_dinamica import Capacidad
+
+CAPACIDADES = [
+    Capacidad("chico", 6, 6, 1),
+    Capacidad("medio", 12, 12, 3),
+    Capacidad("medio2", 12, 12, 3),
+    Capacidad("grande", 24, 24, 7),
+]
+
+def mapas_jugados(jugados, desde=0):
+    return [mapa for tick, _, mapa, _ in jugados if tick >= desde]
+
+def test_es_spawn_usa_clases_explicitas():
+    assert rotacion_dinamica.es_spawn("info_player_deathmatch")
+    assert rotacion_dinamica.es_spawn("info_reinforcements_start")
+    assert not rotacion_dinamica.es_spawn("info_player_intermission")
+    assert not rotacion_dinamica.es_spawn("info_team_start")
+
+def test_capacidad_mapa():
+    entidades = [[("classname", "worldspawn"), ("maxclients", "8")]]
+    entidades += [[("classname", "info_player_start")]] * 10 + [[("classname", "info_player_intermission")]]
+    capacidad = rotacion_dinamica.capacidad_mapa("dday1", entidades, maxclients=24)
+    assert capacidad == Capacidad("dday1", 10, 8, 2)
+    # Sin puntos de aparición la capacidad es el límite de jugadores
+    assert rotacion_dinamica.capacidad_mapa("vacio", [], maxclients=16).capacidad == 16
+
+def test_jugadores_status():
+    salida = ("map              : dday2\n"
+              "num score ping name            lastmsg address               qport\n"
+              "--- ----- ---- --------------- ------- --------------------- ------\n"
+              "  0     5   48 Player1               0 10.0.0.1:27901         1001\n"
+              "  1    -2 CNCT Player2               0 10.0.0.2:27901         1002\n")
+    assert rotacion_dinamica.jugadores_status(salida) == (2, "dday2")
+    assert rotacion_dinamica.jugadores_status("") == (0, None)
+
+def test_pocos_jugadores_solo_mapas_chicos():
+    jugados = rotacion_dinamica.simular(CAPACIDADES, lambda tick: 2, ticks=200, duracion=20)
+    assert set(mapas_jugados(jugados)) == {"chico"}
+
+def test_muchos_jugadores_solo_mapas_grandes():
+    jugados = rotacion_dinamica.simular(CAPACIDADES, lambda tick: 20, ticks=200, duracion=20)
+    assert set(mapas_jugados(jugados, desde=1)) == {"grande"}
+
+def test_mapas_adecuados_se_turnan_en_orden():
+    # Con 10 jugadores sirven medio (3-12), medio2 (3-12) y grande (7-24)
+    jugados = rotacion_dinamica.simular(CAPACIDADES, lambda tick: 10, ticks=200, duracion=20)
+    assert mapas_jugados(jugados, desde=1) == ["medio", "medio2", "grande"] * 3
+
+def test_curva_creciente_y_decreciente():
+    def curva(tick):
+        return 2 if tick < 100 else 20 if tick < 200 else 10
+    jugados = rotacion_dinamica.simular(CAPACIDADES, curva, ticks=300, duracion=20)
+    por_mapa = {c.mapa: c for c in CAPACIDADES}
+    for tick, jugadores, mapa, _ in jugados[1:]:
+        assert por_mapa[mapa].minimo <= jugadores <= por_mapa[mapa].capacidad, (tick, jugadores, mapa)
+    assert {"chico", "grande"} <= set(mapas_jugados(jugados))
+
+def test_comando_solo_al_terminar_el_nivel():
+    servidor = rotacion_dinamica.ServidorSimulado("chico", lambda tick: 20, duracion=20)
+    rotador = rotacion_dinamica.RotadorCarga(servidor, CAPACIDADES)
+    for _ in range(60):
+        rotador.paso()
+        servidor.avanzar()
+    cambios = [(tick, comando) for tick, comando in servidor.comandos if comando != "status"]
+    assert cambios == [(20, 'gamemap "grande"'), (40, 'gamemap "grande"')]
+    assert rotador.enviado == "grande"
+
+def test_comando_que_la_rotacion_ignora():
+    # 'set sv_maplist' no cambia de mapa: el servidor sigue la rotación de maplist.txt
+    jugados = rotacion_dinamica.simular(CAPACIDADES, lambda tick: 20, ticks=100, duracion=20,
+                                        comando='set sv_maplist "{mapa}"')
+    assert mapas_jugados(jugados) == ["chico", "medio", "medio2", "grande", "chico"]
+
+def test_servidor_simulado_rechaza_comandos_desconocidos():
+    servidor = rotacion_dinamica.ServidorSimulado("chico", lambda tick: 0)
+    rotador = rotacion_dinamica.RotadorCarga(servidor, CAPACIDADES, comando='sv maplist goto "{mapa}"')
+    rotador.recibir("Timelimit hit.\n")
+    with pytest.raises(ValueError, match="no reconoce"):
+        rotador.paso()
+    assert servidor.mapa == "chico"
+
+def test_fin_de_nivel_sobrevive_a_un_status_fallido(monkeypatch):
+    servidor = rotacion_dinamica.ServidorSimulado("chico", lambda tick: 20)
+    rotador = rotacion_dinamica.RotadorCarga(servidor, CAPACIDADES)
+    rotador.paso()
+    rotador.recibir("Timelimit hit.\n")
+    ejecutar = servidor.ejecutar
+
+    def sin_respuesta(comandos, timeout=None):
+        raise TimeoutError("status no respondió")
+
+    monkeypatch.setattr(servidor, "ejecutar", sin_respuesta)
+    with pytest.raises(TimeoutError):
+        rotador.paso()
+    monkeypatch.setattr(servidor, "ejecutar", ejecutar)
+    rotador.paso()
+    assert servidor.comandos[-1] == (0, 'gamemap "grande"')
+    assert not rotador._fin_nivel.is_set()
+
+def test_no_corta_el_mapa_que_cargo_la_rotacion():
+    servidor = rotacion_dinamica.ServidorSimulado("chico", lambda tick: 20, duracion=2, maplist=["chico", "medio"])
+    rotador = rotacion_dinamica.RotadorCarga(servidor, CAPACIDADES)
+    rotador.paso()
+    servidor.avanzar()
+    servidor.avanzar()
+    assert rotador._fin_nivel.is_set()
+    # El servidor pasa al siguiente de maplist antes de que el rotador consulte
+    servidor.avanzar()
+    rotador.paso()
+    assert servidor.mapa == "medio"
+    assert [c for _, c in servidor.comandos] == ["status", "status"]
+    assert not rotador._fin_nivel.is_set() and rotador.enviado is None
+
+def test_fin_de_nivel_ignora_el_chat():
+    servidor = rotacion_dinamica.ServidorSimulado("chico", lambda tick: 0)
+    rotador = rotacion_dinamica.RotadorCarga(servidor, CAPACIDADES)
+    rotador.recibir("Player1: we have won\nTimelimit")
+    assert not rotador._fin_nivel.is_set()
+    rotador.recibir(" hit.\n")
+    assert rotador._fin_nivel.is_set()
+    rotador._fin_nivel.clear()
+    rotador.recibir("Allies have won the battle!\n")
+    assert rotador._fin_nivel.is_set()
+    rotador.detener()
+    assert servidor.oyentes == []
+
+def test_rotacion_sin_mapas():
+    with pytest.raises(ValueError):
+        rotacion_dinamica.RotadorCarga(rotacion_dinamica.ServidorSimulado("chico", lambda tick: 0), [])
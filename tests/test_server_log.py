@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+pytest.importorskip("paramiko")
+
+import server_log
+
+@pytest.mark.parametrize("linea, tipo, datos", [
+    ("Sgt.Pepper entered the game", "entrada", {"jugador": "Sgt.Pepper"}),
+    ("Sgt.Pepper disconnected", "salida", {"jugador": "Sgt.Pepper"}),
+    ("Pvt.Ryan was gunned down by Sgt.Pepper's Thompson", "muerte",
+     {"victima": "Pvt.Ryan", "asesino": "Sgt.Pepper", "accion": "gunned down"}),
+    ("Pvt.Ryan suicides.", "muerte", {"victima": "Pvt.Ryan", "asesino": None, "accion": "suicidio"}),
+    ("Sgt.Pepper: cover me", "chat", {"jugador": "Sgt.Pepper", "mensaje": "cover me", "equipo": False}),
+    ("(Sgt.Pepper): flank left", "chat", {"jugador": "Sgt.Pepper", "mensaje": "flank left", "equipo": True}),
+])
+def test_parsear_linea(linea, tipo, datos):
+    evento = server_log.parsear_linea(linea, "dday1", tiempo=1.0)
+    assert evento.tipo == tipo
+    assert evento.datos == datos
+
+@pytest.mark.parametrize("linea", [
+    "Warning: CM_InlineModel: bad number",
+    "ERROR: Couldn't load pics/colormap.pcx",
+    "Usage: sv maplist <filename>",
+    "192.168.0.10:27910: rejected connection",
+    "Este nombre es demasiado largo para Quake 2: hola",
+    "==== ShutdownGame ====",
+])
+def test_lineas_del_motor_no_son_chat(linea):
+    assert server_log.parsear_linea(linea) is None
+
+class SFTPLocal:
+    def stat(self, ruta):
+        return os.stat(ruta)
+
+    def open(self, ruta, modo):
+        return open(ruta, modo)
+
+def carga(mapa):
+    return f"]map {mapa}\n------- Server Initialization -------\n0 entities inhibited\n-------------------------------------\n"
+
+def identidad(ruta):
+    st = os.stat(ruta)
+    return f"{st.st_dev}:{st.st_ino}"
+
+def test_rotacion_con_el_mismo_inicio_se_detecta_por_inodo(tmp_path):
+    log = tmp_path / "qconsole.log"
+    cabecera = "==== InitGame ====\n" * 4
+    log.write_text(cabecera + carga("dday1") + "A entered the game\n")
+    seguidor = server_log.SeguidorLog({}, str(log))
+    seguidor.leer_nuevos(SFTPLocal(), str(log), identidad(log))
+    assert seguidor.estadisticas.resumen()["mapas"]["dday1"]["entradas"] == 1
+
+    # Log rotado: archivo nuevo, mismo inicio y más largo que el offset leído
+    nuevo = tmp_path / "qconsole.log.nuevo"
+    nuevo.write_text(cabecera + carga("dday2") + "B entered the game\nC entered the game\n" + "x" * 200 + "\n")
+    os.replace(nuevo, log)
+    seguidor.leer_nuevos(SFTPLocal(), str(log), identidad(log))
+    resumen = seguidor.estadisticas.resumen()
+    assert resumen["mapa_actual"] == "dday2"
+    assert resumen["mapas"]["dday2"]["entradas"] == 2
+
+def test_sigue_leyendo_lo_agregado(tmp_path):
+    log = tmp_path / "qconsole.log"
+    log.write_text(carga("dday1") + "A entered the ga")
+    seguidor = server_log.SeguidorLog({}, str(log))
+    seguidor.leer_nuevos(SFTPLocal(), str(log), identidad(log))
+    with open(log, 'a') as f:
+        f.write("me\nA: hola\n")
+    seguidor.leer_nuevos(SFTPLocal(), str(log), identidad(log))
+    jugador = seguidor.estadisticas.resumen()["jugadores"]["A"]
+    assert jugador["entradas"] == 1 and jugador["mensajes"] == 1
+
+def detectar(lineas, detector=None):
+    detector = detector or server_log.DetectorMapa()
+    cambios = [detector.procesar(linea, T0 + i) for i, linea in enumerate(lineas.splitlines())]
+    return [c for c in cambios if c and c.tipo != "inicio"]
+
+T0 = 1700000000.0
+
+def test_cambio_por_rcon_sin_developer():
+    # Así queda en la consola un 'rcon gamemap' con developer 0: sin "SpawnServer"
+    cambios = detectar("Rcon from 10.0.0.5:27901:\n"
+                       "rcon secreto gamemap \"dday2\"\n"
+                       "------- Server Initialization -------\n"
+                       "0 entities inhibited\n"
+                       "0 teleporters\n"
+                       "-------------------------------------\n"
+                       "Player1 entered the game\n")
+    assert cambios == [server_log.CambioMapa("fin", "dday2", 4)]
+
+def test_cambio_del_servidor_se_nombra_con_status():
+    detector = server_log.DetectorMapa()
+    # Al empezar a leer, 'status' dice en qué mapa está el servidor
+    assert detectar("map              : dday1\n", detector) == [server_log.CambioMapa("actual", "dday1", None)]
+    # La rotación de maplist cambia de mapa sin que se vea el nombre
+    cambios = detectar("Timelimit hit.\n"
+                       "------- Server Initialization -------\n"
+                       "-------------------------------------\n"
+                       "map              : dday3\n", detector)
+    assert cambios == [server_log.CambioMapa("fin", "dday3", 1)]
+    assert detector.mapa == "dday3"
+    assert detectar("map              : dday3\n", detector) == []
+
+def test_comando_no_confunde_maplist():
+    assert not server_log.PATRON_COMANDO_MAPA.match("maplist.txt cargado")
+    assert server_log.PATRON_COMANDO_MAPA.match("sv maplist next").group("mapa") is None
+    assert server_log.PATRON_COMANDO_MAPA.match("]map *dday1$spawn2").group("mapa") == "dday1"
+
+def test_estadisticas_sin_developer(tmp_path):
+    log = tmp_path / "qconsole.log"
+    log.write_text("map              : dday1\nA entered the game\n" + carga("dday2") + "B entered the game\n")
+    seguidor = server_log.SeguidorLog({}, str(log))
+    seguidor.leer_nuevos(SFTPLocal(), str(log), identidad(log))
+    mapas = seguidor.estadisticas.resumen()["mapas"]
+    assert mapas["dday1"]["entradas"] == 1 and mapas["dday1"]["partidas"] == 0
+    assert mapas["dday2"]["entradas"] == 1 and mapas["dday2"]["partidas"] == 1
+    assert "desconocido" not in mapas
@@ -0,0 +1,56 @@
+import pytest
+
+import sesiones_rcon
+
+INICIO = 1700000000.0
+
+@pytest.fixture
+def directorio(tmp_path):
+    grabador = sesiones_rcon.GrabadorSesion(str(tmp_path), intervalo=3600)
+    lineas = [
+        "Player1 entered the game",
+        "Player1: alguien juega dday2?",
+        "Loading map dday2",
+        "Cpl.Ramos entered the game",
+        "Server: cambio de mapa",
+    ]
+    for i, linea in enumerate(lineas):
+        grabador.recibir(linea + "\n", ahora=INICIO + i)
+        # Un bloque por línea para que el Bloom tenga algo que descartar
+        with grabador._lock:
+            grabador._escribir_bloque(INICIO + i)
+    grabador.cerrar()
+    return str(tmp_path)
+
+def textos(resultados):
+    return [linea for _, linea in resultados]
+
+def test_comienzo_de_palabra(directorio):
+    assert textos(sesiones_rcon.buscar(directorio, texto="dday")) == ["Player1: alguien juega dday2?", "Loading map dday2"]
+    assert textos(sesiones_rcon.buscar(directorio, texto="Player")) == ["Player1 entered the game", "Player1: alguien juega dday2?"]
+
+def test_varias_palabras_en_cualquier_orden(directorio):
+    assert textos(sesiones_rcon.buscar(directorio, texto="entered game")) == ["Player1 entered the game", "Cpl.Ramos entered the game"]
+    assert textos(sesiones_rcon.buscar(directorio, texto="game ramos")) == ["Cpl.Ramos entered the game"]
+
+def test_palabras_cortas_y_sin_resultados(directorio):
+    assert textos(sesiones_rcon.buscar(directorio, texto="de mapa")) == ["Server: cambio de mapa"]
+    assert sesiones_rcon.buscar(directorio, texto="dday3") == []
+    # Solo comienzos de palabra: 'layer' no es el comienzo de 'Player1'
+    assert sesiones_rcon.buscar(directorio, texto="layer") == []
+
+def test_bloom_descarta_bloques(directorio, monkeypatch):
+    leidos = []
+    descomprimir = sesiones_rcon.zlib.decompress
+    monkeypatch.setattr(sesiones_rcon.zlib, "decompress", lambda datos: leidos.append(datos) or descomprimir(datos))
+    sesiones_rcon.buscar(directorio, texto="Ramos")
+    assert len(leidos) == 1
+
+def test_ventana_de_tiempo(directorio):
+    assert textos(sesiones_rcon.buscar(directorio, INICIO + 1, INICIO + 2)) == ["Player1: alguien juega dday2?", "Loading map dday2"]
+
+def test_leer_hora():
+    assert sesiones_rcon.leer_hora("") is None
+    assert sesiones_rcon.leer_hora("2024-05-01 10:30") == sesiones_rcon.leer_hora("2024-05-01 10:30:00")
+    with pytest.raises(ValueError):
+        sesiones_rcon.leer_hora("ayer")
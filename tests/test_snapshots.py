@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import snapshots
+
+@pytest.fixture
+def rotacion(tmp_path):
+    script_dir = tmp_path
+    ents = tmp_path / "ents_modificados"
+    ents.mkdir()
+    (script_dir / "maplist.txt").write_text("dday1\ndday2\n")
+    (script_dir / "server.cfg").write_text("sv maplist maplist.txt 0\n")
+    (ents / "dday1.ent").write_text("dday1 v1")
+    (ents / "dday2.ent").write_text("dday2 v1")
+    return script_dir, ents
+
+def test_id_derivado_del_contenido(rotacion):
+    script_dir, ents = rotacion
+    primero = snapshots.crear_snapshot(str(script_dir), str(ents), ["dday1", "dday2"])
+    assert snapshots.crear_snapshot(str(script_dir), str(ents), ["dday1", "dday2"]) == primero
+    (ents / "dday2.ent").write_text("dday2 v2")
+    segundo = snapshots.crear_snapshot(str(script_dir), str(ents), ["dday1", "dday2"])
+    assert segundo != primero
+    assert snapshots.version_actual(str(script_dir)) == segundo
+    assert [m["id"] for m in snapshots.listar_snapshots(str(script_dir))] == [segundo, primero]
+    # Los archivos iguales se guardan una sola vez
+    objetos = os.listdir(script_dir / snapshots.DIRECTORIO_ALMACEN / "objects")
+    assert len(objetos) == 5
+
+def test_restaurar_deshace_ediciones_a_mano(rotacion):
+    script_dir, ents = rotacion
+    build_id = snapshots.crear_snapshot(str(script_dir), str(ents), ["dday1", "dday2"])
+    # Edición a mano después del snapshot: la versión materializada sigue siendo la misma
+    (ents / "dday1.ent").write_text("editado a mano")
+    (ents / "dday3.ent").write_text("ajeno a la versión")
+    assert snapshots.restaurar_snapshot(str(script_dir), str(ents), build_id) == 1
+    assert (ents / "dday1.ent").read_text() == "dday1 v1"
+    assert not (ents / "dday3.ent").exists()
+    assert snapshots.restaurar_snapshot(str(script_dir), str(ents), build_id) == 0
+
+def test_restaurar_version_anterior(rotacion):
+    script_dir, ents = rotacion
+    anterior = snapshots.crear_snapshot(str(script_dir), str(ents), ["dday1", "dday2"])
+    (script_dir / "maplist.txt").write_text("dday2\n")
+    (ents / "dday2.ent").write_text("dday2 v2")
+    snapshots.crear_snapshot(str(script_dir), str(ents), ["dday2"])
+    assert snapshots.restaurar_snapshot(str(script_dir), str(ents), anterior) == 2
+    assert (script_dir / "maplist.txt").read_text() == "dday1\ndday2\n"
+    assert (ents / "dday2.ent").read_text() == "dday2 v1"
+    assert snapshots.version_actual(str(script_dir)) == anterior
+
+class SFTPLocal:
+    def __init__(self):
+        self.subidos = []
+
+    def get_channel(self):
+        return self
+
+    def settimeout(self, valor):
+        pass
+
+    def normalize(self, ruta):
+        return os.path.abspath(ruta)
+
+    def listdir(self, ruta):
+        return os.listdir(ruta)
+
+    def put(self, local, remoto):
+        self.subidos.append(os.path.basename(remoto))
+        shutil.copy(local, remoto)
+
+    def posix_rename(self, origen, destino):
+        raise IOError("posix-rename no soportado")
+
+def ejecutar_local(transport, comando):
+    resultado = subprocess.run(comando, shell=True, capture_output=True, text=True)
+    return resultado.returncode, resultado.stdout, resultado.stderr
+
+def test_desplegar_snapshot(rotacion, tmp_path, monkeypatch, cuadro):
+    pytest.importorskip("paramiko")
+    import rcon_ftp
+    script_dir, ents = rotacion
+    build_id = snapshots.crear_snapshot(str(script_dir), str(ents), ["dday1", "dday2"])
+    servidor = tmp_path / "servidor"
+    (servidor / "ents").mkdir(parents=True)
+    (servidor / "ents" / "otro.ent").write_text("fuera de la rotación")
+
+    sftp = SFTPLocal()
+    monkeypatch.setattr(rcon_ftp, "__file__", str(script_dir / "rcon_ftp.py"))
+    monkeypatch.setattr(rcon_ftp, "abrir_transport", lambda *args: type("T", (), {"close": lambda self: None})())
+    monkeypatch.setattr(rcon_ftp.paramiko.SFTPClient, "from_transport", lambda t: sftp)
+    monkeypatch.setattr(rcon_ftp, "ejecutar_remoto", ejecutar_local)
+
+    assert rcon_ftp.desplegar_snapshot("10.0.0.1", "22", "q2", "x", str(servidor), build_id, cuadro), cuadro.texto
+    assert (servidor / "ents" / "dday1.ent").read_text() == "dday1 v1"
+    assert (servidor / "ents" / "otro.ent").read_text() == "fuera de la rotación"
+    assert (servidor / "maplist.txt").read_text() == "dday1\ndday2\n"
+    assert (servidor / snapshots.DIRECTORIO_ALMACEN / snapshots.ARCHIVO_ACTUAL).read_text().strip() == build_id
+    assert not [f for f in os.listdir(servidor / snapshots.DIRECTORIO_ALMACEN / "objects") if f.endswith(".tmp")]
+
+    # Un segundo despliegue de la misma versión no vuelve a subir objetos
+    sftp.subidos.clear()
+    assert rcon_ftp.desplegar_snapshot("10.0.0.1", "22", "q2", "x", str(servidor), build_id, cuadro)
+    assert sftp.subidos == []
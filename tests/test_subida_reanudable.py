@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+pytest.importorskip("paramiko")
+
+import rcon_ftp
+import trabajos
+
+class ArchivoRemoto:
+    def __init__(self, ruta, modo, escrituras):
+        self._f = open(ruta, modo)
+        self._escrituras = escrituras
+
+    def set_pipelined(self, valor):
+        pass
+
+    def seek(self, offset):
+        self._f.seek(offset)
+
+    def write(self, datos):
+        self._escrituras.append(len(datos))
+        self._f.write(datos)
+
+    def close(self):
+        self._f.close()
+
+class SFTPLocal:
+    """
+    SFTP falso sobre el sistema de archivos local; las rutas remotas son rutas locales.
+    """
+    def __init__(self, renombrar=True):
+        self.escrituras = []
+        self.renombrar = renombrar
+
+    def normalize(self, ruta):
+        return os.path.abspath(ruta)
+
+    def stat(self, ruta):
+        return os.stat(ruta)
+
+    def open(self, ruta, modo):
+        return ArchivoRemoto(ruta, modo, self.escrituras)
+
+    def remove(self, ruta):
+        os.remove(ruta)
+
+    def posix_rename(self, origen, destino):
+        if not self.renombrar:
+            raise IOError("posix-rename no soportado")
+        os.replace(origen, destino)
+
+@pytest.fixture
+def sha_remoto(monkeypatch):
+    def sha256_remoto(transport, ruta):
+        return rcon_ftp.sha256_local(ruta) if os.path.exists(ruta) else None
+    monkeypatch.setattr(rcon_ftp, "sha256_remoto", sha256_remoto)
+    monkeypatch.setattr(rcon_ftp, "TAMANO_BLOQUE", 1024)
+
+@pytest.fixture
+def mapa(tmp_path):
+    ruta = tmp_path / "local" / "dday1.bsp"
+    ruta.parent.mkdir()
+    ruta.write_bytes(os.urandom(10 * 1024 + 17))
+    (tmp_path / "remoto").mkdir()
+    return ruta
+
+def test_subida_completa_y_renombrada(mapa, tmp_path, cuadro, sha_remoto):
+    destino = tmp_path / "remoto" / "dday1.bsp"
+    assert rcon_ftp.subir_archivo_reanudable(None, SFTPLocal(), str(mapa), str(destino), cuadro)
+    assert destino.read_bytes() == mapa.read_bytes()
+    assert not (tmp_path / "remoto" / "dday1.bsp.part").exists()
+
+def test_reanuda_desde_la_subida_parcial(mapa, tmp_path, cuadro, sha_remoto):
+    destino = tmp_path / "remoto" / "dday1.bsp"
+    datos = mapa.read_bytes()
+    (tmp_path / "remoto" / "dday1.bsp.part").write_bytes(datos[:4096])
+    sftp = SFTPLocal()
+    assert rcon_ftp.subir_archivo_reanudable(None, sftp, str(mapa), str(destino), cuadro)
+    assert sum(sftp.escrituras) == len(datos) - 4096
+    assert destino.read_bytes() == datos
+    assert "Reanudando" in cuadro.texto
+
+def test_parcial_corrupta_se_descarta(mapa, tmp_path, cuadro, sha_remoto):
+    destino = tmp_path / "remoto" / "dday1.bsp"
+    parcial = tmp_path / "remoto" / "dday1.bsp.part"
+    parcial.write_bytes(b"\xff" * 4096)
+    assert not rcon_ftp.subir_archivo_reanudable(None, SFTPLocal(), str(mapa), str(destino), cuadro)
+    assert not parcial.exists()
+    assert not destino.exists()
+    assert "no coincide" in cuadro.texto
+
+def test_destino_actualizado_se_omite(mapa, tmp_path, cuadro, sha_remoto):
+    destino = tmp_path / "remoto" / "dday1.bsp"
+    destino.write_bytes(mapa.read_bytes())
+    sftp = SFTPLocal()
+    assert rcon_ftp.subir_archivo_reanudable(None, sftp, str(mapa), str(destino), cuadro)
+    assert sftp.escrituras == []
+
+def test_cancelar_conserva_la_parcial(mapa, tmp_path, cuadro, sha_remoto):
+    destino = tmp_path / "remoto" / "dday1.bsp"
+
+    class TrabajoCancelable:
+        llamadas = 0
+        def verificar(self):
+            self.llamadas += 1
+            if self.llamadas > 3:
+                raise trabajos.Cancelado()
+
+    with pytest.raises(trabajos.Cancelado):
+        rcon_ftp.subir_archivo_reanudable(None, SFTPLocal(), str(mapa), str(destino), cuadro, TrabajoCancelable())
+    assert os.path.getsize(tmp_path / "remoto" / "dday1.bsp.part") == 3 * 1024
+    assert not destino.exists()
+
+def test_sin_posix_rename_usa_mv(mapa, tmp_path, cuadro, sha_remoto, monkeypatch):
+    destino = tmp_path / "remoto" / "dday1.bsp"
+    comandos = []
+    def ejecutar_remoto(transport, comando):
+        comandos.append(comando)
+        os.replace(f"{destino}.part", destino)
+        return 0, "", ""
+    monkeypatch.setattr(rcon_ftp, "ejecutar_remoto", ejecutar_remoto)
+    assert rcon_ftp.subir_archivo_reanudable(None, SFTPLocal(renombrar=False), str(mapa), str(destino), cuadro)
+    assert comandos and comandos[0].startswith("mv -f -- ")
+    assert destino.read_bytes() == mapa.read_bytes()
+
+def test_formatear_bytes():
+    assert rcon_ftp._formatear_bytes(512) == "512.0 B"
+    assert rcon_ftp._formatear_bytes(1536) == "1.5 KiB"
+    assert rcon_ftp._formatear_bytes(3 * 1024 ** 3) == "3.0 GiB"
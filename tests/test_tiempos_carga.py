@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+pytest.importorskip("paramiko")
+
+import tiempos_carga
+
+T0 = 1700000000.0
+
+@pytest.fixture
+def perfilador(tmp_path):
+    return tiempos_carga.PerfiladorCarga(str(tmp_path / "tiempos.json"))
+
+def cambio_de_mapa(perfilador, mapa, inicio, duracion):
+    perfilador.recibir(f"] map {mapa}\n", ahora=inicio)
+    perfilador.recibir("------- Server Initialization -------\n", ahora=inicio + 0.1)
+    perfilador.recibir("-------------------------------------\n", ahora=inicio + duracion)
+
+def test_mide_hasta_el_fin_de_la_inicializacion(perfilador, tmp_path):
+    cambio_de_mapa(perfilador, "dday1", T0, 2.5)
+    # Un jugador que entra mucho después no cambia la muestra
+    perfilador.recibir("Player1 entered the game\n", ahora=T0 + 500)
+    assert list(perfilador.muestras["dday1"]) == [2.5]
+    assert json.loads((tmp_path / "tiempos.json").read_text()) == {"dday1": [2.5]}
+
+def test_carga_demasiado_larga_se_descarta(perfilador):
+    cambio_de_mapa(perfilador, "dday1", T0, tiempos_carga.MAX_CARGA + 1)
+    assert "dday1" not in perfilador.muestras
+    assert perfilador.version == 0
+
+def test_cambio_del_servidor_sin_comando(perfilador):
+    perfilador.recibir("------- Server Initialization -------\nSpawnServer: dday2\n", ahora=T0)
+    perfilador.recibir("-------------------------------------\n", ahora=T0 + 1.5)
+    assert list(perfilador.muestras["dday2"]) == [1.5]
+
+def test_comando_enviado_sin_eco(perfilador):
+    perfilador.comando_enviado("gamemap dday3", ahora=T0)
+    perfilador.recibir("------- Server Initialization -------\n", ahora=T0 + 0.5)
+    perfilador.recibir("---------------", ahora=T0 + 3)
+    # La línea se procesa recién cuando llega completa
+    assert "dday3" not in perfilador.muestras
+    perfilador.recibir("------\n", ahora=T0 + 3)
+    assert list(perfilador.muestras["dday3"]) == [3]
+    perfilador.comando_enviado("status", ahora=T0 + 4)
+    assert perfilador.version == 1
+
+def test_consola_sin_developer(perfilador):
+    # Con developer 0 no hay "SpawnServer": el nombre sale del rcon o de 'status'
+    perfilador.recibir("Rcon from 10.0.0.5:27901:\n"
+                       "rcon secreto gamemap \"dday2\"\n", ahora=T0)
+    perfilador.recibir("------- Server Initialization -------\n"
+                       "0 entities inhibited\n"
+                       "0 teleporters\n", ahora=T0 + 0.2)
+    perfilador.recibir("-------------------------------------\n", ahora=T0 + 2)
+    assert list(perfilador.muestras["dday2"]) == [2]
+
+    # Fin de partida: la rotación del servidor no nombra el mapa
+    perfilador.recibir("Timelimit hit.\n------- Server Initialization -------\n", ahora=T0 + 600)
+    perfilador.recibir("-------------------------------------\n", ahora=T0 + 601.5)
+    assert perfilador.version == 1
+    perfilador.recibir("map              : dday3\n"
+                       "num score ping name            lastmsg address               qport\n", ahora=T0 + 610)
+    assert list(perfilador.muestras["dday3"]) == [1.5]
+
+def test_muestras_persistentes_y_resumen(tmp_path):
+    ruta = str(tmp_path / "tiempos.json")
+    perfilador = tiempos_carga.PerfiladorCarga(ruta, max_muestras=3)
+    for i, duracion in enumerate([1, 2, 3, 4]):
+        cambio_de_mapa(perfilador, "dday1", T0 + i * 1000, duracion)
+    assert perfilador.resumen("dday1") == (3, 3, 4)
+    assert tiempos_carga.PerfiladorCarga(ruta).resumen("dday1") == (3, 3, 4)
+    assert tiempos_carga.formatear_resumen(perfilador.resumen("dday1")) == "3.0 / 4.0 s (3)"
+    assert tiempos_carga.formatear_resumen(perfilador.resumen("otro")) == "-"
+
+def test_percentil():
+    assert tiempos_carga.percentil([], 50) is None
+    assert tiempos_carga.percentil([1, 2, 3, 4], 50) == 2
+    assert tiempos_carga.percentil(list(range(1, 101)), 95) == 95
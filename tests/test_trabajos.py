@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+import trabajos
+
+def drenar(planificador, hasta, al_cambiar=None, espera=5.0):
+    limite = time.monotonic() + espera
+    while not hasta():
+        assert time.monotonic() < limite, "el trabajo no terminó a tiempo"
+        planificador.procesar_eventos(al_cambiar)
+        time.sleep(0.01)
+    planificador.procesar_eventos(al_cambiar)
+
+def test_trabajo_completo_publica_texto_y_llama_al_terminar(cuadro):
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=2)
+    terminados = []
+
+    def tarea(trabajo, a, b):
+        salida = trabajo.salida(cuadro)
+        for i in range(3):
+            trabajo.informar_progreso(i + 1, 3)
+            salida.insert("end", f"paso {i}\n")
+        return a + b
+
+    trabajo = planificador.enviar("suma", tarea, 2, 3, al_terminar=terminados.append)
+    drenar(planificador, lambda: terminados)
+    assert trabajo.estado == trabajos.COMPLETADO
+    assert trabajo.resultado == 5
+    assert trabajo.progreso == (3, 3)
+    assert cuadro.texto == "paso 0\npaso 1\npaso 2\n"
+
+def test_cancelar_y_fallar():
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=1)
+    liberar = threading.Event()
+    terminados = []
+
+    def bloqueante(trabajo):
+        liberar.wait(5)
+        trabajo.verificar()
+
+    def falla(trabajo):
+        raise RuntimeError("sin conexión")
+
+    primero = planificador.enviar("bloqueante", bloqueante, al_terminar=terminados.append)
+    segundo = planificador.enviar("falla", falla, al_terminar=terminados.append)
+    tercero = planificador.enviar("en cola", falla, al_terminar=terminados.append)
+    planificador.cancelar(primero.id)
+    planificador.cancelar(tercero.id)
+    liberar.set()
+    drenar(planificador, lambda: len(terminados) == 3)
+    assert primero.estado == trabajos.CANCELADO
+    assert segundo.estado == trabajos.FALLIDO and str(segundo.error) == "sin conexión"
+    assert tercero.estado == trabajos.CANCELADO
+
+def test_cola_llena():
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=1, max_en_cola=2)
+    liberar = threading.Event()
+    primero = planificador.enviar("t0", lambda t: liberar.wait(5))
+    drenar(planificador, lambda: primero.estado == trabajos.EJECUTANDO)
+    enviados = [planificador.enviar(f"t{i}", lambda t: liberar.wait(5)) for i in range(1, 4)]
+    liberar.set()
+    assert enviados[-1] is None
+    assert sum(t is not None for t in enviados) == 2
+
+def test_salida_del_planificador_desde_otro_hilo(cuadro):
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=1)
+    salida = planificador.salida(cuadro)
+    hilo = threading.Thread(target=lambda: [salida.insert("end", f"{i}\n") for i in range(100)])
+    hilo.start()
+    hilo.join()
+    assert cuadro.texto == ""
+    planificador.procesar_eventos()
+    assert cuadro.texto == "".join(f"{i}\n" for i in range(100))
+
+def test_historial_acotado_con_envios_concurrentes():
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=4, max_en_cola=10000)
+    hilos = [threading.Thread(target=lambda: [planificador.enviar("x", lambda t: None) for _ in range(50)])
+             for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    drenar(planificador, lambda: all(t.notificado for t in list(planificador.trabajos.values())))
+    assert len(planificador.trabajos) <= trabajos.MAX_HISTORIAL
+    planificador.enviar("último", lambda t: None)
+    assert len(planificador.trabajos) <= trabajos.MAX_HISTORIAL + 1
+
+def test_historial_conserva_los_no_notificados(cuadro, monkeypatch):
+    monkeypatch.setattr(trabajos, "MAX_HISTORIAL", 1)
+    planificador = trabajos.PlanificadorTrabajos(max_hilos=1)
+    terminados = []
+    enviados = [planificador.enviar(f"t{i}", lambda t: t.salida(cuadro).insert("end", f"{t.nombre}\n"),
+                                    al_terminar=terminados.append) for i in range(3)]
+    while not all(t.estado == trabajos.COMPLETADO for t in enviados):
+        time.sleep(0.01)
+    # Terminaron pero la interfaz todavía no procesó sus eventos: no se recortan
+    planificador.enviar("otro", lambda t: None)
+    assert all(t.id in planificador.trabajos for t in enviados)
+    drenar(planificador, lambda: len(terminados) == 3)
+    assert terminados == enviados
+    assert cuadro.texto == "t0\nt1\nt2\n"
+    planificador.enviar("último", lambda t: None)
+    assert not any(t.id in planificador.trabajos for t in enviados[:2])
+
+def test_max_hilos_invalido():
+    with pytest.raises(ValueError):
+        trabajos.PlanificadorTrabajos(max_hilos=0)
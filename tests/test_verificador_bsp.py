@@ -0,0 +1,96 @@
+import struct
+
+import pytest
+
+import verificador_bsp
+
+# Vectores de prueba de RFC 1320
+VECTORES_MD4 = [
+    (b"", "31d6cfe0d16ae931b73c59d7e0c089c0"),
+    (b"a", "bde52cb31de33e46245e05fbdbd6fb24"),
+    (b"abc", "a448017aaf21d8525fc10ae87aa6729d"),
+    (b"message digest", "d9130a8164549fe818874806e1c7014b"),
+    (b"abcdefghijklmnopqrstuvwxyz", "d79e1c308aa5bbcdeea8ed63df412da9"),
+    (b"1234567890" * 8, "e33b4ddc9c38f2199c3e7b164fcc0536"),
+]
+
+@pytest.mark.parametrize("datos,esperado", VECTORES_MD4)
+def test_md4_python(datos, esperado):
+    assert verificador_bsp._md4_python(datos).hex() == esperado
+
+def md4_referencia(datos):
+    """
+    MD4 sin desenrollar, tal como lo describe RFC 1320, para comparar con _md4_python.
+    """
+    def rotar(v, s):
+        return ((v << s) | (v >> (32 - s))) & 0xFFFFFFFF
+    rondas = (
+        (lambda b, c, d: (b & c) | (~b & d), 0, range(16), (3, 7, 11, 19)),
+        (lambda b, c, d: (b & c) | (b & d) | (c & d), 0x5A827999, (0, 4, 8, 12, 1, 5, 9, 13, 2, 6, 10, 14, 3, 7, 11, 15), (3, 5, 9, 13)),
+        (lambda b, c, d: b ^ c ^ d, 0x6ED9EBA1, (0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15), (3, 9, 11, 15)),
+    )
+    mensaje = datos + b'\x80' + b'\x00' * ((55 - len(datos)) % 64) + struct.pack('<Q', len(datos) * 8)
+    h = [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476]
+    for inicio in range(0, len(mensaje), 64):
+        x = struct.unpack_from('<16I', mensaje, inicio)
+        a, b, c, d = h
+        for f, constante, orden, rotaciones in rondas:
+            for i, k in enumerate(orden):
+                a, b, c, d = d, rotar((a + f(b, c, d) + x[k] + constante) & 0xFFFFFFFF, rotaciones[i % 4]), b, c
+        h = [(v + w) & 0xFFFFFFFF for v, w in zip(h, (a, b, c, d))]
+    return struct.pack('<4I', *h)
+
+@pytest.mark.parametrize("largo", [55, 56, 63, 64, 65, 119, 120, 1000])
+def test_md4_python_en_los_bordes_del_relleno(largo):
+    datos = (bytes(range(256)) * 4)[:largo]
+    assert verificador_bsp._md4_python(datos) == md4_referencia(datos)
+
+def test_md4_referencia():
+    assert all(md4_referencia(datos).hex() == esperado for datos, esperado in VECTORES_MD4)
+
+def test_checksum_mapa_con_signo():
+    a, b, c, d = struct.unpack('<4I', verificador_bsp.md4(b"abc"))
+    valor = verificador_bsp.checksum_mapa(b"abc")
+    assert valor & 0xFFFFFFFF == a ^ b ^ c ^ d
+    assert -0x80000000 <= valor < 0x80000000
+
+def test_mapa_valido(bsp):
+    errores, avisos = verificador_bsp.validar_lumps(bsp(b'{\n"classname" "worldspawn"\n}\n', texturas=("dday/muro",)))
+    assert errores == [] and avisos == []
+
+def test_errores_de_lumps(bsp):
+    datos = bytearray(bsp(lumps={1: b'\x00' * 21}))
+    struct.pack_into('<i', datos, 4, 46)
+    # El lump de vértices termina fuera del archivo
+    struct.pack_into('<ii', datos, 8 + 2 * 8, len(datos), 12)
+    errores, _ = verificador_bsp.validar_lumps(bytes(datos))
+    assert any("Versión de BSP 46" in e for e in errores)
+    assert any("planes: tamaño 21 no es múltiplo de 20" in e for e in errores)
+    assert any("vertexes: termina en" in e for e in errores)
+
+def test_superposicion_y_alineacion(bsp):
+    datos = bytearray(bsp(lumps={1: b'\x00' * 40, 2: b'\x00' * 12}))
+    offset_planos = struct.unpack_from('<i', datos, 8 + 8)[0]
+    struct.pack_into('<i', datos, 8 + 2 * 8, offset_planos + 2)
+    errores, avisos = verificador_bsp.validar_lumps(bytes(datos))
+    assert any("planes y vertexes se superponen" in e for e in errores)
+    assert any("vertexes: offset" in a for a in avisos)
+
+def test_verificar_mapas_en_pool_y_cache(tmp_path, bsp, monkeypatch):
+    rutas = []
+    for i in range(4):
+        ruta = tmp_path / f"dday{i}.bsp"
+        ruta.write_bytes(bsp(f'{{\n"classname" "worldspawn"\n"message" "{i}"\n}}\n'.encode()))
+        rutas.append(str(ruta))
+    (tmp_path / "roto.bsp").write_bytes(b"IBSP")
+    rutas.append(str(tmp_path / "roto.bsp"))
+    cache = str(tmp_path / "cache.json")
+
+    resultados = verificador_bsp.verificar_mapas(rutas, cache, procesos=2)
+    assert [r["mapa"] for r in resultados] == ["dday0", "dday1", "dday2", "dday3", "roto"]
+    assert all(not r["errores"] and r["checksum"] is not None for r in resultados[:4])
+    assert resultados[4]["errores"]
+
+    # La segunda vez los mapas válidos salen de la caché sin leerlos
+    monkeypatch.setattr(verificador_bsp, "verificar_bsp", lambda ruta: pytest.fail(f"se volvió a leer {ruta}") if "dday" in ruta else {"mapa": "roto", "sha256": None})
+    assert verificador_bsp.verificar_mapas(rutas, cache, procesos=1)[:4] == resultados[:4]
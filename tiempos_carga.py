@@ -0,0 +1,106 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from server_log import MAX_CARGA, PATRON_COMANDO_MAPA, DetectorMapa
+
+# Archivo con las muestras por mapa, en el directorio del script
+ARCHIVO_TIEMPOS = "tiempos_carga.json"
+# Muestras que se conservan por mapa (ventana móvil)
+MAX_MUESTRAS = 50
+
+def percentil(ordenadas, p):
+    """
+    Percentil 'p' (0-100) por rango más cercano de una lista ya ordenada.
+    """
+    if not ordenadas:
+        return None
+    indice = max(0, min(len(ordenadas) - 1, math.ceil(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+def cargar_muestras(ruta):
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def resumen_muestras(muestras):
+    """
+    Devuelve (cantidad, p50, p95) de una lista de tiempos de carga en segundos.
+    """
+    ordenadas = sorted(muestras)
+    return len(ordenadas), percentil(ordenadas, 50), percentil(ordenadas, 95)
+
+def formatear_resumen(resumen):
+    if not resumen or not resumen[0]:
+        return "-"
+    cantidad, p50, p95 = resumen
+    return f"{p50:.1f} / {p95:.1f} s ({cantidad})"
+
+class PerfiladorCarga:
+    """
+    Mide cuánto tarda cada cambio de mapa leyendo la consola del servidor: desde el comando
+    de cambio de mapa (o, si el cambio lo hace el servidor, desde "Server Initialization")
+    hasta la línea de guiones con la que el motor termina de inicializar el mapa. No se
+    espera a que entre un jugador, porque eso mediría el tiempo que el servidor estuvo vacío.
+    Las transiciones las detecta server_log.DetectorMapa, así que no hace falta developer 1:
+    si el nombre no vino en el comando, la muestra se registra con la próxima salida de
+    'status'. Las cargas de más de MAX_CARGA segundos se descartan. Se usa como oyente de
+    rcon_ftp.conectar_rcon y guarda una ventana móvil de muestras por mapa en 'ruta'.
+    """
+    def __init__(self, ruta, max_muestras=MAX_MUESTRAS):
+        self.ruta = ruta
+        self.max_muestras = max_muestras
+        self.muestras = {m: deque(v, maxlen=max_muestras) for m, v in cargar_muestras(ruta).items()}
+        self.version = 0
+        self.detector = DetectorMapa()
+        self._parcial = ""
+        self._lock = threading.Lock()
+
+    def __call__(self, texto):
+        self.recibir(texto)
+
+    def comando_enviado(self, comando, ahora=None):
+        """
+        Avisa que la herramienta envió 'comando'; si es un cambio de mapa empieza a medir.
+        Sirve cuando la consola no repite lo que se escribe.
+        """
+        if PATRON_COMANDO_MAPA.match(comando.strip()):
+            with self._lock:
+                self._procesar_linea(comando.strip(), ahora if ahora is not None else time.time())
+
+    def recibir(self, texto, ahora=None):
+        ahora = ahora if ahora is not None else time.time()
+        with self._lock:
+            partes = (self._parcial + texto).split("\n")
+            self._parcial = partes.pop()
+            for linea in partes:
+                self._procesar_linea(linea.strip(), ahora)
+
+    def _procesar_linea(self, linea, ahora):
+        if not linea:
+            return
+        cambio = self.detector.procesar(linea, ahora)
+        if cambio and cambio.tipo == "fin" and cambio.duracion <= MAX_CARGA:
+            self._registrar(cambio.mapa, cambio.duracion)
+
+    def _registrar(self, mapa, segundos):
+        self.muestras.setdefault(mapa, deque(maxlen=self.max_muestras)).append(round(segundos, 3))
+        self.version += 1
+        try:
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({m: list(v) for m, v in self.muestras.items()}, f)
+            os.replace(temporal, self.ruta)
+        except OSError:
+            pass
+
+    def resumen(self, mapa):
+        with self._lock:
+            return resumen_muestras(self.muestras.get(mapa, ()))
@@ -0,0 +1,216 @@
+import itertools
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox
+from collections import OrderedDict, namedtuple
+
+# Estados posibles de un trabajo
+EN_COLA = "En cola"
+EJECUTANDO = "Ejecutando"
+COMPLETADO = "Completado"
+CANCELADO = "Cancelado"
+FALLIDO = "Error"
+
+# Cuántos trabajos terminados se conservan para la vista de la cola
+MAX_HISTORIAL = 50
+
+# Evento publicado por los trabajos. 'tipo' es uno de:
+#   "estado"   -> datos: nuevo estado
+#   "texto"    -> datos: (widget, texto) a insertar en un cuadro de texto
+#   "progreso" -> datos: (actual, total)
+EventoProgreso = namedtuple("EventoProgreso", ["trabajo_id", "tipo", "datos"])
+
+def notificar_fin(trabajo, titulo, mensaje):
+    """
+    Muestra el resultado de un trabajo terminado. Debe llamarse desde el hilo de Tk
+    (por ejemplo desde 'al_terminar'). Los trabajos cancelados no muestran ventana.
+    """
+    if trabajo.estado == COMPLETADO:
+        messagebox.showinfo(titulo, mensaje)
+    elif trabajo.estado == FALLIDO:
+        messagebox.showerror("Error", f"{trabajo.nombre}: {trabajo.error}")
+
+class Cancelado(Exception):
+    """
+    Se lanza dentro de un trabajo cuando el usuario pidió cancelarlo.
+    """
+
+class SalidaTrabajo:
+    """
+    Adaptador con la interfaz de un cuadro de texto (insert/see) que publica el texto en el
+    bus de progreso. El texto se inserta en 'widget' desde el hilo de Tk al drenar la cola.
+    'origen' es el Trabajo que escribe o el propio planificador para hilos que no son
+    trabajos (por ejemplo la recepción de la consola RCON).
+    """
+    def __init__(self, origen, widget):
+        self.origen = origen
+        self.widget = widget
+
+    def insert(self, indice, texto):
+        self.origen.publicar("texto", (self.widget, texto))
+
+    def see(self, indice):
+        pass
+
+class Trabajo:
+    """
+    Una operación larga enviada al planificador. La función recibe el trabajo como primer
+    argumento y debe llamar a verificar() entre pasos para poder cancelarse.
+    """
+    def __init__(self, planificador, trabajo_id, nombre, funcion, args, kwargs, al_terminar):
+        self.planificador = planificador
+        self.id = trabajo_id
+        self.nombre = nombre
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.al_terminar = al_terminar
+        self.estado = EN_COLA
+        self.progreso = (0, 0)
+        self.resultado = None
+        self.error = None
+        # Pasa a True cuando procesar_eventos aplicó el evento final (ya se llamó a al_terminar)
+        self.notificado = False
+        self._cancelar = threading.Event()
+
+    def publicar(self, tipo, datos):
+        self.planificador.publicar(tipo, datos, self.id)
+
+    def salida(self, widget):
+        return SalidaTrabajo(self, widget)
+
+    def informar_progreso(self, actual, total):
+        self.publicar("progreso", (actual, total))
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def verificar(self):
+        if self._cancelar.is_set():
+            raise Cancelado()
+
+class PlanificadorTrabajos:
+    """
+    Ejecuta trabajos en un pool acotado de hilos. Los hilos nunca tocan Tk: publican eventos
+    en una cola que la interfaz drena por lotes con procesar_eventos() desde el hilo de Tk.
+    """
+    def __init__(self, max_hilos=2, max_en_cola=32):
+        if max_hilos < 1:
+            raise ValueError(f"El planificador necesita al menos un hilo (max_hilos={max_hilos}).")
+        self.max_hilos = max_hilos
+        self.max_en_cola = max_en_cola
+        self.eventos = queue.Queue()
+        self.trabajos = OrderedDict()
+        self._pendientes = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._hilos = []
+        for _ in range(max_hilos):
+            hilo = threading.Thread(target=self._trabajador, daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, nombre, funcion, *args, al_terminar=None, **kwargs):
+        """
+        Encola 'funcion(trabajo, *args, **kwargs)'. 'al_terminar(trabajo)' se llama en el hilo
+        de Tk cuando el trabajo termina. Devuelve el Trabajo o None si la cola está llena.
+        """
+        with self._lock:
+            en_espera = sum(1 for t in self.trabajos.values() if t.estado == EN_COLA)
+            if en_espera >= self.max_en_cola:
+                return None
+            trabajo = Trabajo(self, next(self._ids), nombre, funcion, args, kwargs, al_terminar)
+            self.trabajos[trabajo.id] = trabajo
+            self._recortar_historial()
+        trabajo.publicar("estado", EN_COLA)
+        self._pendientes.put(trabajo)
+        return trabajo
+
+    def publicar(self, tipo, datos, trabajo_id=None):
+        self.eventos.put(EventoProgreso(trabajo_id, tipo, datos))
+
+    def salida(self, widget):
+        """
+        Cuadro de texto para hilos que no son trabajos: lo escrito se inserta en 'widget'
+        desde el hilo de Tk, en orden con el resto de los eventos.
+        """
+        return SalidaTrabajo(self, widget)
+
+    def buscar(self, trabajo_id):
+        with self._lock:
+            return self.trabajos.get(trabajo_id)
+
+    def cancelar(self, trabajo_id):
+        trabajo = self.buscar(trabajo_id)
+        if trabajo:
+            trabajo.cancelar()
+
+    def _recortar_historial(self):
+        # Solo los que la interfaz ya notificó: un trabajo recién terminado todavía tiene su
+        # texto y su al_terminar en la cola de eventos
+        terminados = [i for i, t in self.trabajos.items() if t.notificado]
+        for trabajo_id in terminados[:max(0, len(terminados) - MAX_HISTORIAL)]:
+            del self.trabajos[trabajo_id]
+
+    def _trabajador(self):
+        while True:
+            trabajo = self._pendientes.get()
+            if trabajo.cancelado():
+                self._finalizar(trabajo, CANCELADO)
+                continue
+            trabajo.estado = EJECUTANDO
+            trabajo.publicar("estado", EJECUTANDO)
+            try:
+                trabajo.resultado = trabajo.funcion(trabajo, *trabajo.args, **trabajo.kwargs)
+                self._finalizar(trabajo, CANCELADO if trabajo.cancelado() else COMPLETADO)
+            except Cancelado:
+                self._finalizar(trabajo, CANCELADO)
+            except Exception as e:
+                trabajo.error = e
+                self._finalizar(trabajo, FALLIDO)
+
+    def _finalizar(self, trabajo, estado):
+        trabajo.estado = estado
+        trabajo.publicar("estado", estado)
+
+    def procesar_eventos(self, al_cambiar=None, max_eventos=500):
+        """
+        Aplica en el hilo de Tk hasta 'max_eventos' eventos pendientes: inserta el texto en
+        sus cuadros, actualiza el progreso y llama a los 'al_terminar' de los trabajos que
+        finalizaron. 'al_cambiar(trabajo)' se llama una vez por trabajo modificado en el lote.
+        """
+        cambiados = OrderedDict()
+        widgets = set()
+        for _ in range(max_eventos):
+            try:
+                evento = self.eventos.get_nowait()
+            except queue.Empty:
+                break
+            trabajo = self.buscar(evento.trabajo_id) if evento.trabajo_id is not None else None
+            if evento.tipo == "texto":
+                widget, texto = evento.datos
+                widget.insert(tk.END, texto)
+                widgets.add(widget)
+            elif trabajo is None:
+                continue
+            elif evento.tipo == "progreso":
+                trabajo.progreso = evento.datos
+            elif evento.tipo == "estado":
+                if evento.datos in (COMPLETADO, CANCELADO, FALLIDO):
+                    if trabajo.al_terminar:
+                        trabajo.al_terminar(trabajo)
+                    trabajo.notificado = True
+            if trabajo is not None:
+                cambiados[trabajo.id] = trabajo
+        if any(t.notificado for t in cambiados.values()):
+            with self._lock:
+                self._recortar_historial()
+        for widget in widgets:
+            widget.see(tk.END)
+        if al_cambiar:
+            for trabajo in cambiados.values():
+                al_cambiar(trabajo)
@@ -0,0 +1,241 @@
+import hashlib
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import assets
+import parsing
+
+# Versión de BSP de Quake 2
+VERSION_BSP = 38
+# Tamaño de cada elemento de los lumps (estructuras de qfiles.h); 1 = datos sin estructura
+TAMANOS_LUMP = (
+    ("entities", 1), ("planes", 20), ("vertexes", 12), ("visibility", 1), ("nodes", 28),
+    ("texinfo", 76), ("faces", 20), ("lighting", 1), ("leafs", 28), ("leaffaces", 2),
+    ("leafbrushes", 2), ("edges", 4), ("surfedges", 4), ("models", 48), ("brushes", 12),
+    ("brushsides", 4), ("pop", 1), ("areas", 8), ("areaportals", 8),
+)
+# Caché de verificaciones por huella del archivo, en el directorio del script
+ARCHIVO_CACHE = ".cache_verificacion.json"
+
+def _md4_python(datos):
+    """
+    MD4 (RFC 1320) en Python puro, para cuando hashlib no lo ofrece (OpenSSL 3 lo deshabilita).
+    Las 48 operaciones están desenrolladas sobre variables locales, pero sigue procesando
+    solo unos pocos MB/s: un mapa de 20 MB tarda varios segundos. Por eso las verificaciones
+    se guardan en caché por huella, corren en un pool de procesos y solo se recalculan los
+    mapas que cambiaron.
+    """
+    datos = memoryview(datos)
+    largo = len(datos)
+    completos = largo - largo % 64
+    resto = bytes(datos[completos:]) + b'\x80'
+    resto += b'\x00' * ((56 - len(resto)) % 64) + struct.pack('<Q', (largo * 8) & 0xFFFFFFFFFFFFFFFF)
+    bloques = struct.Struct('<16I').iter_unpack
+    m = 0xFFFFFFFF
+    h0, h1, h2, h3 = 0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476
+    for x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12, x13, x14, x15 in itertools.chain(bloques(datos[:completos]), bloques(resto)):
+        a, b, c, d = h0, h1, h2, h3
+        # Ronda 1
+        a = (a + (d ^ (b & (c ^ d))) + x0) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (c ^ (a & (b ^ c))) + x1) & m; d = ((d << 7) | (d >> 25)) & m
+        c = (c + (b ^ (d & (a ^ b))) + x2) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (a ^ (c & (d ^ a))) + x3) & m; b = ((b << 19) | (b >> 13)) & m
+        a = (a + (d ^ (b & (c ^ d))) + x4) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (c ^ (a & (b ^ c))) + x5) & m; d = ((d << 7) | (d >> 25)) & m
+        c = (c + (b ^ (d & (a ^ b))) + x6) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (a ^ (c & (d ^ a))) + x7) & m; b = ((b << 19) | (b >> 13)) & m
+        a = (a + (d ^ (b & (c ^ d))) + x8) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (c ^ (a & (b ^ c))) + x9) & m; d = ((d << 7) | (d >> 25)) & m
+        c = (c + (b ^ (d & (a ^ b))) + x10) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (a ^ (c & (d ^ a))) + x11) & m; b = ((b << 19) | (b >> 13)) & m
+        a = (a + (d ^ (b & (c ^ d))) + x12) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (c ^ (a & (b ^ c))) + x13) & m; d = ((d << 7) | (d >> 25)) & m
+        c = (c + (b ^ (d & (a ^ b))) + x14) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (a ^ (c & (d ^ a))) + x15) & m; b = ((b << 19) | (b >> 13)) & m
+        # Ronda 2
+        a = (a + ((b & c) | (b & d) | (c & d)) + x0 + 0x5A827999) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + ((a & b) | (a & c) | (b & c)) + x4 + 0x5A827999) & m; d = ((d << 5) | (d >> 27)) & m
+        c = (c + ((d & a) | (d & b) | (a & b)) + x8 + 0x5A827999) & m; c = ((c << 9) | (c >> 23)) & m
+        b = (b + ((c & d) | (c & a) | (d & a)) + x12 + 0x5A827999) & m; b = ((b << 13) | (b >> 19)) & m
+        a = (a + ((b & c) | (b & d) | (c & d)) + x1 + 0x5A827999) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + ((a & b) | (a & c) | (b & c)) + x5 + 0x5A827999) & m; d = ((d << 5) | (d >> 27)) & m
+        c = (c + ((d & a) | (d & b) | (a & b)) + x9 + 0x5A827999) & m; c = ((c << 9) | (c >> 23)) & m
+        b = (b + ((c & d) | (c & a) | (d & a)) + x13 + 0x5A827999) & m; b = ((b << 13) | (b >> 19)) & m
+        a = (a + ((b & c) | (b & d) | (c & d)) + x2 + 0x5A827999) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + ((a & b) | (a & c) | (b & c)) + x6 + 0x5A827999) & m; d = ((d << 5) | (d >> 27)) & m
+        c = (c + ((d & a) | (d & b) | (a & b)) + x10 + 0x5A827999) & m; c = ((c << 9) | (c >> 23)) & m
+        b = (b + ((c & d) | (c & a) | (d & a)) + x14 + 0x5A827999) & m; b = ((b << 13) | (b >> 19)) & m
+        a = (a + ((b & c) | (b & d) | (c & d)) + x3 + 0x5A827999) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + ((a & b) | (a & c) | (b & c)) + x7 + 0x5A827999) & m; d = ((d << 5) | (d >> 27)) & m
+        c = (c + ((d & a) | (d & b) | (a & b)) + x11 + 0x5A827999) & m; c = ((c << 9) | (c >> 23)) & m
+        b = (b + ((c & d) | (c & a) | (d & a)) + x15 + 0x5A827999) & m; b = ((b << 13) | (b >> 19)) & m
+        # Ronda 3
+        a = (a + (b ^ c ^ d) + x0 + 0x6ED9EBA1) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (a ^ b ^ c) + x8 + 0x6ED9EBA1) & m; d = ((d << 9) | (d >> 23)) & m
+        c = (c + (d ^ a ^ b) + x4 + 0x6ED9EBA1) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (c ^ d ^ a) + x12 + 0x6ED9EBA1) & m; b = ((b << 15) | (b >> 17)) & m
+        a = (a + (b ^ c ^ d) + x2 + 0x6ED9EBA1) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (a ^ b ^ c) + x10 + 0x6ED9EBA1) & m; d = ((d << 9) | (d >> 23)) & m
+        c = (c + (d ^ a ^ b) + x6 + 0x6ED9EBA1) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (c ^ d ^ a) + x14 + 0x6ED9EBA1) & m; b = ((b << 15) | (b >> 17)) & m
+        a = (a + (b ^ c ^ d) + x1 + 0x6ED9EBA1) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (a ^ b ^ c) + x9 + 0x6ED9EBA1) & m; d = ((d << 9) | (d >> 23)) & m
+        c = (c + (d ^ a ^ b) + x5 + 0x6ED9EBA1) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (c ^ d ^ a) + x13 + 0x6ED9EBA1) & m; b = ((b << 15) | (b >> 17)) & m
+        a = (a + (b ^ c ^ d) + x3 + 0x6ED9EBA1) & m; a = ((a << 3) | (a >> 29)) & m
+        d = (d + (a ^ b ^ c) + x11 + 0x6ED9EBA1) & m; d = ((d << 9) | (d >> 23)) & m
+        c = (c + (d ^ a ^ b) + x7 + 0x6ED9EBA1) & m; c = ((c << 11) | (c >> 21)) & m
+        b = (b + (c ^ d ^ a) + x15 + 0x6ED9EBA1) & m; b = ((b << 15) | (b >> 17)) & m
+        h0, h1, h2, h3 = (h0 + a) & m, (h1 + b) & m, (h2 + c) & m, (h3 + d) & m
+    return struct.pack('<4I', h0, h1, h2, h3)
+
+def md4(datos):
+    try:
+        return hashlib.new('md4', datos).digest()
+    except ValueError:
+        return _md4_python(datos)
+
+def checksum_mapa(datos):
+    """
+    Checksum del mapa como lo calcula el motor (Com_BlockChecksum): MD4 del archivo completo
+    y XOR de las cuatro palabras del resultado. Se devuelve con signo, igual que lo publica el
+    servidor en el configstring CS_MAPCHECKSUM.
+    """
+    a, b, c, d = struct.unpack('<4I', md4(datos))
+    valor = a ^ b ^ c ^ d
+    return valor - 0x100000000 if valor >= 0x80000000 else valor
+
+def validar_lumps(datos, nombre="mapa"):
+    """
+    Comprueba el header y los 19 lumps: que estén dentro del archivo, que no se superpongan y
+    que su tamaño sea múltiplo de su estructura. Los lumps no alineados a 4 bytes (qbsp siempre
+    los alinea) se informan como avisos porque el motor los carga igual.
+    Devuelve (errores, avisos).
+    """
+    errores = []
+    avisos = []
+    bsp = parsing.BSPFile(nombre)
+    error = bsp.parse_header(bytes(datos[:parsing.HEADERLEN]))
+    if error:
+        return [error], avisos
+    version = struct.unpack_from('<i', datos, 4)[0]
+    if version != VERSION_BSP:
+        errores.append(f"Versión de BSP {version} (se esperaba {VERSION_BSP})")
+
+    tamano = len(datos)
+    rangos = []
+    for i, (lump, elemento) in enumerate(TAMANOS_LUMP):
+        offset = bsp.offsets[i] + parsing.HEADERLEN
+        largo = bsp.lengths[i]
+        if offset < parsing.HEADERLEN and largo:
+            errores.append(f"Lump {lump}: empieza dentro del header (offset {offset})")
+        if offset + largo > tamano:
+            errores.append(f"Lump {lump}: termina en {offset + largo}, fuera del archivo ({tamano} bytes)")
+        if largo % elemento:
+            errores.append(f"Lump {lump}: tamaño {largo} no es múltiplo de {elemento}")
+        if largo and offset % 4:
+            avisos.append(f"Lump {lump}: offset {offset} no alineado a 4 bytes")
+        if largo:
+            rangos.append((offset, offset + largo, lump))
+
+    rangos.sort()
+    for (inicio_a, fin_a, lump_a), (inicio_b, fin_b, lump_b) in zip(rangos, rangos[1:]):
+        if inicio_b < fin_a:
+            errores.append(f"Lumps {lump_a} y {lump_b} se superponen ({inicio_b}-{min(fin_a, fin_b)})")
+    return errores, avisos
+
+def verificar_bsp(ruta):
+    """
+    Valida un .bsp y calcula su checksum de mapa y su SHA-256 en una sola lectura por mmap.
+    Devuelve un dict con 'mapa', 'tamano', 'huella', 'errores', 'avisos', 'checksum' y 'sha256'.
+    """
+    mapa = os.path.splitext(os.path.basename(ruta))[0]
+    resultado = {"mapa": mapa, "tamano": 0, "huella": None, "errores": [], "avisos": [], "checksum": None, "sha256": None}
+    try:
+        resultado["huella"] = assets.huella(ruta)
+        with open(ruta, 'rb') as f:
+            resultado["tamano"] = os.fstat(f.fileno()).st_size
+            if resultado["tamano"] < parsing.HEADERLEN:
+                resultado["errores"].append(f"Archivo de {resultado['tamano']} bytes, más corto que el header")
+                return resultado
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+                resultado["errores"], resultado["avisos"] = validar_lumps(datos, ruta)
+                resultado["checksum"] = checksum_mapa(datos)
+                resultado["sha256"] = hashlib.sha256(datos).hexdigest()
+    except OSError as e:
+        resultado["errores"].append(f"Error al leer {ruta}: {e}")
+    return resultado
+
+def cargar_cache(ruta_cache):
+    """
+    Caché de verificaciones: {"local": {ruta: resultado}, "remoto": {clave: {huella, sha256}}}.
+    """
+    cache = {"local": {}, "remoto": {}}
+    if ruta_cache and os.path.exists(ruta_cache):
+        try:
+            with open(ruta_cache, 'r', encoding='utf-8') as f:
+                cache.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return cache
+
+def guardar_cache(ruta_cache, cache):
+    temporal = f"{ruta_cache}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(temporal, ruta_cache)
+
+def verificar_mapas(rutas, ruta_cache=None, procesos=None):
+    """
+    Verifica los .bsp de 'rutas' en un pool de procesos. Los mapas cuya huella no cambió desde
+    la última verificación se toman de la caché sin leerlos. Devuelve los resultados en el
+    orden de 'rutas'.
+    """
+    cache = cargar_cache(ruta_cache)
+    locales = cache["local"]
+    resultados = {}
+    pendientes = []
+    for ruta in rutas:
+        clave = os.path.abspath(ruta)
+        guardado = locales.get(clave)
+        try:
+            vigente = guardado is not None and guardado["huella"] == assets.huella(ruta)
+        except OSError:
+            vigente = False
+        if vigente:
+            resultados[ruta] = guardado
+        else:
+            pendientes.append(ruta)
+
+    if len(pendientes) < 4 or procesos == 1:
+        nuevos = [verificar_bsp(r) for r in pendientes]
+    else:
+        # 'spawn': el proceso principal tiene hilos (Tk, trabajos) y un fork podría heredar locks tomados
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as executor:
+            nuevos = list(executor.map(verificar_bsp, pendientes))
+    for ruta, resultado in zip(pendientes, nuevos):
+        resultados[ruta] = resultado
+        if resultado["sha256"]:
+            locales[os.path.abspath(ruta)] = resultado
+
+    if ruta_cache and pendientes:
+        guardar_cache(ruta_cache, cache)
+    return [resultados[r] for r in rutas]
+
+def formatear_verificacion(resultados):
+    invalidos = [r for r in resultados if r["errores"]]
+    lineas = [f"{len(resultados)} mapas verificados, {len(invalidos)} con errores."]
+    for r in resultados:
+        checksum = r["checksum"] if r["checksum"] is not None else "-"
+        estado = "ERROR" if r["errores"] else "OK"
+        lineas.append(f"  {r['mapa']:<24} {estado:<6} checksum {checksum:>12}  {r['tamano']} bytes")
+        for error in r["errores"]:
+            lineas.append(f"      {error}")
+        for aviso in r["avisos"]:
+            lineas.append(f"      Aviso: {aviso}")
+    return "\n".join(lineas)